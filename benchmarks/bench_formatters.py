@@ -0,0 +1,69 @@
+"""Compare the cerebro result formatters against the original per-row implementation.
+
+Run with `python benchmarks/bench_formatters.py [num_tickers] [num_days]`.
+"""
+import sys
+import timeit
+
+import pandas as pd
+
+from ekeko.backtrader.cerebro import _format_trade_tracker, _format_transactions
+
+from synthetic import fake_analyses
+
+###############################
+### Original implementations
+###############################
+
+def legacy_format_trade_tracker(trade_analysis):
+    result = {}
+    for date, trades in trade_analysis.items():
+        for trade in trades:
+            ticker = trade['ticker']
+            if ticker not in result:
+                result[ticker] = []
+            result[ticker].append({'date': date, 'pnl': trade['pnl'], 'pnlcomm': trade['pnlcomm']})
+    for ticker, trade_list in result.items():
+        df = pd.DataFrame(trade_list)
+        df.set_index('date', inplace=True)
+        result[ticker] = df
+    return result
+
+def legacy_format_transactions(transactions_analysis):
+    result = {}
+    for date, trades in transactions_analysis.items():
+        for trade in trades:
+            size, price, _, ticker, value = trade
+            if ticker not in result:
+                result[ticker] = []
+            result[ticker].append({'date': date, 'size': size, 'price': price, 'value': value})
+    for ticker, trade_list in result.items():
+        df = pd.DataFrame(trade_list)
+        df.set_index('date', inplace=True)
+        result[ticker] = df
+    return result
+
+def best_of(func, *args, repeat=3):
+    return min(timeit.repeat(lambda: func(*args), number=1, repeat=repeat))
+
+def assert_same(expected, actual):
+    assert list(expected) == list(actual)
+    for ticker in expected:
+        pd.testing.assert_frame_equal(expected[ticker], actual[ticker])
+
+if __name__ == '__main__':
+    num_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    num_days = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    transactions, trades = fake_analyses(num_tickers, num_days)
+
+    assert_same(legacy_format_transactions(transactions), _format_transactions(transactions))
+    assert_same(legacy_format_trade_tracker(trades), _format_trade_tracker(trades))
+
+    print(f"{num_tickers} tickers x {num_days} days")
+    for name, legacy, current, analysis in [
+        ('transactions', legacy_format_transactions, _format_transactions, transactions),
+        ('trades', legacy_format_trade_tracker, _format_trade_tracker, trades),
+    ]:
+        before = best_of(legacy, analysis)
+        after = best_of(current, analysis)
+        print(f"  {name:<13} legacy {before:8.3f}s  columnar {after:8.3f}s  speedup {before / after:5.1f}x")
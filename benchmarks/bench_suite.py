@@ -0,0 +1,288 @@
+"""Time and memory benchmarks of the loaders, the engine, the formatters and plotting.
+
+Every benchmark runs at the scales it supports (see `SCALES`). Each
+measurement keeps the best wall time of `--repeat` runs (fewer for slow
+benchmarks, see `--budget`) and the peak memory of one extra run under
+tracemalloc. The results are compared with a stored baseline. A slowdown or memory growth beyond `--tolerance` is reported as a
+regression and makes the script exit with status 1.
+
+Run with:
+    python benchmarks/bench_suite.py                    # default scales, compare with baseline.json
+    python benchmarks/bench_suite.py --scale universe   # one scale ('all' for every scale)
+    python benchmarks/bench_suite.py --only load run    # benchmarks whose name starts with these
+    python benchmarks/bench_suite.py --save             # record the results as the new baseline
+
+Baselines depend on the machine; record one before changing the code and
+compare against it on the same machine.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import backtrader as bt
+
+import ekeko
+from ekeko.backtrader.cerebro import _format_trade_tracker, _format_transactions
+
+import synthetic
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# name: (tickers, bars)
+SCALES = {
+    'single': (1, 1_000),
+    'wide': (100, 1_000),
+    'universe': (5_000, 1_000),
+    'long': (1, 100_000),
+    'wide-long': (100, 100_000),
+}
+DEFAULT_SCALES = ['single', 'wide', 'long']
+
+BENCHMARKS = {}
+
+def benchmark(name, max_bars=None, single_ticker=False):
+    """
+    Register a benchmark.
+
+    The decorated function takes the number of tickers and bars and a scratch
+    directory, and returns the callable to measure. Everything it does before
+    returning is setup and is not measured.
+
+    Parameters:
+    name (str): Name of the benchmark.
+    max_bars (int): Skip scales with more bars than this in total over all tickers.
+    single_ticker (bool): Only run at one-ticker scales, for work on a single series.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, max_bars, single_ticker)
+        return setup
+    return decorator
+
+###############################
+### Benchmarks
+###############################
+
+@benchmark('load.stooq_to_df')
+def bench_stooq_to_df(num_tickers, num_bars, scratch):
+    paths = _stooq_files(scratch, num_tickers, num_bars)
+    return lambda: ekeko.dataloader.stooq_to_df(paths)
+
+@benchmark('load.read_files_from_zip')
+def bench_read_files_from_zip(num_tickers, num_bars, scratch):
+    paths = _stooq_files(scratch, num_tickers, num_bars)
+    zip_path = synthetic.write_stooq_zip(os.path.join(scratch, 'stooq.zip'), paths)
+    extract_path = os.path.join(scratch, 'extracted')
+
+    def run():
+        shutil.rmtree(extract_path, ignore_errors=True)
+        return ekeko.dataloader.read_files_from_zip(zip_path, extract_path)
+    return run
+
+@benchmark('run.cerebro', max_bars=5_000_000)
+def bench_cerebro_run(num_tickers, num_bars, scratch):
+    return _cerebro_run(num_tickers, num_bars)
+
+@benchmark('run.metrics_only', max_bars=5_000_000)
+def bench_cerebro_run_metrics_only(num_tickers, num_bars, scratch):
+    return _cerebro_run(num_tickers, num_bars, metrics_only=True)
+
+@benchmark('format.transactions', max_bars=10_000_000)
+def bench_format_transactions(num_tickers, num_bars, scratch):
+    transactions, _ = synthetic.fake_analyses(num_tickers, num_bars, every=10)
+    return lambda: _format_transactions(transactions)
+
+@benchmark('format.trades', max_bars=10_000_000)
+def bench_format_trades(num_tickers, num_bars, scratch):
+    _, trades = synthetic.fake_analyses(num_tickers, num_bars, every=10)
+    return lambda: _format_trade_tracker(trades)
+
+@benchmark('print', max_bars=10_000_000)
+def bench_print(num_tickers, num_bars, scratch):
+    transactions, trades = synthetic.fake_analyses(num_tickers, num_bars, every=10)
+    drawdown = bt.AutoOrderedDict()
+    drawdown.len, drawdown.drawdown, drawdown.moneydown = 3, 1.5, 150.0
+    drawdown.max.len, drawdown.max.drawdown, drawdown.max.moneydown = 40, 12.5, 1250.0
+    result_analyzer = ekeko.backtrader.EkekoResultAnalyzer({
+        'transactions': _format_transactions(transactions),
+        'trades': _format_trade_tracker(trades),
+        'drawdown': drawdown,
+        'trade_analysis': {'num_trades': len(trades) * num_tickers},
+    })
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            result_analyzer.print()
+    return run
+
+@benchmark('plot', single_ticker=True)
+def bench_plot(num_tickers, num_bars, scratch):
+    stock_df, transactions = _plot_inputs(num_bars)
+    return lambda: ekeko.viz.plot(stock_df, transactions=transactions)
+
+@benchmark('plot.lod', single_ticker=True)
+def bench_plot_lod(num_tickers, num_bars, scratch):
+    stock_df, transactions = _plot_inputs(num_bars)
+    return lambda: ekeko.viz.plot(stock_df, transactions=transactions, max_points=2_000)
+
+@benchmark('plot.different_stocks', max_bars=1_000_000)
+def bench_plot_different_stocks(num_tickers, num_bars, scratch):
+    stocks = [{'symbol': ticker, 'df': df} for ticker, df in synthetic.fake_stock_dfs(num_tickers, num_bars).items()]
+    return lambda: ekeko.viz.plot_different_stocks(stocks, 'Close', 'Close')
+
+@benchmark('plot.export_html', max_bars=1_000_000)
+def bench_export_html(num_tickers, num_bars, scratch):
+    stock_dfs = synthetic.fake_stock_dfs(num_tickers, num_bars)
+    directory = os.path.join(scratch, 'plots')
+    return lambda: ekeko.viz.export_plots(stock_dfs, directory=directory, max_points=2_000)
+
+class MomentumFlip(bt.Strategy):
+    """Holds every ticker after an up day and sells it after a down day."""
+
+    def next(self):
+        for data in self.datas:
+            if len(data) < 2:
+                continue
+            if data.close[0] > data.close[-1]:
+                if not self.getposition(data).size:
+                    self.buy(data=data)
+            elif self.getposition(data).size:
+                self.sell(data=data)
+
+###############################
+### Measurement
+###############################
+
+def measure(func, repeat, budget):
+    """
+    Best wall time of up to `repeat` runs and peak memory of one more run, in bytes.
+
+    Runs stop repeating once they have taken `budget` seconds in total, so
+    the slow benchmarks run once.
+    """
+    timings = []
+    while len(timings) < repeat and sum(timings) < budget:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    with ekeko.profile() as profiler:
+        with profiler.phase('benchmark'):
+            func()
+    return min(timings), int(profiler.report().loc['benchmark', 'peak_bytes'])
+
+def run_benchmarks(names, scales, repeat, budget):
+    results = {}
+    for scale in scales:
+        num_tickers, num_bars = SCALES[scale]
+        scratch = tempfile.mkdtemp(prefix=f"ekeko-bench-{scale}-")
+        try:
+            for name in names:
+                setup, max_bars, single_ticker = BENCHMARKS[name]
+                if (max_bars is not None and num_tickers * num_bars > max_bars) or (single_ticker and num_tickers > 1):
+                    continue
+                func = setup(num_tickers, num_bars, scratch)
+                seconds, peak_bytes = measure(func, repeat, budget)
+                key = f"{name}[{scale}]"
+                results[key] = {'seconds': seconds, 'peak_bytes': peak_bytes}
+                print(f"  {key:<36} {seconds:10.4f}s {peak_bytes / 2**20:10.1f} MiB", flush=True)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print the change against the baseline and return the keys that regressed."""
+    regressions = []
+    print(f"\n  {'benchmark':<36} {'time':>10} {'memory':>10}")
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"  {key:<36} {'new':>10} {'new':>10}")
+            continue
+        time_ratio = result['seconds'] / previous['seconds']
+        memory_ratio = result['peak_bytes'] / max(previous['peak_bytes'], 1)
+        regressed = time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance
+        if regressed:
+            regressions.append(key)
+        print(f"  {key:<36} {time_ratio:9.2f}x {memory_ratio:9.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def machine():
+    return {'platform': platform.platform(), 'processor': platform.processor(), 'python': platform.python_version()}
+
+###############################
+### Utilities
+###############################
+
+def _cerebro_run(num_tickers, num_bars, **run_kwargs):
+    stock_dfs = synthetic.fake_stock_dfs(num_tickers, num_bars)
+
+    def run():
+        ekeko_cerebro = ekeko.backtrader.EkekoCerebro()
+        ekeko_cerebro.cerebro.broker.setcash(1_000_000.0)
+        for ticker, df in stock_dfs.items():
+            ekeko_cerebro.adddata(df, name=ticker)
+        ekeko_cerebro.addstrategy(MomentumFlip)
+        _, analysis_results = ekeko_cerebro.run(**run_kwargs)
+        # Format every section, as the eager results used to be
+        return dict(analysis_results)
+    return run
+
+def _plot_inputs(num_bars):
+    stock_df = synthetic.create_fake_data(num_bars)
+    transactions, _ = synthetic.fake_analyses(1, num_bars, every=10)
+    transactions = _format_transactions(transactions)['t0000']
+    transactions.index = stock_df.index[::10][:len(transactions)]
+    return stock_df, transactions
+
+def _stooq_files(scratch, num_tickers, num_bars):
+    # Shared by the loader benchmarks of a scale
+    directory = os.path.join(scratch, 'stooq')
+    if os.path.isdir(directory):
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory))
+    return synthetic.write_stooq_files(directory, num_tickers, num_bars)
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', nargs='+', default=DEFAULT_SCALES, help=f"scales among {', '.join(SCALES)}, or 'all'")
+    parser.add_argument('--only', nargs='+', default=None, help="run the benchmarks whose name starts with one of these")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per benchmark, the best one counts")
+    parser.add_argument('--budget', type=float, default=10.0, help="seconds after which a benchmark stops repeating")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="relative slowdown or memory growth reported as a regression")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline file")
+    parser.add_argument('--save', action='store_true', help="merge the results into the baseline instead of comparing")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = _parse_args(sys.argv[1:])
+    scales = list(SCALES) if args.scale == ['all'] else args.scale
+    names = [name for name in BENCHMARKS if args.only is None or name.startswith(tuple(args.only))]
+
+    print(f"{len(names)} benchmarks at {', '.join(scales)}")
+    results = run_benchmarks(names, scales, args.repeat, args.budget)
+
+    baseline = {'machine': machine(), 'results': {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.save:
+        baseline['machine'] = machine()
+        baseline['results'].update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nSaved {len(results)} results to {args.baseline}")
+        sys.exit(0)
+
+    if baseline['machine'] != machine():
+        print("\nWarning: the baseline was recorded on another machine", file=sys.stderr)
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
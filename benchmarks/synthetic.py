@@ -0,0 +1,88 @@
+"""Synthetic market data and analyzer output for the benchmarks.
+
+Prices are seeded random walks, so every run of a benchmark sees the same data.
+"""
+import os
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+STOOQ_HEADER = "<TICKER>,<PER>,<DATE>,<TIME>,<OPEN>,<HIGH>,<LOW>,<CLOSE>,<VOL>,<OPENINT>"
+# Early enough for 100k daily bars to end before today
+START_DATE = '1750-01-01'
+
+def tickers(num_tickers):
+    return [f"t{i:04d}" for i in range(num_tickers)]
+
+def random_prices(num_bars, seed=0):
+    """Open, high, low and close columns of a positive random walk."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, num_bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.005, num_bars)) * close
+    return open_, np.maximum(open_, close) + spread, np.minimum(open_, close) - spread, close
+
+def create_fake_data(num_bars, seed=0):
+    """OHLCV DataFrame like the one of `tests/end_to_end.py`, with random prices."""
+    open_, high, low, close = random_prices(num_bars, seed)
+    df = pd.DataFrame(index=pd.date_range(start=START_DATE, periods=num_bars, freq='D'))
+    df['Open'] = open_
+    df['High'] = high
+    df['Low'] = low
+    df['Close'] = close
+    df['Volume'] = 1000
+    return df
+
+def fake_stock_dfs(num_tickers, num_bars):
+    return {ticker: create_fake_data(num_bars, seed=i) for i, ticker in enumerate(tickers(num_tickers))}
+
+def write_stooq_files(directory, num_tickers, num_bars):
+    """Write one stooq daily file per ticker and return their paths."""
+    os.makedirs(directory, exist_ok=True)
+    dates = pd.date_range(start=START_DATE, periods=num_bars, freq='D').strftime('%Y%m%d')
+    paths = []
+    for i, ticker in enumerate(tickers(num_tickers)):
+        open_, high, low, close = random_prices(num_bars, seed=i)
+        df = pd.DataFrame({
+            '<TICKER>': f"{ticker.upper()}.US",
+            '<PER>': 'D',
+            '<DATE>': dates,
+            '<TIME>': '000000',
+            '<OPEN>': open_,
+            '<HIGH>': high,
+            '<LOW>': low,
+            '<CLOSE>': close,
+            '<VOL>': 1000,
+            '<OPENINT>': 0,
+        })
+        path = os.path.join(directory, f"{ticker}.us.txt")
+        df.to_csv(path, index=False, float_format='%.4f')
+        paths.append(path)
+    return paths
+
+def write_stooq_zip(zip_path, paths):
+    """Pack stooq files the way the stooq archives lay them out."""
+    with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+        for path in paths:
+            zip_ref.write(path, f"data/daily/us/nasdaq stocks/1/{os.path.basename(path)}")
+    return zip_path
+
+def fake_analyses(num_tickers, num_days, every=1):
+    """
+    Raw Transactions and EkekoTradeTracker analyses.
+
+    Every ticker buys and sells alternately on every `every`-th day; with
+    `every=1` that is the worst case of a high-turnover strategy.
+    """
+    dates = pd.date_range('2000-01-01', periods=num_days, freq='D').to_pydatetime()
+    names = tickers(num_tickers)
+    transactions = OrderedDict()
+    trades = OrderedDict()
+    for day, date in enumerate(dates[::every]):
+        size = 1 if day % 2 == 0 else -1
+        transactions[date] = [[size, 10.0 + i, i, ticker, -size * (10.0 + i)] for i, ticker in enumerate(names)]
+        if size < 0:
+            trades[date] = [{'ticker': ticker, 'pnl': 1.0, 'pnlcomm': 0.5} for ticker in names]
+    return transactions, trades
@@ -1,3 +1,4 @@
 from .viz import *
 from .backtrader import *
 from .dataloader import *
+from .profiling import profile, Profiler
@@ -1,3 +1,12 @@
-from .analyzer import EkekoTradeTracker
+from .analyzer import EkekoTradeTracker, EkekoDrawDown, drawdown_analysis, drawdown_periods
 from .cerebro import EkekoCerebro
+from .analysis import AnalysisResults
 from .result_analyzer import EkekoResultAnalyzer
+from .feeds import SharedFrameStore, SharedFrame, SharedMemoryData
+from .optimize import sweep, param_combinations
+from .walkforward import walk_forward
+from .vectorized import vectorized_backtest, vectorized_screen, cross_check, SignalStrategy
+from .cache import ResultCache, result_key
+from .store import ResultStore, StoredRun
+from .incremental import Checkpoint, resume, merge_analysis_results
+from .streaming import StreamData, StreamEmitter, queue_iterator
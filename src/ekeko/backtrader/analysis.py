@@ -0,0 +1,57 @@
+from collections.abc import Mapping
+
+from ..profiling import phase
+
+class AnalysisResults(Mapping):
+    """
+    Analysis results of a run, each section formatted on first access.
+
+    Returned by `EkekoCerebro.run`. It has the keys of the selected sections
+    ('transactions', 'trades', 'drawdown', 'trade_analysis'). A section is
+    formatted (e.g. the transactions split into per-ticker frames) the
+    first time it is read, and then kept. Sections that are never read are
+    never formatted. Formatting is recorded as the 'format.<section>' phase
+    of an active profiler. Pickling formats every section and gives a plain
+    dict.
+
+    Parameters:
+    formatters (dict): Section name to a callable without arguments returning the section.
+    **values: Sections or extra entries that are already computed.
+    """
+
+    def __init__(self, formatters: dict, **values):
+        self._keys = [*formatters, *[key for key in values if key not in formatters]]
+        self._formatters = {key: formatter for key, formatter in formatters.items() if key not in values}
+        self._values = values
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            formatter = self._formatters.pop(key)
+            with phase(f"format.{key}"):
+                self._values[key] = formatter()
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._values or key in self._formatters
+
+    def __repr__(self):
+        return f"AnalysisResults({self._keys}, formatted={self.formatted})"
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    @property
+    def formatted(self) -> list:
+        """Sections formatted so far."""
+        return [key for key in self._keys if key in self._values]
+
+    def with_values(self, **values) -> 'AnalysisResults':
+        """Copy with extra entries; sections formatted later are formatted separately for each copy."""
+        formatters = {key: self._formatters.get(key) for key in self._keys}
+        return AnalysisResults(formatters, **self._values, **values)
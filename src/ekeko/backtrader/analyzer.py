@@ -1,11 +1,48 @@
 import backtrader as bt
+import numpy as np
+import pandas as pd
+from array import array
 from collections import OrderedDict
+from backtrader.utils import AutoOrderedDict
+
+# backtrader date numbers count days from 0001-01-01, this one is 1970-01-01
+EPOCH_DATE_NUMBER = 719163.0
+MICROSECONDS_PER_DAY = 86400 * 10**6
 
 class EkekoTradeTracker(bt.Analyzer):
+    """
+    Records every closed trade.
+
+    By default `get_analysis` returns an OrderedDict of close datetime to the
+    list of trades closed then. With `columnar=True`, trades are appended to
+    growable typed arrays instead (constant overhead per trade, no per-trade
+    dict or datetime) and `get_analysis` returns a DataFrame with the columns
+    date, ticker, pnl, pnlcomm, size, barlen and open_date. `size` is the
+    position size of the trade just before it closed, after any scaling in
+    or partial exits.
+    """
+    params = (
+        ('columnar', False),
+    )
+
     def __init__(self):
         self.trades = OrderedDict()
 
+        self._ticker_ids = {}
+        self._closing_sizes = {}
+        self._dtclose = array('d')
+        self._dtopen = array('d')
+        self._ticker = array('q')
+        self._pnl = array('d')
+        self._pnlcomm = array('d')
+        self._size = array('d')
+        self._barlen = array('q')
+
     def notify_trade(self, trade: bt.trade.Trade):
+        if self.p.columnar: # type: ignore
+            self._record_trade(trade)
+            return
+
         if trade.isclosed:
             trade_info = {
                 'ticker': trade.data._name, #type: ignore
@@ -18,5 +55,227 @@ class EkekoTradeTracker(bt.Analyzer):
             else:
                 self.trades[close_datetime] = [trade_info]
 
-    def get_analysis(self) -> OrderedDict:
-        return self.trades
+    def notify_order(self, order: bt.Order):
+        if not self.p.columnar or not order.executed.size: # type: ignore
+            return
+        # backtrader only notifies a trade when it opens and closes, and a
+        # closed trade reports size 0: take the size before the closing fill
+        # from the executions, whose psize is the position size after them
+        for bit in order.executed.exbits:
+            if bit.closed:
+                self._closing_sizes[order.data] = bit.psize - bit.size
+
+    def _record_trade(self, trade: bt.trade.Trade):
+        if not trade.isclosed:
+            return
+
+        name = trade.data._name #type: ignore
+        ticker_id = self._ticker_ids.setdefault(name, len(self._ticker_ids))
+
+        self._dtclose.append(trade.dtclose)
+        self._dtopen.append(trade.dtopen)
+        self._ticker.append(ticker_id)
+        self._pnl.append(trade.pnl)
+        self._pnlcomm.append(trade.pnlcomm)
+        self._size.append(self._closing_sizes.pop(trade.data, 0.0))
+        self._barlen.append(trade.barlen)
+
+    def get_analysis(self):
+        if not self.p.columnar: # type: ignore
+            return self.trades
+
+        tickers = pd.Categorical.from_codes(_to_numpy(self._ticker), categories=list(self._ticker_ids))
+        return pd.DataFrame({
+            'date': num2datetime(_to_numpy(self._dtclose)),
+            'ticker': tickers,
+            'pnl': _to_numpy(self._pnl),
+            'pnlcomm': _to_numpy(self._pnlcomm),
+            'size': _to_numpy(self._size),
+            'barlen': _to_numpy(self._barlen),
+            'open_date': num2datetime(_to_numpy(self._dtopen)),
+        })
+
+class EkekoDrawDown(bt.Analyzer):
+    """
+    Drawdown analyzer keeping the whole value curve.
+
+    `bt.analyzers.DrawDown` updates its statistics in Python on every bar
+    and keeps only the current and maximum values. This analyzer writes the
+    broker value and bar datetime of every bar into preallocated arrays
+    (doubling them when full). When the run stops it computes the running
+    peak, the drawdown curve and the drawdown periods with array operations,
+    see `drawdown_analysis`.
+
+    `get_analysis` has the keys of `bt.analyzers.DrawDown`, with the same
+    values: len, drawdown, moneydown, max.len, max.drawdown and
+    max.moneydown. It adds `curve` and `periods`, the DataFrames of
+    `drawdown_analysis`.
+
+    Params:
+    fund (bool): Use the fund value instead of the broker value; None follows the broker's fundmode.
+    """
+    params = (
+        ('fund', None),
+    )
+
+    def start(self):
+        super().start()
+        self._fundmode = self.strategy.broker.fundmode if self.p.fund is None else self.p.fund # type: ignore
+        # Preloaded feeds know their length; the calendar union may be longer and grows the arrays
+        capacity = max([data.buflen() for data in self.datas] + [1024])
+        self._values = np.empty(capacity)
+        self._dates = np.empty(capacity)
+        self._size = 0
+        self._value = float('nan')
+        self._seed = None
+
+    def create_analysis(self):
+        self.rets = _drawdown_rets(AutoOrderedDict(), None)
+        self._maxvalue = float('-inf')
+
+    def notify_fund(self, cash, value, fundvalue, shares):
+        self._value = fundvalue if self._fundmode else value
+
+    def next(self):
+        if self._size == len(self._values):
+            self._values = np.resize(self._values, 2 * self._size)
+            self._dates = np.resize(self._dates, 2 * self._size)
+        self._values[self._size] = self._value
+        self._dates[self._size] = self.strategy.datetime[0]
+        self._size += 1
+
+    def stop(self):
+        values = self._values[:self._size]
+        self.rets = drawdown_analysis(values, num2datetime(self._dates[:self._size]), seed=self._seed)
+        if self._size:
+            self._maxvalue = float(self.rets.curve['peak'].iloc[-1])
+        elif self._seed is not None:
+            self._maxvalue = self._seed['maxvalue']
+
+def drawdown_analysis(values, dates: pd.DatetimeIndex, seed=None) -> AutoOrderedDict:
+    """
+    Drawdown statistics, curve and periods of a value series.
+
+    The statistics are those `bt.analyzers.DrawDown` ends with after being
+    fed the values bar by bar. A drawdown is measured from the running peak
+    of the values and its length counts the bars since the value was last
+    at its peak.
+
+    Parameters:
+    values (np.ndarray): Portfolio value on every bar.
+    dates (pd.DatetimeIndex): Datetime of every bar.
+    seed (dict): State to continue from, as kept by `Checkpoint.drawdown`:
+    the len, drawdown and moneydown keys, their maxima under 'max' and the
+    peak value under 'maxvalue'.
+
+    Returns:
+    AutoOrderedDict: len, drawdown, moneydown, max.len, max.drawdown and
+    max.moneydown; `curve`, a DataFrame with the value, peak, drawdown (in
+    %), moneydown and len of every bar; and `periods`, see `drawdown_periods`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    peaks = np.maximum.accumulate(values) if len(values) else values
+    if seed is not None:
+        peaks = np.maximum(peaks, seed['maxvalue'])
+    moneydown = peaks - values
+    drawdown = 100.0 * moneydown / peaks
+
+    # A seeded series may start in the middle of a drawdown
+    steps = np.arange(len(values))
+    before = -1 - (seed['len'] if seed is not None else 0)
+    last_peak = np.maximum.accumulate(np.where(drawdown == 0, steps, before)) if len(values) else steps
+    lengths = steps - last_peak
+
+    curve = pd.DataFrame(
+        {'value': values, 'peak': peaks, 'drawdown': drawdown, 'moneydown': moneydown, 'len': lengths},
+        index=dates
+    ).rename_axis('date')
+
+    rets = _drawdown_rets(AutoOrderedDict(), seed)
+    if len(values):
+        rets.len = int(lengths[-1])
+        rets.drawdown = float(drawdown[-1])
+        rets.moneydown = float(moneydown[-1])
+        rets.max.len = max(rets.max.len, int(lengths.max()))
+        rets.max.drawdown = max(rets.max.drawdown, float(drawdown.max()))
+        rets.max.moneydown = max(rets.max.moneydown, float(moneydown.max()))
+    rets.curve = curve
+    rets.periods = drawdown_periods(curve)
+    rets._close()
+    return rets
+
+def drawdown_periods(curve: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drawdown periods of a `drawdown_analysis` curve, one row per stretch of bars below the peak.
+
+    Columns: start (first bar below the peak), trough (bar of the deepest
+    drawdown), end (bar back at the peak, NaT if not recovered), drawdown
+    and moneydown (the deepest of the period), len (bars below the peak)
+    and recovery (bars from the trough back to the peak, NaN if not
+    recovered).
+    """
+    under = curve['drawdown'].to_numpy() > 0
+    edges = np.diff(under.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    dates = curve.index
+
+    if not len(starts):
+        return pd.DataFrame({
+            'start': dates[:0], 'trough': dates[:0], 'end': dates[:0],
+            'drawdown': np.empty(0), 'moneydown': np.empty(0),
+            'len': np.empty(0, dtype=np.int64), 'recovery': np.empty(0),
+        })
+
+    drawdown = curve['drawdown'].to_numpy()
+    deepest = np.maximum.reduceat(drawdown, starts)
+    period = np.cumsum(edges[:-1] == 1) - 1
+    # First bar of each period reaching its deepest drawdown
+    at_trough = under & (drawdown == deepest[np.maximum(period, 0)])
+    troughs = np.flatnonzero(at_trough)
+    troughs = troughs[np.unique(period[troughs], return_index=True)[1]]
+
+    recovered = ends < len(curve)
+    recovered_ends = np.where(recovered, ends, 0)
+    return pd.DataFrame({
+        'start': dates[starts],
+        'trough': dates[troughs],
+        'end': dates[recovered_ends].where(recovered),
+        'drawdown': deepest,
+        'moneydown': np.maximum.reduceat(curve['moneydown'].to_numpy(), starts),
+        'len': ends - starts,
+        'recovery': np.where(recovered, ends - troughs, np.nan),
+    })
+
+def _drawdown_rets(rets, seed):
+    # Starting state of bt.analyzers.DrawDown, or the seeded one
+    seed = seed or {'len': 0, 'drawdown': 0.0, 'moneydown': 0.0,
+                    'max': {'len': 0.0, 'drawdown': 0.0, 'moneydown': 0.0}}
+    for key in ('len', 'drawdown', 'moneydown'):
+        rets[key] = seed[key]
+    for key in ('len', 'drawdown', 'moneydown'):
+        rets.max[key] = seed['max'][key]
+    return rets
+
+def _to_numpy(values: array) -> np.ndarray:
+    # Copy, a live view would stop the array from growing any further
+    return np.array(values, dtype=values.typecode)
+
+def num2datetime(values) -> pd.DatetimeIndex:
+    """
+    Vectorized `bt.num2date` for an array of backtrader date numbers.
+
+    Like `bt.num2date`, values within 10 microseconds of a whole second are
+    snapped to it, since float date numbers cannot resolve single microseconds.
+
+    Parameters:
+    values (array-like): backtrader date numbers.
+
+    Returns:
+    pd.DatetimeIndex: Naive datetimes.
+    """
+    days = np.asarray(values, dtype=np.float64) - EPOCH_DATE_NUMBER
+    micros = np.round(days * MICROSECONDS_PER_DAY).astype(np.int64)
+    dates = pd.DatetimeIndex(micros.astype('datetime64[us]'))
+    snapped = dates.round('s')
+    return dates.where(abs(dates - snapped) > pd.Timedelta(10, 'us'), snapped)
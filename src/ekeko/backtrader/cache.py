@@ -0,0 +1,158 @@
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+# Bump when the layout of the cached analysis results changes
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.pkl'
+
+class ResultCache:
+    """
+    On-disk cache of `EkekoCerebro.run` analysis results.
+
+    Entries are keyed by `result_key`: a hash of the input frames, the
+    strategy source and parameters, the broker cash and commission and the
+    analyzer set. They are stored as pickles; once the directory grows past
+    `max_bytes`, the least recently used entries are removed.
+
+    Parameters:
+    directory (str): Directory of the cache, created if needed.
+    max_bytes (int): Upper bound on the total size of the entries.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str):
+        """Cached analysis results for a key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                analysis_results = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        # The modification time doubles as the last access for the LRU
+        os.utime(path)
+        return analysis_results
+
+    def put(self, key: str, analysis_results: dict):
+        """Store analysis results under a key, then evict down to `max_bytes`."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(analysis_results, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def clear(self):
+        """Remove every entry."""
+        for path, _, _ in self._entries():
+            os.remove(path)
+
+    @property
+    def size(self) -> int:
+        """Total size of the entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def __len__(self):
+        return len(self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_SUFFIX):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+def result_key(stock_dfs: dict, strategy, strategy_kwargs: dict, cash, commission, analyzers) -> str:
+    """
+    Cache key of a backtest.
+
+    Parameters:
+    stock_dfs (dict): Dictionary of ticker symbols to DataFrames (or `SharedFrame` handles).
+    strategy (bt.Strategy): Strategy class; its source and that of its ekeko-side bases are hashed.
+    strategy_kwargs (dict): Parameters passed to the strategy.
+    cash (float): Starting cash.
+    commission (float): Broker commission.
+    analyzers (iterable): Names of the analyzers attached to the run.
+
+    Returns:
+    str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((CACHE_VERSION, cash, commission, tuple(analyzers))).encode())
+    digest.update(_strategy_fingerprint(strategy, strategy_kwargs).encode())
+    for ticker, df in stock_dfs.items():
+        digest.update(repr(ticker).encode())
+        _update_with_frame(digest, df)
+    return digest.hexdigest()
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _strategy_fingerprint(strategy, strategy_kwargs) -> str:
+    parts = [repr(sorted((name, repr(value)) for name, value in strategy_kwargs.items()))]
+    for cls in inspect.getmro(strategy):
+        if cls.__module__.startswith('backtrader') or cls is object:
+            continue
+        try:
+            source = inspect.getsource(cls)
+        except (OSError, TypeError):
+            # Defined in a notebook or __main__ without a source file
+            source = _compiled_fingerprint(cls)
+        parts.append(f"{cls.__module__}.{cls.__qualname__}\n{source}")
+    return '\n'.join(parts)
+
+def _compiled_fingerprint(cls) -> str:
+    """The compiled methods and the parameter defaults of a class, for classes without source."""
+    parts = []
+    if hasattr(cls, 'params') and hasattr(cls.params, '_getitems'):
+        parts.append(repr(cls.params._getitems()))
+    for name, value in sorted(vars(cls).items()):
+        if isinstance(value, (staticmethod, classmethod)):
+            value = value.__func__
+        elif isinstance(value, property):
+            value = value.fget
+        code = getattr(value, '__code__', None)
+        if code is not None:
+            parts.append(f"{name} {_code_fingerprint(code)} {getattr(value, '__defaults__', None)!r}")
+    return '\n'.join(parts)
+
+def _code_fingerprint(code) -> str:
+    consts = [_code_fingerprint(const) if inspect.iscode(const) else repr(const) for const in code.co_consts]
+    return hashlib.sha256(repr((code.co_code, consts, code.co_names, code.co_varnames)).encode()).hexdigest()
+
+def _update_with_frame(digest, df):
+    if isinstance(df, pd.DataFrame):
+        digest.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes], str(df.index.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    else:
+        # SharedFrame handle: hash the published arrays
+        digest.update(df.arrays().tobytes())
@@ -1,88 +1,377 @@
+import asyncio
+import functools
+
 import backtrader as bt
+import numpy as np
 import pandas as pd
 import ekeko
+from ..profiling import Profiler, active_profiler, phase, profiled, profiled_analyzer, profiled_strategy
+from .analysis import AnalysisResults
+
+# Sections of the analysis results and the analyzer each is computed from
+SECTIONS = {
+    'transactions': 'transactions',
+    'trades': 'tradetracker',
+    'drawdown': 'drawdown',
+    'trade_analysis': 'tradeanalyzer',
+}
+# Sections of fixed size, kept by the metrics-only mode of `EkekoCerebro.run`
+METRICS = ('drawdown', 'trade_analysis')
 
 class EkekoCerebro:
 
     def __init__(self):
         self.cerebro = bt.Cerebro()
+        self.stock_dfs = {}
+        self.streams = {}
+        self.strategy = None
+        self.strategy_kwargs = {}
+        # Analyzer class and kwargs by name, attached by `run`
+        self.analyzers = {
+            'transactions': (bt.analyzers.Transactions, {}),
+            'tradeanalyzer': (bt.analyzers.TradeAnalyzer, {}),
+            'drawdown': (ekeko.backtrader.EkekoDrawDown, {}),
+            'tradetracker': (ekeko.backtrader.EkekoTradeTracker, {}),
+        }
 
+    @profiled('adddata')
     def adddata(self, df: pd.DataFrame, name: str):
-        data = bt.feeds.PandasData(dataname=df) # type: ignore
+        """
+        Add a ticker from a DataFrame, a `SharedFrame`, or a stream of bars
+        (iterator or asyncio queue, see `ekeko.backtrader.StreamData`).
+        """
+        data = _make_feed(df)
         self.cerebro.adddata(data, name=name)
+        if isinstance(data, ekeko.backtrader.StreamData):
+            self.streams[name] = df
+        else:
+            self.stock_dfs[name] = df
 
-    def addstrategy(self, strategy: bt.Strategy):
-        self.cerebro.addstrategy(strategy)
+    def addstrategy(self, strategy: bt.Strategy, **kwargs):
+        self.cerebro.addstrategy(strategy, **kwargs)
+        self.strategy = strategy
+        self.strategy_kwargs = kwargs
 
-    def format_analysis_results(self, results) -> dict:
-        transactions = results.analyzers.transactions.get_analysis()
-        transactions = _format_transactions(transactions)
+    def optimize(self, param_grid: dict, max_workers=None, chunksize=1, completed=None,
+                 shared_memory=False) -> pd.DataFrame:
+        """
+        Sweep a grid of strategy parameters over the added data in parallel.
 
-        trades = results.analyzers.tradetracker.get_analysis()
-        trades = _format_trade_tracker(trades)
+        Uses the data, strategy class, starting cash and commission set up on
+        this cerebro, see `ekeko.backtrader.sweep` for the parameters. Keyword
+        arguments given to `addstrategy` are kept unless the grid overrides them.
 
-        trade_analysis = results.analyzers.tradeanalyzer.get_analysis()
-        trade_analysis = _format_trade_analyzer_results(trade_analysis)
+        Returns:
+        pd.DataFrame: Trade analysis metrics per parameter combination.
+        """
+        broker = self.cerebro.broker
+        param_grid = {**{name: [value] for name, value in self.strategy_kwargs.items()}, **param_grid}
+        return ekeko.backtrader.sweep(
+            self.strategy, param_grid, self.stock_dfs,
+            cash=broker.startingcash,
+            commission=broker.comminfo[None].p.commission,
+            max_workers=max_workers, chunksize=chunksize, completed=completed,
+            shared_memory=shared_memory
+        )
 
-        drawdown = results.analyzers.drawdown.get_analysis()
+    def walk_forward(self, window, step, warmup=0, max_workers=None) -> dict:
+        """
+        Walk-forward backtest of the added data and strategy over rolling windows.
 
-        analysis_results = {
-            'transactions': transactions,
-            'trades': trades,
-            'drawdown': drawdown,
-            'trade_analysis': trade_analysis
-        }
+        Uses the data, strategy, starting cash and commission set up on this
+        cerebro, see `ekeko.backtrader.walk_forward` for the parameters.
+
+        Returns:
+        dict: Stitched analysis results, plus the per-window 'windows' DataFrame.
+        """
+        broker = self.cerebro.broker
+        return ekeko.backtrader.walk_forward(
+            self.strategy, self.strategy_kwargs, self.stock_dfs, window, step, warmup=warmup,
+            cash=broker.startingcash,
+            commission=broker.comminfo[None].p.commission,
+            max_workers=max_workers
+        )
+
+    def checkpoint(self, results, warmup=0):
+        """
+        Checkpoint of the run that returned `results`, to resume it later with
+        `ekeko.backtrader.resume` once new bars arrive.
+
+        Parameters:
+        results (bt.Strategy): Strategy instance returned by `run`.
+        warmup (int): Number of trailing bars kept per ticker to warm up
+        indicators on resume, at least the longest indicator period.
+
+        Returns:
+        Checkpoint: The state to resume from.
+        """
+        return ekeko.backtrader.incremental.make_checkpoint(
+            results, self.stock_dfs, self.strategy, self.strategy_kwargs,
+            commission=self.cerebro.broker.comminfo[None].p.commission,
+            warmup=warmup
+        )
+
+    def save_results(self, store, analysis_results: dict, run_id=None, **metadata) -> str:
+        """
+        Save analysis results to a `ResultStore`.
+
+        The strategy name and parameters, starting cash and commission of
+        this cerebro are recorded in the run metadata, next to `metadata`.
+
+        Returns:
+        str: The run id.
+        """
+        broker = self.cerebro.broker
+        return store.save(
+            analysis_results, run_id=run_id,
+            strategy=getattr(self.strategy, '__name__', None),
+            params=self.strategy_kwargs,
+            cash=broker.startingcash,
+            commission=broker.comminfo[None].p.commission,
+            **metadata
+        )
+
+    def run_streaming(self, on_transaction=None, on_trade=None, exactbars=1):
+        """
+        Run over streamed bars with bounded memory.
 
-        return analysis_results
+        Bars are fetched one at a time as the backtest advances (no
+        preloading) and, with `exactbars=1`, line buffers only keep what the
+        indicators need. Instead of collecting every transaction and trade,
+        they are passed to the callbacks as they happen, see
+        `ekeko.backtrader.StreamEmitter`; only the fixed-size drawdown and
+        trade analysis are returned.
 
-    def run(self):
-        self.cerebro.addanalyzer(bt.analyzers.Transactions, _name='transactions')
+        Parameters:
+        on_transaction (callable): Called with a dict per execution, or None.
+        on_trade (callable): Called with a dict per closed trade, or None.
+        exactbars (int): backtrader `exactbars` setting, 1 for the smallest buffers.
+
+        Returns:
+        tuple: The backtrader strategy and a dict with 'drawdown' and 'trade_analysis'.
+        """
         self.cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='tradeanalyzer')
         self.cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-        self.cerebro.addanalyzer(ekeko.backtrader.EkekoTradeTracker, _name='tradetracker')
+        self.cerebro.addanalyzer(ekeko.backtrader.StreamEmitter, _name='stream',
+                                 on_transaction=on_transaction, on_trade=on_trade)
+
+        results = self.cerebro.run(exactbars=exactbars, preload=False, runonce=False, stdstats=False)[0]
+        analysis_results = {
+            'drawdown': results.analyzers.drawdown.get_analysis(),
+            'trade_analysis': _format_trade_analyzer_results(results.analyzers.tradeanalyzer.get_analysis()),
+        }
+        return results, analysis_results
+
+    async def run_streaming_async(self, on_transaction=None, on_trade=None, exactbars=1):
+        """
+        `run_streaming` from a coroutine, for bars fed through asyncio queues.
+
+        The backtest runs in a worker thread and reads the queues from the
+        running event loop; callbacks are called from that thread.
+        """
+        loop = asyncio.get_running_loop()
+        for data in self.cerebro.datas:
+            if isinstance(data, ekeko.backtrader.StreamData):
+                data.p.loop = loop
+        return await loop.run_in_executor(
+            None, functools.partial(self.run_streaming, on_transaction, on_trade, exactbars))
+
+    def format_analysis_results(self, results, sections=None) -> AnalysisResults:
+        """
+        Analysis results of a finished run, formatted lazily, see `AnalysisResults`.
+
+        Parameters:
+        results (bt.Strategy): Strategy instance of the run.
+        sections (iterable): Sections to include, by default those whose analyzer was attached.
+
+        Returns:
+        AnalysisResults: Mapping of section name to formatted results.
+        """
+        if sections is None:
+            attached = set(results.analyzers.getnames())
+            sections = [section for section, name in SECTIONS.items() if name in attached]
+        return AnalysisResults({
+            section: functools.partial(_format_section, results, section) for section in sections
+        })
+
+    def run(self, cache=None, force=False, profile=False, sections=None, metrics_only=False):
+        """
+        Run the backtest with the analyzers of the selected sections.
+
+        Only the analyzers behind the requested sections are attached, and
+        each section is formatted when it is first read from the returned
+        `AnalysisResults`. With `metrics_only`, only the fixed-size drawdown
+        and trade analysis are computed. The orders and trades backtrader
+        keeps for the whole run are pruned as it goes, and the standard
+        observers are left out, so nothing grows with the number of
+        transactions. A sweep needing one metric should
+        select just that section.
+
+        While a profiler is active (see `ekeko.profile`), or with
+        `profile=True`, the run is instrumented: the cerebro loop, the
+        strategy's `next` and every analyzer are recorded as phases, and the
+        profiler's report is added to the analysis results under 'profile'.
+        Sections formatted afterwards show up in the profiler only.
 
-        results = self.cerebro.run()[0]
-        analysis_results = self.format_analysis_results(results)
+        Parameters:
+        cache (ResultCache): Optional `ekeko.backtrader.ResultCache`. On a hit
+        the backtest is skipped and the stored analysis results are returned.
+        force (bool): Run even on a cache hit, and refresh the entry.
+        profile (bool): Profile this run even without an active profiler.
+        sections (iterable): Sections to compute among 'transactions',
+        'trades', 'drawdown' and 'trade_analysis'; all of them by default.
+        metrics_only (bool): Compute 'drawdown' and 'trade_analysis' only,
+        without any per-transaction bookkeeping.
 
+        Returns:
+        tuple: The backtrader strategy (None on a cache hit) and the analysis results.
+        """
+        sections = _select_sections(sections, metrics_only)
+
+        profiler = active_profiler()
+        own_profiler = None
+        if profiler is None and profile:
+            profiler = own_profiler = Profiler()
+            profiler.start()
+        try:
+            with phase('run'):
+                results, analysis_results = self._run(cache, force, profiler, sections, metrics_only)
+        finally:
+            if own_profiler is not None:
+                own_profiler.stop()
+
+        if profiler is not None:
+            if isinstance(analysis_results, AnalysisResults):
+                analysis_results = analysis_results.with_values(profile=profiler.report())
+            else:
+                analysis_results = dict(analysis_results, profile=profiler.report())
         return results, analysis_results
 
-def _format_trade_tracker(trade_analysis) -> dict[str, pd.DataFrame]:
-    result = {}
-    
-    for date, trades in trade_analysis.items():
-        for trade in trades:
-            ticker = trade['ticker']
-            if ticker not in result:
-                result[ticker] = []
-            trade_data = {'date': date, 'pnl': trade['pnl'], 'pnlcomm': trade['pnlcomm']}
-            result[ticker].append(trade_data)
-    
-    # Convert lists to DataFrames
-    for ticker, trade_list in result.items():
-        df = pd.DataFrame(trade_list)
-        df.set_index('date', inplace=True)
-        result[ticker] = df
+    def _run(self, cache, force, profiler, sections, metrics_only):
+        # Analyzers outside the sections (added by the caller) are always attached
+        unselected = {SECTIONS[section] for section in SECTIONS if section not in sections}
+        analyzers = {name: analyzer for name, analyzer in self.analyzers.items() if name not in unselected}
+
+        key = None
+        if cache is not None:
+            broker = self.cerebro.broker
+            key = ekeko.backtrader.result_key(
+                self.stock_dfs, self.strategy, self.strategy_kwargs,
+                cash=broker.startingcash,
+                commission=broker.comminfo[None].p.commission,
+                analyzers=_analyzer_fingerprint(analyzers)
+            )
+            if not force:
+                with phase('run.cache'):
+                    analysis_results = cache.get(key)
+                if analysis_results is not None:
+                    return None, analysis_results
+
+        if metrics_only:
+            # Without callbacks the emitter only prunes finished orders and trades
+            analyzers['ekeko_pruner'] = (ekeko.backtrader.StreamEmitter, {})
+        # The analyzers and profiling wrappers are for this run only
+        strats, added_analyzers = self.cerebro.strats, list(self.cerebro.analyzers)
+        try:
+            for name, (analyzer, kwargs) in analyzers.items():
+                if profiler is not None:
+                    analyzer = profiled_analyzer(analyzer, name, profiler)
+                self.cerebro.addanalyzer(analyzer, _name=name, **kwargs)
+            if profiler is not None:
+                self.cerebro.strats = [
+                    [(profiled_strategy(strategy, profiler), args, kwargs) for strategy, args, kwargs in strategies]
+                    for strategies in strats
+                ]
+
+            with phase('run.cerebro'):
+                # The standard observers record every buy and sell for plotting
+                results = self.cerebro.run(**({'stdstats': False} if metrics_only else {}))[0]
+        finally:
+            self.cerebro.strats = strats
+            self.cerebro.analyzers[:] = added_analyzers
+        analysis_results = self.format_analysis_results(results, sections)
+        if key is not None:
+            # Stored formatted, as a plain dict
+            cache.put(key, analysis_results)
+
+        return results, analysis_results
+
+def _select_sections(sections, metrics_only) -> list:
+    if sections is None:
+        return list(METRICS if metrics_only else SECTIONS)
+    sections = list(sections)
+    unknown = [section for section in sections if section not in SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown analysis sections {unknown}, expected some of {list(SECTIONS)}")
+    if metrics_only and not set(sections) <= set(METRICS):
+        raise ValueError(f"metrics_only runs only compute {list(METRICS)}, not {sections}")
+    return sections
+
+def _format_section(results, section):
+    analysis = getattr(results.analyzers, SECTIONS[section]).get_analysis()
+    if section == 'transactions':
+        return _format_transactions(analysis)
+    if section == 'trades':
+        return _format_trade_tracker(analysis)
+    if section == 'trade_analysis':
+        return _format_trade_analyzer_results(analysis)
+    return analysis
+
+def _analyzer_fingerprint(analyzers) -> list:
+    return [
+        (name, f"{analyzer.__module__}.{analyzer.__qualname__}", repr(sorted(kwargs.items())))
+        for name, (analyzer, kwargs) in analyzers.items()
+    ]
 
-    return result
+def _make_feed(df):
+    """PandasData feed for a DataFrame, the shared-memory feed for a `SharedFrame`, else a stream feed."""
+    if isinstance(df, ekeko.backtrader.SharedFrame):
+        return df.feed()
+    if isinstance(df, pd.DataFrame):
+        return bt.feeds.PandasData(dataname=df) # type: ignore
+    return ekeko.backtrader.StreamData(source=df)
+
+def _format_trade_tracker(trade_analysis) -> dict[str, pd.DataFrame]:
+    return _split_by_ticker(_trade_tracker_to_frame(trade_analysis))
 
 def _format_transactions(transactions_analysis):
-    result = {}
-    
-    for date, trades in transactions_analysis.items():
-        for trade in trades:
-            size, price, _, ticker, value = trade
-            if ticker not in result:
-                result[ticker] = []
-            trade_data = {'date': date, 'size': size, 'price': price, 'value': value}
-            result[ticker].append(trade_data)
-    
-    # Convert lists to DataFrames
-    for ticker, trade_list in result.items():
-        df = pd.DataFrame(trade_list)
-        df.set_index('date', inplace=True)
-        result[ticker] = df
+    return _split_by_ticker(_transactions_to_frame(transactions_analysis))
+
+def _trade_tracker_to_frame(trade_analysis) -> pd.DataFrame:
+    """Flatten the EkekoTradeTracker analysis into one long table with a ticker column."""
+    if isinstance(trade_analysis, pd.DataFrame):
+        # The columnar tracker already returns the long table
+        return trade_analysis
+    dates, trades = _flatten(trade_analysis)
+    df = pd.DataFrame.from_records(trades, columns=['ticker', 'pnl', 'pnlcomm'])
+    df.insert(0, 'date', dates)
+    return df
+
+def _transactions_to_frame(transactions_analysis) -> pd.DataFrame:
+    """Flatten the Transactions analysis into one long table with a ticker column."""
+    dates, entries = _flatten(transactions_analysis)
+    # Transactions entries are [size, price, sid, ticker, value]
+    df = pd.DataFrame(entries, columns=['size', 'price', 'sid', 'ticker', 'value'])
+    df = df[['ticker', 'size', 'price', 'value']]
+    df.insert(0, 'date', dates)
+    return df
+
+def _flatten(analysis):
+    """Entries of a date-keyed analysis as one flat list, with the matching dates repeated."""
+    keys = list(analysis.keys())
+    groups = list(analysis.values())
+    dates = pd.Index(keys).repeat([len(group) for group in groups])
+    entries = [entry for group in groups for entry in group]
+    return dates, entries
 
-    return result
+def _split_by_ticker(long_df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Split a long table into per-ticker frames indexed by date, in order of first appearance."""
+    if long_df.empty:
+        return {}
+    columns = [column for column in long_df.columns if column not in ('date', 'ticker')]
+    table = long_df.set_index('date')[columns]
+    tickers = np.asarray(long_df['ticker'], dtype=object)
+    return {ticker: df for ticker, df in table.groupby(tickers, sort=False)}
 
 def _format_trade_analyzer_results(trade_analysis):
     max_drawdown = trade_analysis.get('drawdown', {}).get('max', 0)
@@ -107,3 +396,25 @@ def _format_trade_analyzer_results(trade_analysis):
     }
     
     return metrics
+
+def _combine_trade_analysis(metrics_list) -> dict:
+    """Combine `_format_trade_analyzer_results` metrics of separate runs into one set."""
+    num_winners = sum(metrics['num_winners'] for metrics in metrics_list)
+    num_losers = sum(metrics['num_losers'] for metrics in metrics_list)
+
+    def weighted_average(key, weight):
+        total = sum(weight(metrics) for metrics in metrics_list)
+        if not total:
+            return 0
+        return sum(metrics[key] * weight(metrics) for metrics in metrics_list) / total
+
+    return {
+        'max_drawdown': max((metrics['max_drawdown'] for metrics in metrics_list), default=0),
+        'num_trades': sum(metrics['num_trades'] for metrics in metrics_list),
+        'num_winners': num_winners,
+        'num_losers': num_losers,
+        'avg_pnl_per_trade': weighted_average(
+            'avg_pnl_per_trade', lambda metrics: metrics['num_winners'] + metrics['num_losers']),
+        'avg_pnl_winning_trades': weighted_average('avg_pnl_winning_trades', lambda metrics: metrics['num_winners']),
+        'avg_pnl_losing_trades': weighted_average('avg_pnl_losing_trades', lambda metrics: metrics['num_losers'])
+    }
@@ -0,0 +1,182 @@
+import math
+import sys
+from multiprocessing import shared_memory
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+# Row order of the per-ticker block, matching the lines of a backtrader feed
+FEED_LINES = ('datetime', 'open', 'high', 'low', 'close', 'volume', 'openinterest')
+
+# Segments attached by this process, by name, so every frame of a store maps it once
+_attached = {}
+
+class SharedFrameStore:
+    """
+    Publishes the OHLCV arrays of many tickers once into shared memory.
+
+    Every ticker becomes a (7, rows) float64 block of backtrader date numbers
+    and open, high, low, close, volume, openinterest values, all packed in a
+    single `multiprocessing.shared_memory` segment. `frames` holds a small,
+    picklable `SharedFrame` handle per ticker: sending it to a worker costs a
+    few bytes and the worker maps the segment instead of copying the data.
+
+    The store owns the segment. Use it as a context manager, or call `close`
+    and `unlink` once the workers are done.
+
+    Parameters:
+    stock_dfs (dict): Dictionary of ticker symbols to OHLCV DataFrames, in
+    the layout `bt.feeds.PandasData` expects (DatetimeIndex, columns named
+    Open, High, Low, Close, Volume and optionally OpenInterest).
+    """
+
+    def __init__(self, stock_dfs: dict):
+        blocks = {ticker: _feed_block(df) for ticker, df in stock_dfs.items()}
+        size = sum(block.nbytes for block in blocks.values())
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        _attached[self.shm.name] = self.shm
+
+        self.frames = {}
+        offset = 0
+        for ticker, block in blocks.items():
+            target = np.ndarray(block.shape, dtype=np.float64, buffer=self.shm.buf, offset=offset)
+            target[:] = block
+            del target
+            self.frames[ticker] = SharedFrame(self.shm.name, offset, block.shape[1], ticker)
+            offset += block.nbytes
+
+    def __getitem__(self, ticker) -> 'SharedFrame':
+        return self.frames[ticker]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        self.unlink()
+
+    def close(self):
+        """Unmap the segment from this process."""
+        _attached.pop(self.shm.name, None)
+        self.shm.close()
+
+    def unlink(self):
+        """Free the segment, once no process needs it anymore."""
+        self.shm.unlink()
+
+class SharedFrame:
+    """
+    Picklable handle on one ticker of a `SharedFrameStore`.
+
+    Pass it to `EkekoCerebro.adddata` in place of the DataFrame.
+    """
+
+    def __init__(self, shm_name: str, offset: int, rows: int, ticker: str):
+        self.shm_name = shm_name
+        self.offset = offset
+        self.rows = rows
+        self.ticker = ticker
+
+    def __len__(self):
+        return self.rows
+
+    def __repr__(self):
+        return f"SharedFrame({self.ticker!r}, {self.rows} rows)"
+
+    def arrays(self) -> np.ndarray:
+        """Zero-copy (7, rows) view of the ticker's lines, see `FEED_LINES`."""
+        shm = _attached.get(self.shm_name)
+        if shm is None:
+            shm = _attach(self.shm_name)
+            _attached[self.shm_name] = shm
+        return np.ndarray((len(FEED_LINES), self.rows), dtype=np.float64, buffer=shm.buf, offset=self.offset)
+
+    def feed(self, **kwargs) -> 'SharedMemoryData':
+        """Create a backtrader data feed over the shared arrays."""
+        return SharedMemoryData(frame=self, **kwargs)
+
+class SharedMemoryData(bt.feed.DataBase):
+    """
+    backtrader data feed reading a `SharedFrame`.
+
+    Delivers the same bars as `bt.feeds.PandasData` over the source frame,
+    including the date numbers of a tz-aware index, without holding a
+    DataFrame. backtrader still copies each delivered bar into its own line
+    buffers, as it does for every feed.
+    """
+    params = (
+        ('frame', None),
+    )
+
+    def start(self):
+        super().start()
+        self._arrays = self.p.frame.arrays() # type: ignore
+        self._idx = -1
+
+    def stop(self):
+        super().stop()
+        self._arrays = None
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= self._arrays.shape[1]:
+            return False
+
+        # Missing columns are NaN, the value of lines PandasData leaves unmapped
+        for name, value in zip(FEED_LINES, self._arrays[:, self._idx].tolist()):
+            getattr(self.lines, name)[0] = value
+        return True
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _attach(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+def _feed_block(df: pd.DataFrame) -> np.ndarray:
+    block = np.full((len(FEED_LINES), len(df)), np.nan)
+    block[0] = date_numbers(df.index)
+
+    columns = {str(column).lower(): column for column in df.columns}
+    for position, name in enumerate(FEED_LINES[1:], start=1):
+        if name in columns:
+            block[position] = df[columns[name]].to_numpy(dtype=np.float64)
+    return block
+
+def date_numbers(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Vectorized `bt.date2num` over a DatetimeIndex, bit for bit.
+
+    Aware timestamps are converted to UTC first, as `bt.date2num` does.
+    `bt.date2num` sums the day ordinal and the hour, minute, second and
+    microsecond fractions with `math.fsum`. A single non-zero fraction (e.g.
+    daily bars) is one correctly rounded addition, so only rows with several
+    fall back to `math.fsum`.
+
+    Parameters:
+    index (pd.DatetimeIndex): Bar timestamps.
+
+    Returns:
+    np.ndarray: backtrader date numbers.
+    """
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    micros = index.to_numpy(dtype='datetime64[us]').astype(np.int64)
+
+    days, micros = np.divmod(micros, 86400 * 10**6)
+    seconds, microsecond = np.divmod(micros, 10**6)
+    hour, seconds = np.divmod(seconds, 3600)
+    minute, second = np.divmod(seconds, 60)
+
+    base = (days + 719163).astype(np.float64)
+    fractions = np.stack([hour / 24.0, minute / 1440.0, second / 86400.0, microsecond / 86400e6])
+    numbers = base + fractions.sum(axis=0)
+
+    several = np.count_nonzero(fractions, axis=0) > 1
+    for position in np.flatnonzero(several):
+        numbers[position] = math.fsum((base[position], *fractions[:, position]))
+    return numbers
@@ -0,0 +1,298 @@
+import pickle
+
+import backtrader as bt
+import pandas as pd
+from backtrader.utils import AutoOrderedDict
+
+from .analyzer import EkekoDrawDown, drawdown_periods
+from .cerebro import EkekoCerebro, _combine_trade_analysis
+from .walkforward import windowed_strategy, to_backtrader_datetime, _concat_per_ticker
+
+DRAWDOWN_KEYS = ('len', 'drawdown', 'moneydown')
+
+class Checkpoint:
+    """
+    State at the end of a backtest, to resume it once new bars arrive.
+
+    Holds the broker cash, the open positions and trades, the orders still
+    pending after the last bar, the drawdown peak and the last `warmup` bars
+    of every ticker. The tail of bars is fed again on resume (without calling
+    the strategy's `next`) so indicators pick up where they were; it must be
+    at least as long as the longest indicator period. Other attributes the
+    strategy keeps on itself are not part of the checkpoint.
+
+    Create one with `EkekoCerebro.checkpoint` and pass it to `resume`.
+    """
+
+    def __init__(self, strategy, strategy_kwargs, cash, commission, clock, tails,
+                 positions, trades, orders, drawdown):
+        self.strategy = strategy
+        self.strategy_kwargs = strategy_kwargs
+        self.cash = cash
+        self.commission = commission
+        self.clock = clock
+        self.tails = tails
+        self.positions = positions
+        self.trades = trades
+        self.orders = orders
+        self.drawdown = drawdown
+
+    def __repr__(self):
+        return f"Checkpoint({self.strategy.__name__}, {self.clock}, {len(self.tails)} tickers)"
+
+    def save(self, path: str):
+        """Pickle the checkpoint; the strategy class must be importable when loading."""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> 'Checkpoint':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+def make_checkpoint(results, stock_dfs: dict, strategy, strategy_kwargs: dict, commission, warmup=0) -> Checkpoint:
+    """
+    Checkpoint of a finished run.
+
+    Parameters:
+    results (bt.Strategy): Strategy instance returned by `EkekoCerebro.run`.
+    stock_dfs (dict): Dictionary of ticker symbols to the DataFrames of the run.
+    strategy (bt.Strategy): Strategy class to resume.
+    strategy_kwargs (dict): Parameters of the strategy.
+    commission (float): Broker commission.
+    warmup (int): Number of trailing bars kept per ticker to warm up indicators on resume.
+
+    Returns:
+    Checkpoint: The state to resume from.
+    """
+    broker = results.broker
+    tails = {ticker: df.iloc[-max(warmup, 1):] for ticker, df in stock_dfs.items() if len(df)}
+    clock = max(to_backtrader_datetime(df.index[-1]) for df in tails.values())
+
+    positions = {data._name: (position.size, position.price)
+                 for data, position in broker.positions.items() if position.size}
+
+    trades = {}
+    for data, trades_by_id in results._trades.items():
+        for tradeid, data_trades in trades_by_id.items():
+            if data_trades and data_trades[-1].isopen:
+                trades.setdefault(data._name, []).append(_trade_state(data_trades[-1], tradeid))
+
+    # Orders placed on the last bar (or still waiting for their price) fill on the next one
+    orders = [_order_state(order) for order in (*broker.submitted, *broker.pending)
+              if order is not None and order.alive()]
+
+    analyzer = results.analyzers.drawdown
+    drawdown = {key: analyzer.rets[key] for key in DRAWDOWN_KEYS}
+    drawdown['max'] = {key: analyzer.rets.max[key] for key in DRAWDOWN_KEYS}
+    drawdown['maxvalue'] = analyzer._maxvalue
+
+    return Checkpoint(strategy, dict(strategy_kwargs), broker.getcash(), commission, clock, tails,
+                      positions, trades, orders, drawdown)
+
+def resume(checkpoint: Checkpoint, stock_dfs: dict, analysis_results=None, warmup=None):
+    """
+    Resume a backtest from a checkpoint with new bars.
+
+    Only the checkpointed tail and the new bars are fed, so the cost follows
+    the amount of new data rather than the length of the history. Rows at or
+    before the checkpoint are dropped, so `stock_dfs` may hold the new bars
+    only or the whole updated history. Tickers missing from the checkpoint
+    start from scratch.
+
+    Parameters:
+    checkpoint (Checkpoint): State of the previous run.
+    stock_dfs (dict): Dictionary of ticker symbols to DataFrames with the new bars.
+    analysis_results (dict): Analysis results of the previous runs to merge
+    the new ones into, or None to return the results of the new bars only.
+    warmup (int): Tail length of the returned checkpoint; by default the
+    same as the given one.
+
+    Returns:
+    tuple: The backtrader strategy (None without new bars), the analysis
+    results and the checkpoint to resume from next time.
+    """
+    if warmup is None:
+        warmup = max((len(tail) for tail in checkpoint.tails.values()), default=0)
+
+    frames = {}
+    first_new = []
+    for ticker in [*checkpoint.tails, *[ticker for ticker in stock_dfs if ticker not in checkpoint.tails]]:
+        parts = [checkpoint.tails[ticker]] if ticker in checkpoint.tails else []
+        if ticker in stock_dfs:
+            df = stock_dfs[ticker]
+            new = df[_naive_utc(df.index) > checkpoint.clock]
+            if len(new):
+                parts.append(new)
+                first_new.append(to_backtrader_datetime(new.index[0]))
+        if parts:
+            frames[ticker] = pd.concat(parts) if len(parts) > 1 else parts[0]
+
+    if not first_new:
+        return None, analysis_results, checkpoint
+    trade_start = min(first_new)
+
+    ekeko_cerebro = EkekoCerebro()
+    broker = ekeko_cerebro.cerebro.broker
+    broker.setcash(checkpoint.cash)
+    broker.setcommission(commission=checkpoint.commission)
+    for ticker, df in frames.items():
+        ekeko_cerebro.adddata(df, name=ticker)
+    ekeko_cerebro.addstrategy(
+        resumed_strategy(checkpoint.strategy),
+        ekeko_trade_start=trade_start,
+        ekeko_checkpoint=checkpoint,
+        **checkpoint.strategy_kwargs
+    )
+    ekeko_cerebro.analyzers['drawdown'] = (ResumedDrawDown, {'seed': checkpoint.drawdown, 'trade_start': trade_start})
+
+    results, new_results = ekeko_cerebro.run()
+    if analysis_results is not None:
+        new_results = merge_analysis_results(analysis_results, new_results)
+    next_checkpoint = make_checkpoint(results, frames, checkpoint.strategy, checkpoint.strategy_kwargs,
+                                      checkpoint.commission, warmup=warmup)
+    return results, new_results, next_checkpoint
+
+def merge_analysis_results(previous: dict, new: dict) -> dict:
+    """
+    Append the analysis results of a resumed run to those of the runs before it.
+
+    Transactions and trades are concatenated per ticker, the drawdown
+    statistics of the resumed run already carry the history, its curve is
+    appended to the previous one and the trade analysis metrics are combined.
+    """
+    return {
+        'transactions': _concat_per_ticker([previous['transactions'], new['transactions']]),
+        'trades': _concat_per_ticker([previous['trades'], new['trades']]),
+        'drawdown': _merge_drawdown(previous['drawdown'], new['drawdown']),
+        'trade_analysis': _combine_trade_analysis([previous['trade_analysis'], new['trade_analysis']]),
+    }
+
+class ResumedDrawDown(EkekoDrawDown):
+    """
+    EkekoDrawDown that continues from a checkpointed state and ignores the warmup bars.
+    """
+    params = (
+        ('seed', None),
+        ('trade_start', None),
+    )
+
+    def start(self):
+        super().start()
+        self._seed = self.p.seed # type: ignore
+
+    def next(self):
+        if self._resumed():
+            super().next()
+
+    def _resumed(self):
+        return self.strategy.datetime.datetime(0) >= self.p.trade_start # type: ignore
+
+def resumed_strategy(strategy):
+    """
+    Subclass of `strategy` that restarts from its `ekeko_checkpoint` param.
+
+    Positions and open trades are restored when the run starts, the orders
+    pending at the checkpoint are placed again on its last bar, and `next` is
+    skipped before `ekeko_trade_start`, see `windowed_strategy`.
+    """
+    windowed = windowed_strategy(strategy)
+
+    def start(self):
+        windowed.start(self)
+        _restore(self, self.p.ekeko_checkpoint)
+        self._ekeko_orders = list(self.p.ekeko_checkpoint.orders)
+
+    def prenext(self):
+        _resubmit(self)
+        windowed.prenext(self)
+
+    def next(self):
+        _resubmit(self)
+        windowed.next(self)
+
+    return type(strategy.__name__, (windowed,), {
+        'params': (('ekeko_checkpoint', None),),
+        'start': start,
+        'prenext': prenext,
+        'next': next,
+        '__module__': strategy.__module__,
+    })
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _naive_utc(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index
+
+def _trade_state(trade, tradeid) -> dict:
+    return {
+        'tradeid': tradeid,
+        'size': trade.size,
+        'price': trade.price,
+        'value': trade.value,
+        'commission': trade.commission,
+        'pnl': trade.pnl,
+        'dtopen': trade.dtopen,
+        'bars_open': len(trade.data) - trade.baropen,
+        'barlen': trade.barlen,
+    }
+
+def _order_state(order) -> dict:
+    return {
+        'ticker': order.data._name,
+        'buy': order.isbuy(),
+        'size': abs(order.size),
+        'exectype': order.exectype,
+        'price': order.price,
+        'plimit': order.pricelimit,
+        'tradeid': order.tradeid,
+    }
+
+def _restore(strategy, checkpoint):
+    datas = {data._name: data for data in strategy.datas}
+    for ticker, (size, price) in checkpoint.positions.items():
+        strategy.broker.positions[datas[ticker]] = bt.position.Position(size, price)
+
+    for ticker, states in checkpoint.trades.items():
+        data = datas[ticker]
+        # The last tail bar is the last bar of the checkpointed run
+        tail_length = len(checkpoint.tails[ticker])
+        for state in states:
+            trade = bt.trade.Trade(data=data, tradeid=state['tradeid'], size=state['size'],
+                                   price=state['price'], value=state['value'], commission=state['commission'])
+            trade.pnl = state['pnl']
+            trade.pnlcomm = trade.pnl - trade.commission
+            trade.isopen = True
+            trade.long = trade.size > 0
+            trade.status = trade.Open
+            trade.dtopen = state['dtopen']
+            trade.baropen = tail_length - state['bars_open']
+            trade.barlen = state['barlen']
+            strategy._trades[data][state['tradeid']].append(trade)
+
+def _merge_drawdown(previous, new):
+    if 'curve' not in previous or 'curve' not in new:
+        return new
+    drawdown = AutoOrderedDict()
+    for key in DRAWDOWN_KEYS:
+        drawdown[key] = new[key]
+    for key in DRAWDOWN_KEYS:
+        drawdown.max[key] = new['max'][key]
+    drawdown.curve = pd.concat([previous['curve'], new['curve']])
+    drawdown.periods = drawdown_periods(drawdown.curve)
+    drawdown._close()
+    return drawdown
+
+def _resubmit(strategy):
+    if not strategy._ekeko_orders or strategy.datetime.datetime(0) < strategy.p.ekeko_checkpoint.clock:
+        return
+    datas = {data._name: data for data in strategy.datas}
+    for state in strategy._ekeko_orders:
+        place = strategy.buy if state['buy'] else strategy.sell
+        place(data=datas[state['ticker']], size=state['size'], exectype=state['exectype'],
+              price=state['price'], plimit=state['plimit'], tradeid=state['tradeid'])
+    strategy._ekeko_orders = []
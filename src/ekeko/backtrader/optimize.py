@@ -0,0 +1,115 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import backtrader as bt
+import pandas as pd
+
+from .cerebro import _format_trade_analyzer_results, _make_feed
+from .feeds import SharedFrameStore
+
+# Read-only state of a sweep worker, set once per process by `_init_worker`
+_worker_state = {}
+
+def param_combinations(param_grid: dict) -> list[dict]:
+    """
+    Expand a parameter grid into the list of its combinations.
+
+    Parameters:
+    param_grid (dict): Parameter name to list of values, e.g. {'pfast': [5, 11], 'pslow': [40]}.
+
+    Returns:
+    list: One dict of parameter values per combination, in grid order.
+    """
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+
+def sweep(strategy, param_grid: dict, stock_dfs: dict, cash=None, commission=None,
+          max_workers=None, chunksize=1, completed=None, shared_memory=False) -> pd.DataFrame:
+    """
+    Backtest every combination of a parameter grid across a process pool.
+
+    The frames are sent to each worker once, when it starts, and shared by
+    all the combinations it runs. With `shared_memory`, they are published
+    once into a `SharedFrameStore` instead and workers map them without a
+    copy, so worker memory does not grow with the universe. Frames that are
+    already `SharedFrame` handles are always passed as they are. Each
+    combination returns the
+    `_format_trade_analyzer_results` metrics plus the final broker value.
+
+    Parameters:
+    strategy (bt.Strategy): Strategy class, importable from the workers.
+    param_grid (dict): Parameter name to list of values.
+    stock_dfs (dict): Dictionary of ticker symbols to DataFrames.
+    cash (float): Starting cash, or None for the backtrader default.
+    commission (float): Broker commission, or None for the backtrader default.
+    max_workers (int): Number of worker processes; 1 runs in this process.
+    chunksize (int): Number of combinations sent to a worker at a time.
+    completed (pd.DataFrame): Output of an earlier sweep; combinations found there are not run again.
+    shared_memory (bool): Publish the frames in shared memory for the workers.
+
+    Returns:
+    pd.DataFrame: One row per combination, with the parameter columns first.
+    """
+    names = list(param_grid)
+    combinations = param_combinations(param_grid)
+
+    done = {}
+    if completed is not None and len(completed):
+        for row in completed.to_dict('records'):
+            done[_combination_key(row, names)] = row
+
+    pending = [params for params in combinations if _combination_key(params, names) not in done]
+
+    store = None
+    if shared_memory and pending:
+        store = SharedFrameStore(stock_dfs)
+        stock_dfs = store.frames
+
+    state = (strategy, stock_dfs, cash, commission)
+    try:
+        if max_workers == 1:
+            _init_worker(*state)
+            results = list(map(_run_combination, pending))
+        elif pending:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=state) as executor:
+                results = list(executor.map(_run_combination, pending, chunksize=chunksize))
+        else:
+            results = []
+    finally:
+        _worker_state.clear()
+        if store is not None:
+            store.close()
+            store.unlink()
+
+    for params, metrics in zip(pending, results):
+        done[_combination_key(params, names)] = {**params, **metrics}
+
+    rows = [done[_combination_key(params, names)] for params in combinations]
+    return pd.DataFrame(rows)
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _combination_key(row, names):
+    return tuple(row[name] for name in names)
+
+def _init_worker(strategy, stock_dfs, cash, commission):
+    _worker_state.update(strategy=strategy, stock_dfs=stock_dfs, cash=cash, commission=commission)
+
+def _run_combination(params):
+    cerebro = bt.Cerebro()
+    if _worker_state['cash'] is not None:
+        cerebro.broker.setcash(_worker_state['cash'])
+    if _worker_state['commission'] is not None:
+        cerebro.broker.setcommission(commission=_worker_state['commission'])
+
+    for ticker, stock_df in _worker_state['stock_dfs'].items():
+        cerebro.adddata(_make_feed(stock_df), name=ticker)
+    cerebro.addstrategy(_worker_state['strategy'], **params)
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='tradeanalyzer')
+
+    results = cerebro.run()[0]
+    metrics = _format_trade_analyzer_results(results.analyzers.tradeanalyzer.get_analysis())
+    metrics['final_value'] = cerebro.broker.getvalue()
+    return metrics
@@ -1,21 +1,52 @@
+from ..profiling import profiled
+
 class EkekoResultAnalyzer:
 
     def __init__(self, analysis_result):
         self.analysis_result = analysis_result
-        self.transactions = analysis_result['transactions']
-        self.trades = analysis_result['trades']
-        self.drawdown_dict = analysis_result['drawdown']
-        self.trade_analysis = analysis_result['trade_analysis']
 
+    # Read on use, so lazily formatted sections are only formatted when shown
+    @property
+    def transactions(self):
+        return self.analysis_result['transactions']
+
+    @property
+    def trades(self):
+        return self.analysis_result['trades']
+
+    @property
+    def drawdown_dict(self):
+        return self.analysis_result['drawdown']
+
+    @property
+    def trade_analysis(self):
+        return self.analysis_result['trade_analysis']
+
+    @classmethod
+    def open(cls, store, run_id: str) -> 'EkekoResultAnalyzer':
+        """
+        Analyzer over a run of a `ResultStore`; per-ticker frames are read on first access.
+        """
+        return cls(store.load(run_id))
+
+    def save(self, store, run_id=None, **metadata) -> str:
+        """
+        Save the analysis results to a `ResultStore`, see `ResultStore.save`.
+        """
+        return store.save(self.analysis_result, run_id=run_id, **metadata)
+
+    @profiled('print')
     def print(self):
-        _print_header('Transactions')
-        self.show_transactions()
-        _print_header('Trades')
-        self.show_trades()
-        _print_header('Drawdown')
-        self.show_drawdown()
-        _print_header('Trade Analysis')
-        self.show_trade_analysis()
+        """Print every section of the analysis results; sections the run did not compute are skipped."""
+        for section, title, show in [
+            ('transactions', 'Transactions', self.show_transactions),
+            ('trades', 'Trades', self.show_trades),
+            ('drawdown', 'Drawdown', self.show_drawdown),
+            ('trade_analysis', 'Trade Analysis', self.show_trade_analysis),
+        ]:
+            if section in self.analysis_result:
+                _print_header(title)
+                show()
 
     def show_drawdown(self):
         drawdown_dict = self.drawdown_dict
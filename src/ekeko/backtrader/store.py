@@ -0,0 +1,303 @@
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Mapping
+from datetime import datetime
+from urllib.parse import quote
+
+import pandas as pd
+from backtrader.utils import AutoOrderedDict
+
+from .cerebro import _format_trade_analyzer_results
+
+# Per-ticker tables of `analysis_results`, each stored as a dataset partitioned by run and ticker
+TABLES = ('transactions', 'trades')
+RUNS_DIRECTORY = 'runs'
+# Drawdown curve and periods of each run, one Parquet file each under run_id=<id>/
+DRAWDOWN_DIRECTORY = 'drawdown'
+DRAWDOWN_FRAMES = ('curve', 'periods')
+DRAWDOWN_KEYS = ('len', 'drawdown', 'moneydown')
+TICKERS_FILE = '_tickers.json'
+# Metadata column listing the sections a run was saved with, as JSON
+SECTIONS_COLUMN = 'sections'
+SECTIONS = (*TABLES, 'drawdown', 'trade_analysis')
+
+class ResultStore:
+    """
+    Columnar on-disk store of backtest results.
+
+    Every saved run gets an id. The per-ticker transactions and trades frames
+    go to Parquet datasets partitioned by run id and ticker, under
+    `<root>/transactions/run_id=<id>/ticker=<ticker>/` and the same for
+    trades. Each run also gets a one-row metadata table under
+    `<root>/runs/` holding the drawdown, the trade analysis metrics and the
+    caller's metadata, and its drawdown curve and periods go to
+    `<root>/drawdown/run_id=<id>/`. `runs` reads just that table, `load` opens a run
+    lazily and `transactions`/`trades` query across runs, reading only the
+    partitions and columns asked for. Runs computed with only some sections
+    (see `EkekoCerebro.run`) are stored and loaded with just those.
+
+    Requires pyarrow.
+
+    Parameters:
+    root (str): Directory of the store, created if needed.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, RUNS_DIRECTORY), exist_ok=True)
+
+    def save(self, analysis_results: dict, run_id=None, **metadata) -> str:
+        """
+        Store the analysis results of a run.
+
+        Parameters:
+        analysis_results (dict): Output of `EkekoCerebro.run` (or a stored run).
+        run_id (str): Id of the run; a new time-ordered id by default. An
+        existing run with the same id is replaced.
+        **metadata: Extra values recorded in the metadata table, e.g. the
+        strategy name or parameters. Values that are not scalars are stored
+        as JSON.
+
+        Returns:
+        str: The run id.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if run_id is None:
+            run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.delete(run_id)
+
+        sections = [section for section in SECTIONS if section in analysis_results]
+        for table in TABLES:
+            if table not in analysis_results:
+                continue
+            run_directory = self._run_directory(table, run_id)
+            for ticker, df in analysis_results[table].items():
+                directory = os.path.join(run_directory, f"ticker={quote(str(ticker), safe='')}")
+                os.makedirs(directory, exist_ok=True)
+                frame = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+                pq.write_table(frame, os.path.join(directory, 'part-0.parquet'))
+            if analysis_results[table]:
+                # Keeps the ticker order; dataset discovery skips files starting with '_'
+                with open(os.path.join(run_directory, TICKERS_FILE), 'w') as f:
+                    json.dump([str(ticker) for ticker in analysis_results[table]], f)
+
+        row = {'run_id': run_id, 'saved': pd.Timestamp.now()}
+        row.update({key: _scalar(value) for key, value in metadata.items()})
+        row[SECTIONS_COLUMN] = json.dumps(sections)
+        if 'drawdown' in analysis_results:
+            row.update(_flatten_drawdown(analysis_results['drawdown']))
+            _write_drawdown_frames(self._run_directory(DRAWDOWN_DIRECTORY, run_id), analysis_results['drawdown'])
+        if 'trade_analysis' in analysis_results:
+            row.update(analysis_results['trade_analysis'])
+        pd.DataFrame([row]).to_parquet(self._metadata_path(run_id), index=False)
+        return run_id
+
+    def runs(self, columns=None) -> pd.DataFrame:
+        """
+        Metadata table of every stored run, indexed by run id, oldest first.
+
+        Parameters:
+        columns (list): Columns to read, or None for all.
+
+        Returns:
+        pd.DataFrame: One row per run.
+        """
+        paths = sorted(
+            os.path.join(self.root, RUNS_DIRECTORY, name)
+            for name in os.listdir(os.path.join(self.root, RUNS_DIRECTORY))
+            if name.endswith('.parquet')
+        )
+        if columns is not None:
+            columns = ['run_id', 'saved', *[column for column in columns if column not in ('run_id', 'saved')]]
+        frames = [pd.read_parquet(path, columns=columns) for path in paths]
+        if not frames:
+            return pd.DataFrame(columns=columns or ['run_id', 'saved']).set_index('run_id')
+        return pd.concat(frames, ignore_index=True).sort_values(['saved', 'run_id']).set_index('run_id')
+
+    def load(self, run_id: str) -> 'StoredRun':
+        """
+        Open a stored run.
+
+        Only the metadata row is read; the per-ticker frames are read when
+        they are first accessed.
+
+        Returns:
+        StoredRun: Mapping with the keys of `analysis_results`.
+        """
+        if not os.path.exists(self._metadata_path(run_id)):
+            raise KeyError(run_id)
+        return StoredRun(self, run_id)
+
+    def delete(self, run_id: str):
+        """Remove a run, if stored."""
+        for table in (*TABLES, DRAWDOWN_DIRECTORY):
+            shutil.rmtree(self._run_directory(table, run_id), ignore_errors=True)
+        if os.path.exists(self._metadata_path(run_id)):
+            os.remove(self._metadata_path(run_id))
+
+    def transactions(self, run_ids=None, tickers=None, columns=None, filter=None) -> pd.DataFrame:
+        """
+        Transactions across runs as one long table, see `query`.
+        """
+        return self.query('transactions', run_ids=run_ids, tickers=tickers, columns=columns, filter=filter)
+
+    def trades(self, run_ids=None, tickers=None, columns=None, filter=None) -> pd.DataFrame:
+        """
+        Trades across runs as one long table, see `query`.
+        """
+        return self.query('trades', run_ids=run_ids, tickers=tickers, columns=columns, filter=filter)
+
+    def query(self, table: str, run_ids=None, tickers=None, columns=None, filter=None) -> pd.DataFrame:
+        """
+        Read rows of a table across runs.
+
+        Run ids and tickers prune whole partitions, so unselected runs and
+        tickers are never opened; `filter` is pushed down to the row groups.
+
+        Parameters:
+        table (str): 'transactions' or 'trades'.
+        run_ids (list): Runs to read, or None for all.
+        tickers (list): Tickers to read, or None for all.
+        columns (list): Data columns to read besides date, run_id and ticker, or None for all.
+        filter (pyarrow.compute.Expression): Row filter, e.g. `pc.field('pnlcomm') < 0`.
+
+        Returns:
+        pd.DataFrame: Long table with the date, run_id and ticker columns first.
+        """
+        import pyarrow.dataset as ds
+
+        dataset = self._dataset(table)
+        if dataset is None:
+            return pd.DataFrame(columns=['date', 'run_id', 'ticker', *(columns or [])])
+
+        expression = filter
+        for field, values in (('run_id', run_ids), ('ticker', tickers)):
+            if values is not None:
+                condition = ds.field(field).isin([str(value) for value in values])
+                expression = condition if expression is None else expression & condition
+
+        if columns is not None:
+            columns = ['date', 'run_id', 'ticker', *columns]
+        df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+        front = ['date', 'run_id', 'ticker']
+        return df[front + [column for column in df.columns if column not in front]]
+
+    def _dataset(self, table):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        directory = os.path.join(self.root, table)
+        if not os.path.isdir(directory) or not os.listdir(directory):
+            return None
+        partitioning = ds.partitioning(pa.schema([('run_id', pa.string()), ('ticker', pa.string())]), flavor='hive')
+        return ds.dataset(directory, format='parquet', partitioning=partitioning)
+
+    def _run_directory(self, table, run_id):
+        return os.path.join(self.root, table, f"run_id={quote(str(run_id), safe='')}")
+
+    def _metadata_path(self, run_id):
+        return os.path.join(self.root, RUNS_DIRECTORY, f"{quote(str(run_id), safe='')}.parquet")
+
+class StoredRun(Mapping):
+    """
+    Analysis results of a run in a `ResultStore`, read lazily.
+
+    Has the keys of the sections the run was saved with, so it can be passed
+    to `EkekoResultAnalyzer`. 'transactions' and 'trades' are mappings of ticker
+    to DataFrame that read a ticker's file on first access; 'drawdown' and
+    'trade_analysis' come from the metadata row, with the drawdown curve and
+    periods read from their own tables. `metadata` holds the whole row.
+    """
+
+    def __init__(self, store: ResultStore, run_id: str):
+        self.store = store
+        self.run_id = run_id
+        self.metadata = pd.read_parquet(store._metadata_path(run_id)).to_dict('records')[0]
+        # Runs saved before sections were recorded have all of them
+        sections = json.loads(self.metadata.get(SECTIONS_COLUMN) or json.dumps(SECTIONS))
+        self._results = {}
+        for table in TABLES:
+            if table in sections:
+                self._results[table] = _StoredFrames(store._run_directory(table, run_id))
+        if 'drawdown' in sections:
+            self._results['drawdown'] = _unflatten_drawdown(self.metadata, store._run_directory(DRAWDOWN_DIRECTORY, run_id))
+        if 'trade_analysis' in sections:
+            self._results['trade_analysis'] = _trade_analysis(self.metadata)
+
+    def __getitem__(self, key):
+        return self._results[key]
+
+    def __iter__(self):
+        return iter(self._results)
+
+    def __len__(self):
+        return len(self._results)
+
+    def __repr__(self):
+        return f"StoredRun({self.run_id!r})"
+
+###############################################################################
+### Utilities
+###############################################################################
+
+class _StoredFrames(Mapping):
+    """Ticker -> DataFrame over the partitions of one run, each read on first access."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._frames = {}
+        self._paths = {}
+        if os.path.isdir(directory):
+            with open(os.path.join(directory, TICKERS_FILE)) as f:
+                for ticker in json.load(f):
+                    self._paths[ticker] = os.path.join(directory, f"ticker={quote(ticker, safe='')}", 'part-0.parquet')
+
+    def __getitem__(self, ticker):
+        if ticker not in self._frames:
+            self._frames[ticker] = pd.read_parquet(self._paths[ticker]).set_index('date')
+        return self._frames[ticker]
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+def _scalar(value):
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    return json.dumps(value, default=str, sort_keys=True)
+
+def _flatten_drawdown(drawdown) -> dict:
+    row = {f"drawdown_{key}": drawdown[key] for key in DRAWDOWN_KEYS}
+    row.update({f"drawdown_max_{key}": drawdown['max'][key] for key in DRAWDOWN_KEYS})
+    return row
+
+def _write_drawdown_frames(directory, drawdown):
+    frames = {name: drawdown[name] for name in DRAWDOWN_FRAMES if name in drawdown}
+    if frames:
+        os.makedirs(directory, exist_ok=True)
+    for name, df in frames.items():
+        df.to_parquet(os.path.join(directory, f"{name}.parquet"))
+
+def _unflatten_drawdown(row, directory) -> AutoOrderedDict:
+    drawdown = AutoOrderedDict()
+    for key in DRAWDOWN_KEYS:
+        drawdown[key] = row[f"drawdown_{key}"]
+    for key in DRAWDOWN_KEYS:
+        drawdown.max[key] = row[f"drawdown_max_{key}"]
+    # Runs saved without a curve (e.g. by bt.analyzers.DrawDown) have only the statistics
+    for name in DRAWDOWN_FRAMES:
+        path = os.path.join(directory, f"{name}.parquet")
+        if os.path.exists(path):
+            drawdown[name] = pd.read_parquet(path)
+    drawdown._close()
+    return drawdown
+
+def _trade_analysis(row) -> dict:
+    # Same keys and order as `_format_trade_analyzer_results`
+    return {key: row[key] for key in _format_trade_analyzer_results({})}
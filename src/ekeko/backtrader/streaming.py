@@ -0,0 +1,166 @@
+import asyncio
+
+import backtrader as bt
+import pandas as pd
+
+from .feeds import FEED_LINES
+
+class StreamData(bt.feed.DataBase):
+    """
+    backtrader data feed pulling bars from an iterator or an asyncio queue.
+
+    Each item is a `(timestamp, bar)` pair, `bar` being a mapping with the
+    Open, High, Low, Close, Volume and optionally OpenInterest values (any
+    case). Timestamps are converted like `bt.feeds.PandasData` does, so
+    aware ones end up in UTC. Fetching blocks until the next bar arrives and
+    the feed ends when the iterator is exhausted or the queue yields None.
+
+    An asyncio queue is read from its event loop (`loop` param) while the
+    backtest runs in another thread, see `EkekoCerebro.run_streaming_async`.
+    """
+    params = (
+        ('source', None),
+        ('loop', None),
+    )
+
+    def start(self):
+        super().start()
+        source = self.p.source # type: ignore
+        if isinstance(source, asyncio.Queue):
+            source = queue_iterator(source, self.p.loop) # type: ignore
+        self._bars = iter(source)
+        self._next_bar = None
+        self._rewound = 0
+        self._widened = False
+
+    def load(self):
+        # Fetch the bar before the base class moves the line pointers: undoing
+        # that move on an exhausted stream drops a value from every bounded
+        # (exactbars) buffer, and finished feeds are polled on every bar
+        if self._next_bar is None:
+            self._next_bar = next(self._bars, None)
+            if self._next_bar is None:
+                return False
+        return super().load()
+
+    def rewind(self, size=1):
+        # cerebro steps back feeds whose bar is later than the current time.
+        # Full exactbars buffers ignore a plain index move, which would leave
+        # the later bar visible at [0]; force it and remember the bar is held
+        for line in self.lines:
+            line.set_idx(line._idx - size, force=True)
+            line.lencount -= size
+        self._rewound += size
+
+    def next(self, datamaster=None, ticks=True):
+        if not self._widened:
+            # Buffers are sized once the indicators are built: one extra slot
+            # keeps their full lookback reachable from a rewound bar
+            self._widened = True
+            for line in self.lines:
+                if line.mode == line.QBuffer:
+                    line.minbuffer(line.maxlen + 1)
+
+        if not self._rewound:
+            return super().next(datamaster, ticks)
+
+        # The held bar is still in the buffer: step onto it instead of loading
+        self._rewound -= 1
+        self.advance(ticks=ticks)
+        if datamaster is not None and self.lines.datetime[0] > datamaster.lines.datetime[0]:
+            self.rewind()
+            return False
+        if ticks:
+            self._tick_fill()
+        return True
+
+    def _load(self):
+        timestamp, bar = self._next_bar
+        self._next_bar = None
+
+        self.lines.datetime[0] = bt.date2num(pd.Timestamp(timestamp).to_pydatetime())
+        values = {str(name).lower(): value for name, value in bar.items()}
+        for name in FEED_LINES[1:]:
+            # Missing values are NaN, as for the lines PandasData leaves unmapped
+            getattr(self.lines, name)[0] = float(values.get(name, float('nan')))
+        return True
+
+class StreamEmitter(bt.Analyzer):
+    """
+    Emits transactions and closed trades through callbacks as they happen.
+
+    `on_transaction` receives a dict with the date, ticker, size, price and
+    value of the executions of a ticker on a bar, the rows of the
+    transactions frames;
+    `on_trade` the date, ticker, pnl and pnlcomm of every closed trade. The
+    analyzer keeps nothing beyond the current bar and prunes the finished
+    orders and trades backtrader would otherwise accumulate for the whole run.
+    """
+    params = (
+        ('on_transaction', None),
+        ('on_trade', None),
+    )
+
+    def start(self):
+        # Executions of the current bar by ticker, merged like bt.analyzers.Transactions does
+        self._positions = {}
+
+    def notify_order(self, order):
+        if self.p.on_transaction is None or order.status not in (order.Partial, order.Completed): # type: ignore
+            return
+        position = self._positions.setdefault(order.data._name, bt.position.Position())
+        for exbit in order.executed.iterpending():
+            position.update(exbit.size, exbit.price)
+
+    def notify_trade(self, trade):
+        callback = self.p.on_trade # type: ignore
+        if callback is not None and trade.isclosed:
+            callback({
+                'date': bt.num2date(trade.dtclose),
+                'ticker': trade.data._name,
+                'pnl': trade.pnl,
+                'pnlcomm': trade.pnlcomm,
+            })
+
+    def next(self):
+        if self._positions:
+            date = self.strategy.datetime.datetime()
+            for ticker, position in self._positions.items():
+                if position.size:
+                    self.p.on_transaction({ # type: ignore
+                        'date': date,
+                        'ticker': ticker,
+                        'size': position.size,
+                        'price': position.price,
+                        'value': -position.size * position.price,
+                    })
+            self._positions.clear()
+
+        strategy = self.strategy
+        broker = strategy.broker
+        broker.orders = [order for order in broker.orders if order.alive()]
+        # Notified order snapshots, only ever appended to
+        del strategy._orders[:]
+        # New executions only ever update the last trade of a data and trade id
+        for trades_by_id in strategy._trades.values():
+            for trades in trades_by_id.values():
+                del trades[:-1]
+
+def queue_iterator(queue: asyncio.Queue, loop):
+    """
+    Blocking iterator over an asyncio queue, for use outside its event loop.
+
+    Stops at the first None item.
+
+    Parameters:
+    queue (asyncio.Queue): Queue filled by a coroutine.
+    loop (asyncio.AbstractEventLoop): Event loop the queue belongs to.
+
+    Yields:
+    The queue items.
+    """
+    while True:
+        item = asyncio.run_coroutine_threadsafe(queue.get(), loop).result()
+        if item is None:
+            return
+        yield item
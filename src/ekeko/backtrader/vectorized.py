@@ -0,0 +1,352 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from .analyzer import drawdown_analysis
+from .cerebro import EkekoCerebro, _split_by_ticker
+
+DEFAULT_CASH = 10000.0
+
+def vectorized_backtest(stock_dfs: dict, entries: dict, exits: dict, cash=DEFAULT_CASH, stake=1,
+                        commission=0.0) -> dict:
+    """
+    Backtest long-only entry/exit signals with array operations.
+
+    Follows backtrader's default broker: a signal on a bar's close places a
+    market order that fills at the next bar's open, the position size is
+    `stake` and commission is a fraction of the traded value. When flat,
+    an entry buys; when long, an exit sells; an exit wins over an entry on
+    the same bar. Orders are never rejected for lack of cash.
+
+    The result has the same layout as `EkekoCerebro.format_analysis_results`,
+    so `EkekoResultAnalyzer` and `ekeko.viz.plot` work on it unchanged.
+    Dates are reported the way backtrader does (naive, UTC for a tz-aware
+    index). `cross_check` replays the same signals through backtrader.
+
+    Parameters:
+    stock_dfs (dict): Dictionary of ticker symbols to OHLCV DataFrames.
+    entries (dict): Ticker symbol to boolean entry signals, one per bar (array or Series).
+    exits (dict): Ticker symbol to boolean exit signals, one per bar (array or Series).
+    cash (float): Starting cash.
+    stake (int): Number of shares bought on each entry.
+    commission (float): Commission as a fraction of the traded value.
+
+    Returns:
+    dict: Analysis results with the keys 'transactions', 'trades', 'drawdown' and 'trade_analysis'.
+    """
+    transaction_rows = []
+    trade_rows = []
+    cash_flows = []
+    holdings = []
+    opened = 0
+    pnlcomms = []
+
+    for order, (ticker, df) in enumerate(stock_dfs.items()):
+        opens = df['Open'].to_numpy(dtype=np.float64)
+        closes = df['Close'].to_numpy(dtype=np.float64)
+        dates = backtrader_dates(df.index)
+        held = held_positions(_signal(entries, ticker, df), _signal(exits, ticker, df))
+
+        # A position change at a bar is an order filled at its open
+        changes = np.diff(held, prepend=0)
+        fills = np.flatnonzero(changes)
+        sizes = changes[fills] * stake
+        prices = opens[fills]
+        fees = np.abs(sizes) * commission * prices
+        for fill, size, price in zip(fills, sizes.tolist(), prices.tolist()):
+            transaction_rows.append((dates[fill], order, ticker, size, price, -size * price))
+
+        buys, sells = fills[sizes > 0], fills[sizes < 0]
+        entry_prices, exit_prices = opens[buys[:len(sells)]], opens[sells]
+        pnl = stake * (exit_prices - entry_prices)
+        pnlcomm = pnl - (stake * commission * entry_prices + stake * commission * exit_prices)
+        for sell, trade_pnl, trade_pnlcomm in zip(sells, pnl.tolist(), pnlcomm.tolist()):
+            trade_rows.append((dates[sell], order, ticker, trade_pnl, trade_pnlcomm))
+        opened += len(buys)
+        pnlcomms.append(pnlcomm)
+
+        flow = np.zeros(len(df))
+        flow[fills] = -sizes * prices - fees
+        cash_flows.append(pd.Series(flow, index=dates))
+        holdings.append(pd.Series(held * stake * closes, index=dates))
+
+    values = portfolio_values(cash, cash_flows, holdings)
+    return {
+        'transactions': _split_rows(transaction_rows, ['size', 'price', 'value']),
+        'trades': _split_rows(trade_rows, ['pnl', 'pnlcomm']),
+        'drawdown': drawdown_analysis(values.to_numpy(), values.index),
+        'trade_analysis': trade_metrics(opened, np.concatenate(pnlcomms) if pnlcomms else np.empty(0)),
+    }
+
+def vectorized_screen(stock_dfs: dict, signal_fn, cash=DEFAULT_CASH, stake=1, commission=0.0,
+                      block_size=256) -> pd.DataFrame:
+    """
+    Screen a whole universe at once on a dates x tickers price matrix.
+
+    Tickers are aligned on the union of their dates and processed in blocks
+    of `block_size` columns, which bounds peak memory to one block. Each
+    ticker is backtested on its own, as a portfolio of `cash`, with the
+    rules of `vectorized_backtest` and no Python loop over tickers or bars.
+    Dates where a ticker has no bar are masked out: it cannot trade there,
+    an order placed on its last bar fills on its next bar, and it is valued
+    at its last close.
+
+    Parameters:
+    stock_dfs (dict): Dictionary of ticker symbols to OHLCV DataFrames.
+    signal_fn (callable): Called with the closes of a block, a dates x tickers
+    DataFrame that is NaN where a ticker has no bar, and returning the
+    (entries, exits) boolean matrices of the same shape.
+    cash (float): Starting cash of every ticker.
+    stake (int): Number of shares bought on each entry.
+    commission (float): Commission as a fraction of the traded value.
+    block_size (int): Number of tickers per block.
+
+    Returns:
+    pd.DataFrame: One row of metrics per ticker.
+    """
+    tickers = list(stock_dfs)
+    calendar = None
+    for df in stock_dfs.values():
+        dates = backtrader_dates(df.index)
+        calendar = dates if calendar is None else calendar.union(dates)
+
+    blocks = []
+    for first in range(0, len(tickers), block_size):
+        block = tickers[first:first + block_size]
+        opens = _aligned(stock_dfs, block, 'Open', calendar)
+        closes = _aligned(stock_dfs, block, 'Close', calendar)
+        entries, exits = signal_fn(closes)
+        blocks.append(_screen_block(opens.to_numpy(), closes.to_numpy(), np.asarray(entries, dtype=bool),
+                                    np.asarray(exits, dtype=bool), cash, stake, commission, block))
+
+    if not blocks:
+        return pd.DataFrame()
+    return pd.concat(blocks)
+
+class SignalStrategy(bt.Strategy):
+    """
+    Event-driven twin of `vectorized_backtest`: trades precomputed signals.
+
+    Signals are looked up by data name and bar number. Each data is only
+    evaluated on the bars it delivers itself, including before every data
+    has started.
+    """
+    params = dict(
+        entries=None,
+        exits=None,
+        stake=1,
+    )
+
+    def start(self):
+        self._seen = {}
+
+    def prenext(self):
+        self.next()
+
+    def next(self):
+        for data in self.datas:
+            bar = len(data)
+            if not bar or self._seen.get(data._name) == bar:
+                continue
+            self._seen[data._name] = bar
+
+            exit_signal = self.p.exits[data._name][bar - 1] # type: ignore
+            entry_signal = self.p.entries[data._name][bar - 1] # type: ignore
+            if self.getposition(data).size:
+                if exit_signal:
+                    self.sell(data=data, size=self.p.stake) # type: ignore
+            elif entry_signal and not exit_signal:
+                self.buy(data=data, size=self.p.stake) # type: ignore
+
+def cross_check(stock_dfs: dict, entries: dict, exits: dict, cash=DEFAULT_CASH, stake=1, commission=0.0,
+                rtol=1e-9) -> list:
+    """
+    Run the same signals through `vectorized_backtest` and `EkekoCerebro` and compare.
+
+    The broker's cash check is turned off, as the vectorized engine never
+    rejects an order.
+
+    Parameters:
+    stock_dfs (dict): Dictionary of ticker symbols to OHLCV DataFrames.
+    entries (dict): Ticker symbol to boolean entry signals.
+    exits (dict): Ticker symbol to boolean exit signals.
+    cash (float): Starting cash.
+    stake (int): Number of shares bought on each entry.
+    commission (float): Commission as a fraction of the traded value.
+    rtol (float): Relative tolerance on monetary values, which both engines sum in a different order.
+
+    Returns:
+    list: Descriptions of the differences; empty when both engines agree.
+    """
+    vectorized = vectorized_backtest(stock_dfs, entries, exits, cash=cash, stake=stake, commission=commission)
+
+    ekeko_cerebro = EkekoCerebro()
+    broker = ekeko_cerebro.cerebro.broker
+    broker.setcash(cash)
+    broker.setcommission(commission=commission)
+    broker.set_checksubmit(False)
+    for ticker, df in stock_dfs.items():
+        ekeko_cerebro.adddata(df, name=ticker)
+    ekeko_cerebro.addstrategy(
+        SignalStrategy,
+        entries={ticker: _signal(entries, ticker, df) for ticker, df in stock_dfs.items()},
+        exits={ticker: _signal(exits, ticker, df) for ticker, df in stock_dfs.items()},
+        stake=stake,
+    )
+    _, event_driven = ekeko_cerebro.run()
+
+    differences = []
+    for section in ['transactions', 'trades']:
+        expected, actual = event_driven[section], vectorized[section]
+        if sorted(expected) != sorted(actual):
+            differences.append(f"{section}: tickers {sorted(expected)} != {sorted(actual)}")
+            continue
+        for ticker in expected:
+            try:
+                pd.testing.assert_frame_equal(expected[ticker], actual[ticker], check_dtype=False, rtol=rtol)
+            except AssertionError as error:
+                differences.append(f"{section}[{ticker}]: {error}")
+
+    for key, value in event_driven['trade_analysis'].items():
+        if not np.isclose(value, vectorized['trade_analysis'][key], rtol=rtol):
+            differences.append(f"trade_analysis[{key}]: {value} != {vectorized['trade_analysis'][key]}")
+
+    for key in ['len', 'drawdown', 'moneydown']:
+        for name, expected, actual in [
+            (key, event_driven['drawdown'][key], vectorized['drawdown'][key]),
+            (f"max.{key}", event_driven['drawdown']['max'][key], vectorized['drawdown']['max'][key]),
+        ]:
+            if not np.isclose(expected, actual, rtol=rtol, atol=1e-9):
+                differences.append(f"drawdown[{name}]: {expected} != {actual}")
+
+    return differences
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def held_positions(entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """
+    Position (0 or 1) held during each bar, after the fill at its open.
+
+    Works along axis 0, so a dates x tickers matrix is handled column-wise.
+    """
+    entries = np.asarray(entries, dtype=bool)
+    exits = np.asarray(exits, dtype=bool)
+    # 0 after an exit, 1 after an entry, -1 when the bar changes nothing
+    marks = np.where(exits, 0, np.where(entries, 1, -1)).astype(np.int8)
+
+    steps = np.arange(len(marks)).reshape((-1,) + (1,) * (marks.ndim - 1))
+    last_mark = np.maximum.accumulate(np.where(marks >= 0, steps, -1), axis=0)
+    wanted = np.take_along_axis(marks, np.maximum(last_mark, 0), axis=0)
+    wanted = np.where(last_mark >= 0, wanted, 0)
+
+    # The order placed on a bar fills on the next one
+    held = np.zeros_like(wanted)
+    held[1:] = wanted[:-1]
+    return held
+
+def _aligned(stock_dfs, tickers, column, calendar) -> pd.DataFrame:
+    columns = {ticker: pd.Series(stock_dfs[ticker][column].to_numpy(dtype=np.float64),
+                                 index=backtrader_dates(stock_dfs[ticker].index))
+               for ticker in tickers}
+    return pd.DataFrame(columns).reindex(calendar)
+
+def _screen_block(opens, closes, entries, exits, cash, stake, commission, tickers) -> pd.DataFrame:
+    """Per-ticker metrics of one dates x tickers block."""
+    valid = ~np.isnan(closes)
+
+    # Positions only change on a ticker's own bars, and carry over the dates it has none
+    held = np.where(valid, held_positions(entries & valid, exits & valid), -1)
+    held = _ffill(held, missing=-1)
+    held = np.where(held < 0, 0, held)
+
+    changes = np.diff(held, axis=0, prepend=0)
+    buys, sells = changes > 0, changes < 0
+    fills = changes * stake
+    prices = np.where(changes != 0, opens, 0.0)
+    flows = -fills * prices - np.abs(fills) * commission * prices
+
+    last_close = _ffill(closes, missing=np.nan)
+    values = cash + np.cumsum(flows, axis=0) + np.nan_to_num(held * stake * last_close)
+
+    # Entry price of the open trade, read back on the bar that closes it
+    entry_prices = _ffill(np.where(buys, opens, np.nan), missing=np.nan)
+    pnl = np.where(sells, stake * (opens - entry_prices), np.nan)
+    pnlcomm = pnl - (stake * commission * entry_prices + stake * commission * opens)
+    won = sells & (pnlcomm >= 0.0)
+    lost = sells & (pnlcomm < 0.0)
+
+    peaks = np.maximum.accumulate(values, axis=0)
+    moneydown = peaks - values
+    drawdown = 100.0 * moneydown / peaks
+
+    num_winners = won.sum(axis=0)
+    num_losers = lost.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        metrics = {
+            'num_trades': buys.sum(axis=0),
+            'num_winners': num_winners,
+            'num_losers': num_losers,
+            'avg_pnl_per_trade': np.nansum(pnlcomm, axis=0) / (num_winners + num_losers),
+            'avg_pnl_winning_trades': np.where(won, pnlcomm, 0.0).sum(axis=0) / num_winners,
+            'avg_pnl_losing_trades': np.where(lost, pnlcomm, 0.0).sum(axis=0) / num_losers,
+            'total_pnlcomm': np.nansum(pnlcomm, axis=0),
+            'final_value': values[-1] if len(values) else np.full(len(tickers), cash),
+            'max_drawdown_pct': drawdown.max(axis=0, initial=0.0),
+            'max_moneydown': moneydown.max(axis=0, initial=0.0),
+        }
+    df = pd.DataFrame(metrics, index=pd.Index(tickers, name='ticker'))
+    averages = ['avg_pnl_per_trade', 'avg_pnl_winning_trades', 'avg_pnl_losing_trades']
+    df[averages] = df[averages].fillna(0.0)
+    return df
+
+def _ffill(matrix, missing):
+    """Forward fill along axis 0 the cells equal to `missing` (NaN allowed)."""
+    missing_cells = np.isnan(matrix) if np.isnan(missing) else matrix == missing
+    steps = np.arange(len(matrix)).reshape((-1,) + (1,) * (matrix.ndim - 1))
+    source = np.maximum.accumulate(np.where(missing_cells, 0, steps), axis=0)
+    return np.take_along_axis(matrix, source, axis=0)
+
+def portfolio_values(cash, cash_flows, holdings) -> pd.Series:
+    """Broker value on every date of the union calendar: cash plus positions marked at their last close."""
+    if not cash_flows:
+        return pd.Series(np.empty(0), index=pd.DatetimeIndex([]))
+    flows = pd.concat(cash_flows, axis=1, sort=True).fillna(0.0).sum(axis=1)
+    positions = pd.concat(holdings, axis=1, sort=True).ffill().fillna(0.0).sum(axis=1)
+    return cash + flows.cumsum() + positions
+
+def trade_metrics(opened: int, pnlcomm: np.ndarray) -> dict:
+    """`_format_trade_analyzer_results` metrics from the number of trades opened and the closed trades' pnlcomm."""
+    won = pnlcomm[pnlcomm >= 0.0]
+    lost = pnlcomm[pnlcomm < 0.0]
+    return {
+        'max_drawdown': 0,
+        'num_trades': opened,
+        'num_winners': len(won),
+        'num_losers': len(lost),
+        'avg_pnl_per_trade': float(pnlcomm.mean()) if len(pnlcomm) else 0,
+        'avg_pnl_winning_trades': float(won.mean()) if len(won) else 0,
+        'avg_pnl_losing_trades': float(lost.mean()) if len(lost) else 0
+    }
+
+def backtrader_dates(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """Bar datetimes as backtrader reports them: naive, in UTC for a tz-aware index."""
+    if index.tz is not None:
+        return index.tz_convert('UTC').tz_localize(None)
+    return index
+
+def _signal(signals: dict, ticker, df) -> np.ndarray:
+    signal = signals[ticker]
+    if isinstance(signal, pd.Series):
+        signal = signal.reindex(df.index, fill_value=False)
+    signal = np.asarray(signal, dtype=bool)
+    if len(signal) != len(df):
+        raise ValueError(f"{ticker}: {len(signal)} signals for {len(df)} bars")
+    return signal
+
+def _split_rows(rows, columns) -> dict:
+    # Same order as the backtrader analyzers: by date, then by data order
+    rows.sort(key=lambda row: (row[0], row[1]))
+    long_df = pd.DataFrame([row[:1] + row[2:] for row in rows], columns=['date', 'ticker'] + columns)
+    return _split_by_ticker(long_df)
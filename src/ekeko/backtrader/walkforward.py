@@ -0,0 +1,184 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from backtrader.utils import AutoOrderedDict
+
+from .analyzer import drawdown_periods
+from .cerebro import EkekoCerebro, _combine_trade_analysis
+
+# Read-only state of a walk-forward worker, set once per process by `_init_worker`
+_worker_state = {}
+
+def walk_forward(strategy, strategy_kwargs: dict, stock_dfs: dict, window, step, warmup=0, cash=None,
+                 commission=None, max_workers=None) -> dict:
+    """
+    Walk-forward backtest: run the strategy on rolling windows in parallel.
+
+    Windows start at the first date of the data and every `step` after it,
+    and each one spans `window`. Windows may not overlap, so `step` must
+    be at least `window`; with a longer step the dates between windows are
+    skipped. Every window is a fresh backtest with the
+    starting cash. The `warmup` bars before a window are fed too, so
+    indicators are ready on its first bar without replaying the history
+    before it, but the strategy's `next` is only called from the window
+    start on.
+
+    The windows are stitched into the structure `format_analysis_results`
+    returns: transactions and trades are concatenated per ticker, drawdown
+    holds the current values of the last window and the maxima over all of
+    them, the window curves joined from each window start (every window
+    measured from its own starting cash) and the periods of that curve,
+    and trade_analysis combines the metrics of every window. A
+    'windows' DataFrame adds the metrics of each window.
+
+    Parameters:
+    strategy (bt.Strategy): Strategy class, importable from the workers.
+    strategy_kwargs (dict): Parameters passed to the strategy, e.g. {'period': 20}.
+    stock_dfs (dict): Dictionary of ticker symbols to DataFrames.
+    window (str or pd.DateOffset): Length of a window, e.g. '365D'.
+    step (str or pd.DateOffset): Distance between window starts, e.g. '90D', at least `window`.
+    warmup (int): Number of bars fed before each window to warm up indicators.
+    cash (float): Starting cash, or None for the backtrader default.
+    commission (float): Broker commission, or None for the backtrader default.
+    max_workers (int): Number of worker processes; 1 runs in this process.
+
+    Returns:
+    dict: Stitched analysis results, plus the per-window 'windows' DataFrame.
+    """
+    window = pd.tseries.frequencies.to_offset(window)
+    step = pd.tseries.frequencies.to_offset(step)
+
+    calendar = None
+    for df in stock_dfs.values():
+        calendar = df.index if calendar is None else calendar.union(df.index)
+    if calendar is None or not len(calendar):
+        raise ValueError("walk_forward needs at least one non-empty DataFrame")
+    # Overlapping windows would report the trades of the overlap once per window
+    if calendar[0] + step < calendar[0] + window:
+        raise ValueError(f"step ({step.freqstr}) must be at least the window ({window.freqstr}), windows may not overlap")
+
+    jobs = []
+    start = calendar[0]
+    while start <= calendar[-1]:
+        end = start + window
+        frames = _window_frames(stock_dfs, start, end, warmup)
+        if frames:
+            jobs.append((start, end, frames))
+        start = start + step
+
+    state = (strategy, strategy_kwargs, cash, commission)
+    if max_workers == 1:
+        _init_worker(*state)
+        try:
+            results = list(map(_run_window, jobs))
+        finally:
+            _worker_state.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=state) as executor:
+            results = list(executor.map(_run_window, jobs))
+
+    return _stitch([(start, end) for start, end, _ in jobs], results)
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def windowed_strategy(strategy):
+    """
+    Subclass of `strategy` that ignores the bars before its `ekeko_trade_start` param.
+
+    The bars are still fed, so indicators warm up on them, but `next` is not
+    called and no order can be placed before the start.
+    """
+    def next(self):
+        trade_start = self.p.ekeko_trade_start
+        if trade_start is not None and self.datetime.datetime(0) < trade_start:
+            return
+        strategy.next(self)
+
+    return type(strategy.__name__, (strategy,), {
+        'params': (('ekeko_trade_start', None),),
+        'next': next,
+        '__module__': strategy.__module__,
+    })
+
+def to_backtrader_datetime(timestamp) -> datetime:
+    """Naive UTC datetime, the way backtrader reports bar datetimes."""
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_pydatetime()
+
+def _window_frames(stock_dfs, start, end, warmup):
+    frames = {}
+    for ticker, df in stock_dfs.items():
+        first = df.index.searchsorted(start)
+        last = df.index.searchsorted(end)
+        if last > first:
+            frames[ticker] = df.iloc[max(first - warmup, 0):last]
+    return frames
+
+def _init_worker(strategy, strategy_kwargs, cash, commission):
+    _worker_state.update(strategy=strategy, strategy_kwargs=strategy_kwargs, cash=cash, commission=commission)
+
+def _run_window(job):
+    start, _, frames = job
+    ekeko_cerebro = EkekoCerebro()
+    broker = ekeko_cerebro.cerebro.broker
+    if _worker_state['cash'] is not None:
+        broker.setcash(_worker_state['cash'])
+    if _worker_state['commission'] is not None:
+        broker.setcommission(commission=_worker_state['commission'])
+
+    for ticker, df in frames.items():
+        ekeko_cerebro.adddata(df, name=ticker)
+    ekeko_cerebro.addstrategy(
+        windowed_strategy(_worker_state['strategy']),
+        ekeko_trade_start=to_backtrader_datetime(start),
+        **_worker_state['strategy_kwargs']
+    )
+
+    _, analysis_results = ekeko_cerebro.run()
+    return analysis_results
+
+def _stitch(windows, results) -> dict:
+    transactions = _concat_per_ticker([result['transactions'] for result in results])
+    trades = _concat_per_ticker([result['trades'] for result in results])
+
+    drawdown = AutoOrderedDict()
+    last = results[-1]['drawdown'] if results else None
+    drawdown.len = last['len'] if last else 0
+    drawdown.drawdown = last['drawdown'] if last else 0.0
+    drawdown.moneydown = last['moneydown'] if last else 0.0
+    for key in ['len', 'drawdown', 'moneydown']:
+        drawdown.max[key] = max((result['drawdown']['max'][key] for result in results), default=0.0)
+    # The warm-up bars before a window start are already covered by the previous window
+    drawdown.curve = pd.concat([
+        result['drawdown']['curve'].loc[to_backtrader_datetime(start):]
+        for (start, _), result in zip(windows, results)
+    ])
+    drawdown.periods = drawdown_periods(drawdown.curve)
+    drawdown._close()
+
+    rows = []
+    for (start, end), result in zip(windows, results):
+        row = {'start': start, 'end': end}
+        row.update(result['trade_analysis'])
+        row['max_drawdown_pct'] = result['drawdown']['max']['drawdown']
+        rows.append(row)
+
+    return {
+        'transactions': transactions,
+        'trades': trades,
+        'drawdown': drawdown,
+        'trade_analysis': _combine_trade_analysis([result['trade_analysis'] for result in results]),
+        'windows': pd.DataFrame(rows),
+    }
+
+def _concat_per_ticker(per_window) -> dict:
+    frames = {}
+    for result in per_window:
+        for ticker, df in result.items():
+            frames.setdefault(ticker, []).append(df)
+    return {ticker: pd.concat(dfs) if len(dfs) > 1 else dfs[0] for ticker, dfs in frames.items()}
@@ -1,2 +1,4 @@
-from .stooq_loader import stooq_to_df
-from .reader import read_files_from_zip, read_files_from_directory
+from .stooq_loader import stooq_to_df, stooq_to_df_parallel, iter_stooq_zip, replay_stooq
+from .reader import read_files_from_zip, read_files_from_directory, select_zip_members
+from .universe import Universe
+from .compact import compact_ohlcv, compact_dataframes
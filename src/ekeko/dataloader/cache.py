@@ -0,0 +1,83 @@
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+
+from .window import localize, slice_window, window_end
+
+CACHE_SUFFIX = '.parquet'
+
+def cache_path(cache_dir: str, file_path: str) -> str:
+    """
+    Path of the cached frame for a source file.
+
+    The key combines the absolute path, modification time and size of the
+    source, so an edited or replaced file never hits a stale entry.
+
+    Parameters:
+    cache_dir (str): Directory of the cache.
+    file_path (str): Path to the source data file.
+
+    Returns:
+    str: Path of the cache entry (which may not exist yet).
+    """
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    name = os.path.basename(file_path).split('.')[0]
+    return os.path.join(cache_dir, f"{name}-{digest[:20]}{CACHE_SUFFIX}")
+
+def read_cached(path: str, start=None, end=None, columns=None):
+    """
+    Read a cached frame.
+
+    The date window is pushed down as a Parquet row filter on the index and
+    only the requested columns are read.
+
+    Parameters:
+    path (str): Path of the cache entry.
+    start (str or datetime-like): First date to read (inclusive), or None.
+    end (str or datetime-like): Last date to read (inclusive), or None.
+    columns (list): Columns to read, or None for all.
+
+    Returns:
+    pd.DataFrame: The cached frame, or None when the entry does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    if start is None and end is None:
+        return pd.read_parquet(path, columns=columns)
+
+    import pyarrow.parquet as pq
+    index_name = pq.read_schema(path).pandas_metadata['index_columns'][0]
+
+    # Filter on whole days, the exact bounds are applied once the rows are loaded
+    filters = []
+    if start is not None:
+        filters.append((index_name, '>=', localize(start).normalize()))
+    if end is not None:
+        filters.append((index_name, '<', window_end(end).normalize() + pd.Timedelta(days=1)))
+    df = pd.read_parquet(path, columns=columns, filters=filters)
+    return slice_window(df, start, end)
+
+def write_cached(path: str, df: pd.DataFrame):
+    """
+    Atomically write a frame to the cache.
+
+    The frame is written to a temporary file first and moved into place, so
+    concurrent writers and interrupted runs never leave a truncated entry.
+
+    Parameters:
+    path (str): Path of the cache entry.
+    df (pd.DataFrame): Frame to store.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
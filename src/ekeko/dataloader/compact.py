@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+def compact_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert an OHLCV frame to compact dtypes.
+
+    Prices become float32 and an integral volume becomes the narrowest
+    integer type that holds it. float32 keeps about 7 significant digits,
+    which covers stooq prices but rounds values that need more precision.
+
+    Parameters:
+    df (pd.DataFrame): OHLCV frame as returned by `stooq_to_df`.
+
+    Returns:
+    pd.DataFrame: A new frame with compact dtypes and the same index.
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in PRICE_COLUMNS:
+            values = values.astype(np.float32)
+        elif column == 'Volume':
+            values = _narrow_volume(values)
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index)
+
+def compact_dataframes(dataframes: dict, share_index: bool = False):
+    """
+    Convert every frame of a ticker dictionary to compact dtypes.
+
+    With `share_index`, the tickers' indexes become slices of one calendar
+    built from the union of all dates. Tickers without gaps in that calendar
+    then hold views of the same datetime buffer instead of an index each.
+
+    Parameters:
+    dataframes (dict): Dictionary of ticker symbols to OHLCV frames.
+    share_index (bool): Reuse one calendar index across tickers.
+
+    Returns:
+    tuple: (dict of compact frames, pd.DataFrame report of bytes before, after
+    and saved per ticker). The report's `attrs['calendar_bytes']` holds the
+    one-off size of the shared calendar.
+    """
+    calendar = _union_calendar(dataframes.values()) if share_index else None
+
+    compact = {}
+    records = []
+    for ticker, df in dataframes.items():
+        before = int(df.memory_usage(deep=True).sum())
+        small = compact_ohlcv(df)
+
+        index_bytes = int(small.index.memory_usage(deep=True))
+        shared = calendar is not None and _share_index(small, calendar)
+        after = int(small.memory_usage(deep=True).sum())
+        if shared:
+            # The datetime buffer belongs to the calendar, counted once in attrs
+            after -= index_bytes
+
+        compact[ticker] = small
+        records.append((ticker, before, after, before - after, shared))
+
+    report = pd.DataFrame(
+        records, columns=['ticker', 'bytes_before', 'bytes_after', 'bytes_saved', 'shared_index']
+    ).set_index('ticker')
+    report.attrs['calendar_bytes'] = 0 if calendar is None else int(calendar.memory_usage(deep=True))
+    return compact, report
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _narrow_volume(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_float_dtype(values) and not np.all(np.mod(values.to_numpy(), 1) == 0):
+        return values
+    downcast = 'unsigned' if len(values) and values.min() >= 0 else 'integer'
+    return pd.to_numeric(values.astype(np.int64), downcast=downcast)
+
+def _union_calendar(frames) -> pd.DatetimeIndex:
+    calendar = None
+    for df in frames:
+        calendar = df.index if calendar is None else calendar.union(df.index)
+    return calendar
+
+def _share_index(df: pd.DataFrame, calendar: pd.DatetimeIndex) -> bool:
+    """Replace the frame's index with a view into the calendar, when it is a contiguous run of it."""
+    index = df.index
+    if len(index) == 0 or index.tz != calendar.tz or index.dtype != calendar.dtype:
+        return False
+    start = calendar.searchsorted(index[0])
+    window = calendar[start:start + len(index)]
+    if not window.equals(index):
+        return False
+    df.index = window.rename(index.name)
+    return True
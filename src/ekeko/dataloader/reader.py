@@ -1,3 +1,4 @@
+import fnmatch
 import os
 import zipfile
 
@@ -17,13 +18,45 @@ def _read_files_recursively(directory: str) -> list:
             file_paths.append(os.path.join(root, file))
     return file_paths
 
-def read_files_from_zip(zip_path: str, extract_path: str) -> list:
+def select_zip_members(zip_ref: zipfile.ZipFile, tickers=None, pattern=None) -> list:
+    """
+    Select the file members of a zip archive, filtered by ticker or glob.
+
+    Only the central directory is read, so nothing is decompressed.
+
+    Parameters:
+    zip_ref (zipfile.ZipFile): Open zip archive.
+    tickers (iterable): Ticker symbols to keep (e.g. ['gps']), or None for all.
+    pattern (str): Glob matched against the member path (e.g. '*/nasdaq stocks/*'), or None.
+
+    Returns:
+    list: List of zipfile.ZipInfo members.
+    """
+    if tickers is not None:
+        tickers = {ticker.lower() for ticker in tickers}
+
+    members = []
+    for info in zip_ref.infolist():
+        if info.is_dir():
+            continue
+        if pattern is not None and not fnmatch.fnmatch(info.filename, pattern):
+            continue
+        if tickers is not None:
+            ticker = os.path.basename(info.filename).split('.')[0]
+            if ticker.lower() not in tickers:
+                continue
+        members.append(info)
+    return members
+
+def read_files_from_zip(zip_path: str, extract_path: str, tickers=None, pattern=None) -> list:
     """
     Read files from a zip archive to an extract path
 
     Parameters:
     zip_path (str): Path to the zip file.
     extract_path (str): Path to extract contents.
+    tickers (iterable): Only extract these ticker symbols, or None for all.
+    pattern (str): Only extract members whose path matches this glob, or None.
 
     Returns:
     list: List of file paths inside the zip archive.
@@ -32,8 +65,12 @@ def read_files_from_zip(zip_path: str, extract_path: str) -> list:
     os.makedirs(extract_path, exist_ok=True)
 
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_path)
-        return _read_files_recursively(extract_path)
+        if tickers is None and pattern is None:
+            zip_ref.extractall(extract_path)
+            return _read_files_recursively(extract_path)
+
+        members = select_zip_members(zip_ref, tickers, pattern)
+        return [zip_ref.extract(member, extract_path) for member in members]
 
 def read_files_from_directory(directory: str) -> list:
     """
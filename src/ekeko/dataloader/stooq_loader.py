@@ -1,13 +1,44 @@
 import pandas as pd
 import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 
-def stooq_to_df(file_paths):
+from ..profiling import profiled
+from .cache import cache_path, read_cached, write_cached
+from .compact import compact_ohlcv
+from .reader import select_zip_members
+from .window import STOOQ_TIMEZONE, localize, slice_window, window_end
+
+STOOQ_COLUMNS = {
+    '<DATE>': 'Date',
+    '<OPEN>': 'Open',
+    '<HIGH>': 'High',
+    '<LOW>': 'Low',
+    '<CLOSE>': 'Close',
+    '<VOL>': 'Volume'
+}
+STOOQ_NAMES = {name: stooq_name for stooq_name, name in STOOQ_COLUMNS.items()}
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+WINDOW_CHUNK_ROWS = 4096
+
+@profiled('load.stooq_to_df')
+def stooq_to_df(file_paths, start=None, end=None, columns=None, compact=False):
     """
     Converts a list of stooq data files into a dictionary of DataFrames.
-    
+
+    `start`, `end` and `columns` are pushed down into parsing: only the
+    requested columns are read, rows before `start` are dropped before any
+    datetime conversion and reading stops once a file passes `end`. The
+    result equals slicing the full frames with `.loc[start:end, columns]`.
+
     Parameters:
     file_paths (list): List of file paths to the stooq data files.
-    
+    start (str or pd.Timestamp): First date to load (inclusive), or None.
+    end (str or pd.Timestamp): Last date to load (inclusive), or None.
+    columns (list): Subset of 'Open', 'High', 'Low', 'Close', 'Volume', or None for all.
+    compact (bool): Return float32 prices and the narrowest integer volume, see `compact_ohlcv`.
+
     Returns:
     dict: Dictionary where keys are ticker symbols and values are DataFrames.
     """
@@ -16,38 +47,217 @@ def stooq_to_df(file_paths):
 
     # Load each file into a DataFrame
     for file_path in file_paths:
-        # Read the CSV content from the file into a DataFrame
-        df = pd.read_csv(file_path, delimiter=',')  # assuming tab-separated values
+        ticker = _ticker_from_path(file_path)
+        df = _parse_stooq(file_path, ticker, start, end, columns)
+        dataframes[ticker] = compact_ohlcv(df) if compact else df
 
-        # Rename columns to match yfinance DataFrame
-        df.rename(columns={
-            '<DATE>': 'Date',
-            '<OPEN>': 'Open',
-            '<HIGH>': 'High',
-            '<LOW>': 'Low',
-            '<CLOSE>': 'Close',
-            '<VOL>': 'Volume'
-        }, inplace=True)
+    return dataframes
 
-        # Convert the 'Date' column to datetime
-        df['Date'] = pd.to_datetime(df['Date'], format='%Y%m%d')
+@profiled('load.stooq_to_df_parallel')
+def stooq_to_df_parallel(file_paths, cache_dir=None, max_workers=None, chunksize=16,
+                         start=None, end=None, columns=None, compact=False):
+    """
+    Parallel version of `stooq_to_df` with an optional on-disk Parquet cache.
 
-        # Set the timezone to America/New_York
-        df['Date'] = df['Date'].dt.tz_localize('America/New_York')
+    Files are parsed across a process pool. When `cache_dir` is given, every
+    parsed ticker is written there as Parquet, keyed by file path, mtime and
+    size, so later runs read the cached frame instead of parsing the CSV
+    again. The returned frames are identical to those of `stooq_to_df`.
+    Cache entries always hold full frames; the date window and columns are
+    pushed down into the Parquet read.
 
-        # Set the 'Date' column as the index
-        df.set_index('Date', inplace=True)
+    Parameters:
+    file_paths (list): List of file paths to the stooq data files.
+    cache_dir (str): Directory of the Parquet cache, or None to disable it.
+    max_workers (int): Number of worker processes (defaults to the CPU count).
+    chunksize (int): Number of files sent to a worker at a time.
+    start (str or pd.Timestamp): First date to load (inclusive), or None.
+    end (str or pd.Timestamp): Last date to load (inclusive), or None.
+    columns (list): Subset of the OHLCV columns to load, or None for all.
+    compact (bool): Return float32 prices and the narrowest integer volume, see `compact_ohlcv`.
 
-        df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
+    Returns:
+    dict: Dictionary where keys are ticker symbols and values are DataFrames.
+    """
+    file_paths = list(file_paths)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
 
-        # Extract the ticker symbol from the file name (e.g., 'gps.us.txt' -> 'gps')
-        file_name = os.path.basename(file_path)
-        ticker = file_name.split('.')[0]
+    frames = [None] * len(file_paths)
+    misses = []
+    for position, file_path in enumerate(file_paths):
+        if cache_dir is not None:
+            df = read_cached(cache_path(cache_dir, file_path), start, end, columns)
+            if df is not None:
+                frames[position] = df
+                continue
+        misses.append(position)
 
-        # Set the ticker as the index name
-        df.index.name = ticker
+    if misses:
+        jobs = [(file_paths[position], cache_dir, start, end, columns) for position in misses]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            parsed = executor.map(_parse_and_cache, jobs, chunksize=chunksize)
+            for position, df in zip(misses, parsed):
+                frames[position] = df
 
-        # Store the DataFrame in the dictionary
-        dataframes[ticker] = df
+    # Preserve the input order, later files win on duplicate tickers
+    dataframes = {}
+    for file_path, df in zip(file_paths, frames):
+        dataframes[_ticker_from_path(file_path)] = compact_ohlcv(df) if compact else df
 
     return dataframes
+
+def iter_stooq_zip(zip_path, tickers=None, pattern=None, start=None, end=None, columns=None):
+    """
+    Stream stooq files straight out of a zip archive, without extracting it.
+
+    Members are filtered by ticker or glob before anything is decompressed,
+    and each one is parsed from the archive into memory.
+
+    Parameters:
+    zip_path (str): Path to the zip file.
+    tickers (iterable): Ticker symbols to load (e.g. ['gps']), or None for all.
+    pattern (str): Glob matched against the member path, or None.
+    start (str or pd.Timestamp): First date to load (inclusive), or None.
+    end (str or pd.Timestamp): Last date to load (inclusive), or None.
+    columns (list): Subset of the OHLCV columns to load, or None for all.
+
+    Yields:
+    tuple: (ticker, DataFrame) pairs, in archive order.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for member in select_zip_members(zip_ref, tickers, pattern):
+            ticker = _ticker_from_path(member.filename)
+            with zip_ref.open(member) as source:
+                yield ticker, _parse_stooq(source, ticker, start, end, columns)
+
+def replay_stooq(file_path, start=None, end=None, delay=0.0):
+    """
+    Replay a stooq file bar by bar, as a stand-in for a live feed.
+
+    The file is read in chunks of `WINDOW_CHUNK_ROWS` rows, so memory stays
+    bounded however long the history is. Feed the result to
+    `EkekoCerebro.adddata` and run it with `EkekoCerebro.run_streaming`.
+
+    Parameters:
+    file_path (str): Path to the stooq data file.
+    start (str or pd.Timestamp): First date to replay (inclusive), or None.
+    end (str or pd.Timestamp): Last date to replay (inclusive), or None.
+    delay (float): Seconds to wait before every bar, to pace the replay.
+
+    Yields:
+    tuple: (timestamp, bar) pairs, `bar` being a dict of the OHLCV values.
+    """
+    first_day, last_day = _window_days(start, end)
+    start_ts = None if start is None else localize(start)
+    end_ts = None if end is None else window_end(end)
+
+    for chunk in pd.read_csv(file_path, delimiter=',', usecols=list(STOOQ_COLUMNS), chunksize=WINDOW_CHUNK_ROWS):
+        if first_day is not None:
+            chunk = chunk[chunk['<DATE>'] >= first_day]
+        past_end = last_day is not None and len(chunk) and chunk['<DATE>'].iloc[-1] > last_day
+        if last_day is not None:
+            chunk = chunk[chunk['<DATE>'] <= last_day]
+
+        chunk = chunk.rename(columns=STOOQ_COLUMNS)
+        dates = pd.to_datetime(chunk.pop('Date'), format='%Y%m%d').dt.tz_localize(STOOQ_TIMEZONE)
+        for timestamp, bar in zip(dates, chunk[OHLCV_COLUMNS].to_dict('records')):
+            if (start_ts is not None and timestamp < start_ts) or (end_ts is not None and timestamp > end_ts):
+                continue
+            if delay:
+                time.sleep(delay)
+            yield timestamp, bar
+
+        if past_end:
+            break
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _ticker_from_path(file_path):
+    # Extract the ticker symbol from the file name (e.g., 'gps.us.txt' -> 'gps')
+    file_name = os.path.basename(file_path)
+    return file_name.split('.')[0]
+
+def _parse_stooq(source, ticker, start=None, end=None, columns=None):
+    """Parse a single stooq file (path or file-like object) into a DataFrame."""
+    columns = _select_columns(columns)
+    usecols = ['<DATE>'] + [STOOQ_NAMES[column] for column in columns]
+
+    # Read the CSV content from the file into a DataFrame
+    if start is None and end is None:
+        df = pd.read_csv(source, delimiter=',', usecols=usecols)
+    else:
+        df = _read_window(source, usecols, start, end)
+
+    # Rename columns to match yfinance DataFrame
+    df.rename(columns=STOOQ_COLUMNS, inplace=True)
+
+    # Convert the 'Date' column to datetime
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y%m%d')
+
+    # Set the timezone to America/New_York
+    df['Date'] = df['Date'].dt.tz_localize(STOOQ_TIMEZONE)
+
+    # Set the 'Date' column as the index
+    df.set_index('Date', inplace=True)
+
+    df = df[columns]
+
+    # Set the ticker as the index name
+    df.index.name = ticker
+
+    return slice_window(df, start, end)
+
+def _read_window(source, usecols, start, end):
+    """Read only the rows of a stooq file whose raw YYYYMMDD date falls in [start, end]."""
+    first_day, last_day = _window_days(start, end)
+
+    chunks = []
+    chunk = None
+    for chunk in pd.read_csv(source, delimiter=',', usecols=usecols, chunksize=WINDOW_CHUNK_ROWS):
+        dates = chunk['<DATE>']
+        mask = pd.Series(True, index=chunk.index)
+        if first_day is not None:
+            mask &= dates >= first_day
+        if last_day is not None:
+            mask &= dates <= last_day
+        if mask.any():
+            chunks.append(chunk[mask])
+        # stooq files are sorted by date, nothing past `end` is needed
+        if last_day is not None and dates.iloc[-1] > last_day:
+            break
+
+    if chunks:
+        return pd.concat(chunks, ignore_index=True)
+    if chunk is not None:
+        return chunk.iloc[:0]
+    return pd.DataFrame(columns=usecols)
+
+def _window_days(start, end):
+    """Window bounds as stooq YYYYMMDD integers, widened to whole days."""
+    def to_day(bound):
+        if bound is None:
+            return None
+        return int(bound.strftime('%Y%m%d'))
+    return to_day(None if start is None else localize(start)), to_day(None if end is None else window_end(end))
+
+def _select_columns(columns):
+    if columns is None:
+        return list(OHLCV_COLUMNS)
+    unknown = [column for column in columns if column not in OHLCV_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns {unknown}, expected a subset of {OHLCV_COLUMNS}")
+    return list(columns)
+
+def _parse_and_cache(job):
+    file_path, cache_dir, start, end, columns = job
+    ticker = _ticker_from_path(file_path)
+    if cache_dir is None:
+        return _parse_stooq(file_path, ticker, start, end, columns)
+
+    # The cache stores full frames so that any later window can be served from it
+    df = _parse_stooq(file_path, ticker)
+    write_cached(cache_path(cache_dir, file_path), df)
+    return slice_window(df, start, end)[_select_columns(columns)]
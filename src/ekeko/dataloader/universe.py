@@ -0,0 +1,158 @@
+import os
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import pandas as pd
+
+from .cache import cache_path, read_cached, write_cached
+from .reader import read_files_from_directory
+from .stooq_loader import _parse_stooq, _select_columns, _ticker_from_path
+from .window import STOOQ_TIMEZONE, slice_window
+
+INDEX_CHUNK_SIZE = 1 << 20
+
+class Universe(Mapping):
+    """
+    Lazy, read-only mapping of ticker symbols to stooq DataFrames.
+
+    The available tickers are indexed up front (file, row count, first and
+    last date) without parsing any prices. A frame is parsed on first access
+    and kept in an LRU of resident frames bounded by `max_bytes`, so a full
+    market universe can be iterated without holding every history in memory.
+    Behaves like the dict returned by `stooq_to_df`, e.g.
+
+        for ticker, stock_df in universe.items():
+            ekeko_cerebro.adddata(stock_df, name=ticker)
+
+    Parameters:
+    file_paths (list): List of file paths to the stooq data files.
+    max_bytes (int): Upper bound on the memory of resident frames, or None for no bound.
+    cache_dir (str): Directory of the Parquet cache used by `stooq_to_df_parallel`, or None.
+    start (str or pd.Timestamp): First date to load (inclusive), or None.
+    end (str or pd.Timestamp): Last date to load (inclusive), or None.
+    columns (list): Subset of the OHLCV columns to load, or None for all.
+    """
+
+    def __init__(self, file_paths, max_bytes=None, cache_dir=None, start=None, end=None, columns=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.start = start
+        self.end = end
+        self.columns = columns
+        self.resident_bytes = 0
+
+        self._paths = {}
+        for file_path in file_paths:
+            self._paths[_ticker_from_path(file_path)] = file_path
+        self._index = None
+        self._resident = OrderedDict()
+        self._sizes = {}
+
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        """Build a universe over every file found under a directory."""
+        return cls(read_files_from_directory(directory), **kwargs)
+
+    @property
+    def index(self) -> pd.DataFrame:
+        """Per-ticker file, row count and date range of the full files, computed without parsing prices."""
+        if self._index is None:
+            records = [_index_stooq(file_path) for file_path in self._paths.values()]
+            self._index = pd.DataFrame(
+                records, index=pd.Index(list(self._paths), name='ticker'),
+                columns=['path', 'rows', 'start', 'end']
+            )
+        return self._index
+
+    @property
+    def resident(self) -> list:
+        """Tickers currently held in memory, least recently used first."""
+        return list(self._resident)
+
+    def __getitem__(self, ticker) -> pd.DataFrame:
+        if ticker in self._resident:
+            self._resident.move_to_end(ticker)
+            return self._resident[ticker]
+
+        df = self._load(self._paths[ticker], ticker)
+        size = int(df.memory_usage(deep=True).sum())
+        self._resident[ticker] = df
+        self._sizes[ticker] = size
+        self.resident_bytes += size
+        self._evict()
+        return df
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, ticker):
+        return ticker in self._paths
+
+    def __repr__(self):
+        return f"Universe({len(self)} tickers, {len(self._resident)} resident)"
+
+    def clear(self):
+        """Drop every resident frame."""
+        self._resident.clear()
+        self._sizes.clear()
+        self.resident_bytes = 0
+
+    def _load(self, file_path, ticker):
+        if self.cache_dir is None:
+            return _parse_stooq(file_path, ticker, self.start, self.end, self.columns)
+
+        path = cache_path(self.cache_dir, file_path)
+        df = read_cached(path, self.start, self.end, self.columns)
+        if df is None:
+            df = _parse_stooq(file_path, ticker)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_cached(path, df)
+            df = slice_window(df, self.start, self.end)[_select_columns(self.columns)]
+        return df
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        # Always keep the most recently used frame, even when it alone exceeds the bound
+        while self.resident_bytes > self.max_bytes and len(self._resident) > 1:
+            ticker, _ = self._resident.popitem(last=False)
+            self.resident_bytes -= self._sizes.pop(ticker)
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _index_stooq(file_path):
+    """Row count and first/last date of a stooq file, from its raw lines."""
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        first = f.readline()
+        rows = 1 if first.strip() else 0
+        last = first
+        tail = b''
+        while True:
+            chunk = f.read(INDEX_CHUNK_SIZE)
+            if not chunk:
+                break
+            rows += chunk.count(b'\n')
+            tail = (tail + chunk)[-1024:]
+        # A trailing line without a newline is still a row
+        if tail and not tail.endswith(b'\n'):
+            rows += 1
+        lines = [line for line in tail.splitlines() if line.strip()]
+        if lines:
+            last = lines[-1]
+
+    if not rows:
+        return file_path, 0, pd.NaT, pd.NaT
+
+    date_column = header.decode().strip().split(',').index('<DATE>')
+
+    def parse_date(line):
+        value = line.decode().split(',')[date_column]
+        return pd.Timestamp(value).tz_localize(STOOQ_TIMEZONE)
+
+    return file_path, rows, parse_date(first), parse_date(last)
@@ -0,0 +1,65 @@
+import pandas as pd
+
+STOOQ_TIMEZONE = 'America/New_York'
+
+def localize(bound, tz=STOOQ_TIMEZONE) -> pd.Timestamp:
+    """
+    Convert a date bound to a timestamp in the given timezone.
+
+    Naive bounds are taken as wall time in `tz`, aware ones are converted.
+
+    Parameters:
+    bound (str or datetime-like): Date bound (e.g. '2022-04-1').
+    tz (str): Target timezone.
+
+    Returns:
+    pd.Timestamp: Timezone-aware timestamp.
+    """
+    ts = pd.Timestamp(bound)
+    if ts.tz is None:
+        return ts.tz_localize(tz)
+    return ts.tz_convert(tz)
+
+def window_end(end, tz=STOOQ_TIMEZONE) -> pd.Timestamp:
+    """
+    Last instant an end bound includes, the way `df.loc[:end]` reads it.
+
+    Naive strings are partial dates: '2020' covers the whole year and
+    '2020-01' the whole month. Other bounds are localized as they are.
+
+    Parameters:
+    end (str or datetime-like): Last date (inclusive).
+    tz (str): Target timezone.
+
+    Returns:
+    pd.Timestamp: Timezone-aware timestamp.
+    """
+    if isinstance(end, str) and pd.Timestamp(end).tz is None:
+        return pd.Period(end).end_time.tz_localize(tz)
+    return localize(end, tz)
+
+def slice_window(df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    """
+    Slice a date-indexed frame like `df.loc[start:end]`.
+
+    Timestamp bounds are localized to the index timezone so that naive dates
+    work against the tz-aware stooq index. Strings are passed through to keep
+    pandas' partial string indexing.
+
+    Parameters:
+    df (pd.DataFrame): Frame with a sorted DatetimeIndex.
+    start (str or datetime-like): First date (inclusive), or None.
+    end (str or datetime-like): Last date (inclusive), or None.
+
+    Returns:
+    pd.DataFrame: The sliced frame, or `df` itself when there is no window.
+    """
+    if start is None and end is None:
+        return df
+    tz = df.index.tz
+    return df.loc[_loc_bound(start, tz):_loc_bound(end, tz)]
+
+def _loc_bound(bound, tz):
+    if bound is None or isinstance(bound, str) or tz is None:
+        return bound
+    return localize(bound, tz)
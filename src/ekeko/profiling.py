@@ -0,0 +1,209 @@
+import cProfile
+import functools
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Profilers collecting right now, innermost last; instrumented code records into the innermost one
+_active = []
+
+class Profiler:
+    """
+    Wall time, CPU time and peak memory per phase of the backtest pipeline.
+
+    Phases are recorded with `phase` and by the instrumented functions of
+    ekeko (stooq loading, `adddata`, `EkekoCerebro.run` and its analyzers,
+    result formatting, plotting) while the profiler is active, see
+    `profile`. Phases nest: the peak memory of a phase includes that of the
+    phases inside it, and wall and CPU times are inclusive too.
+
+    Parameters:
+    memory (bool): Track peak memory with tracemalloc (slows down allocations).
+    profile_next (bool): Run the strategy's `next` under cProfile, see `next_stats`.
+    """
+
+    def __init__(self, memory=True, profile_next=False):
+        self.memory = memory
+        self.profile_next = profile_next
+        self.stats = {}
+        self.next_profiler = cProfile.Profile() if profile_next else None
+        self._stack = []
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        _active.append(self)
+
+    def stop(self):
+        _active.remove(self)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """Record the enclosed block as phase `name`."""
+        frame = self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit(frame)
+
+    def enter(self, name: str) -> list:
+        """Start phase `name`; pass the returned frame to `exit`."""
+        current = peak = 0
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The parent phase keeps the peak reached so far, the new one starts afresh
+            if self._stack:
+                self._stack[-1][4] = max(self._stack[-1][4], peak)
+            tracemalloc.reset_peak()
+            peak = current
+        frame = [name, time.perf_counter(), time.process_time(), current, peak]
+        self._stack.append(frame)
+        return frame
+
+    def exit(self, frame: list):
+        """End the phase started by `enter`."""
+        wall = time.perf_counter() - frame[1]
+        cpu = time.process_time() - frame[2]
+        self._stack.pop()
+
+        peak = 0
+        if self.memory:
+            frame[4] = max(frame[4], tracemalloc.get_traced_memory()[1])
+            peak = frame[4] - frame[3]
+            if self._stack:
+                self._stack[-1][4] = max(self._stack[-1][4], frame[4])
+
+        stats = self.stats.get(frame[0])
+        if stats is None:
+            self.stats[frame[0]] = [1, wall, cpu, peak]
+        else:
+            stats[0] += 1
+            stats[1] += wall
+            stats[2] += cpu
+            stats[3] = max(stats[3], peak)
+
+    def report(self) -> pd.DataFrame:
+        """
+        Structured report, one row per phase in order of first use.
+
+        Returns:
+        pd.DataFrame: calls, wall_s and cpu_s (summed over calls) and
+        peak_bytes (highest over calls, above the memory in use when the
+        phase started; 0 without memory tracking), indexed by phase.
+        """
+        return pd.DataFrame.from_dict(
+            self.stats, orient='index', columns=['calls', 'wall_s', 'cpu_s', 'peak_bytes']
+        ).rename_axis('phase')
+
+    def next_stats(self, sort='cumulative') -> pstats.Stats:
+        """cProfile statistics of the strategy's `next` calls, with `profile_next=True`."""
+        if self.next_profiler is None:
+            raise ValueError("Profiler was created without profile_next=True")
+        return pstats.Stats(self.next_profiler).sort_stats(sort)
+
+@contextmanager
+def profile(memory=True, profile_next=False):
+    """
+    Profile the ekeko calls made inside the block.
+
+    Example:
+        with ekeko.profile() as profiler:
+            stock_dfs = ekeko.dataloader.stooq_to_df(paths)
+            ...
+            _, analysis_results = ekeko_cerebro.run()
+        print(profiler.report())
+
+    Parameters:
+    memory (bool): Track peak memory with tracemalloc.
+    profile_next (bool): Run the strategy's `next` under cProfile.
+
+    Yields:
+    Profiler: The active profiler.
+    """
+    profiler = Profiler(memory=memory, profile_next=profile_next)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+
+def active_profiler():
+    """The innermost active `Profiler`, or None."""
+    return _active[-1] if _active else None
+
+def profiled(name: str):
+    """Decorator recording every call of a function as phase `name` when a profiler is active."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            with _active[-1].phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def phase(name: str):
+    """Record the enclosed block as phase `name` of the active profiler, if any."""
+    if not _active:
+        yield
+        return
+    with _active[-1].phase(name):
+        yield
+
+def profiled_strategy(strategy, profiler: Profiler):
+    """
+    Subclass of `strategy` recording its `next` as the 'strategy.next' phase.
+
+    With `profile_next`, the calls also run under the profiler's cProfile
+    instance. `ekeko_strategy_next` stays on the stack during the call, so it
+    also marks the strategy code in py-spy and other sampling profilers.
+    """
+    def next(self):
+        frame = profiler.enter('strategy.next')
+        try:
+            if profiler.next_profiler is not None:
+                profiler.next_profiler.runcall(ekeko_strategy_next, strategy, self)
+            else:
+                ekeko_strategy_next(strategy, self)
+        finally:
+            profiler.exit(frame)
+
+    return type(strategy.__name__, (strategy,), {'next': next, '__module__': strategy.__module__})
+
+def profiled_analyzer(analyzer, name: str, profiler: Profiler):
+    """Subclass of an analyzer recording its notifications and `next` as phase 'analyzer.<name>'."""
+    phase_name = f"analyzer.{name}"
+    methods = {}
+    # The dispatchers the strategy calls once per event (prenext and nextstart call next by default)
+    for method in ('_start', '_stop', '_prenext', '_nextstart', '_next',
+                   '_notify_order', '_notify_trade', '_notify_cashvalue', '_notify_fund'):
+        methods[method] = _timed_method(getattr(analyzer, method), phase_name, profiler)
+    methods['__module__'] = analyzer.__module__
+    return type(analyzer.__name__, (analyzer,), methods)
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def ekeko_strategy_next(strategy, instance):
+    return strategy.next(instance)
+
+def _timed_method(method, phase_name, profiler):
+    @functools.wraps(method)
+    def timed(self, *args, **kwargs):
+        frame = profiler.enter(phase_name)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profiler.exit(frame)
+    return timed
@@ -1 +1,4 @@
 from .plotting import plot, plot_different_stocks, scatter
+from .resample import downsample_ohlcv, downsample_series, lod_bucket_size
+from .interactive import InteractivePlot, PlotCache, dash_app, interactive_plot
+from .export import export_plots
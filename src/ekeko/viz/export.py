@@ -0,0 +1,94 @@
+"""Batch export of one stock chart per ticker."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from ..profiling import profiled
+from .plotting import plot
+
+PLOTLYJS_FILENAME = 'plotly.min.js'
+
+# Export settings of a worker, set once per process by `_init_worker`
+_worker_state = {}
+
+@profiled('plot.export_plots')
+def export_plots(stock_dfs: dict, transactions=None, directory='plots', formats=('html',), max_workers=None,
+                 chunksize=8, include_plotlyjs='directory', **plot_kwargs) -> dict:
+    """
+    Plot every ticker with `plot` and write the charts as HTML or static images, in parallel.
+
+    Takes the dictionaries returned by `stooq_to_df` and by
+    `EkekoCerebro.run` (`analysis_results['transactions']`). Tickers are
+    sent to a process pool in chunks. Every worker builds its figures from
+    one stock plot layout (see `init_stock_plot`) and exports the images
+    of a chunk in one Kaleido batch. HTML files reference a single
+    plotly.js bundle, written once to `directory`, instead of embedding it
+    in every file.
+
+    Parameters:
+    stock_dfs (dict): Dictionary of ticker symbols to OHLCV DataFrames.
+    transactions (dict): Dictionary of ticker symbols to transactions; tickers without any get no markers.
+    directory (str): Output directory, created if needed.
+    formats (tuple): 'html' and/or image formats of `plotly.io.write_images`, e.g. 'png' or 'svg'.
+    max_workers (int): Number of worker processes; 1 runs in this process.
+    chunksize (int): Number of tickers sent to a worker at a time.
+    include_plotlyjs: 'directory' to share one bundle in `directory`, or any value of `write_html`, e.g. 'cdn'.
+    **plot_kwargs: Passed to `plot`, e.g. `max_points`; the title defaults to the ticker.
+
+    Returns:
+    dict: Dictionary of ticker symbols to the paths written for them.
+    """
+    formats = [formats] if isinstance(formats, str) else list(formats)
+    os.makedirs(directory, exist_ok=True)
+    if any(fmt != 'html' for fmt in formats):
+        # Static images need Kaleido; fail before starting the workers
+        import kaleido  # noqa: F401
+
+    if 'html' in formats and include_plotlyjs == 'directory':
+        with open(os.path.join(directory, PLOTLYJS_FILENAME), 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        include_plotlyjs = PLOTLYJS_FILENAME
+
+    transactions = transactions or {}
+    jobs = [(ticker, df, transactions.get(ticker)) for ticker, df in stock_dfs.items()]
+    chunks = [jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize)]
+
+    state = (directory, formats, include_plotlyjs, plot_kwargs)
+    if max_workers == 1:
+        _init_worker(*state)
+        try:
+            results = list(map(_export_chunk, chunks))
+        finally:
+            _worker_state.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=state) as executor:
+            results = list(executor.map(_export_chunk, chunks))
+
+    return {ticker: paths for chunk in results for ticker, paths in chunk}
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _init_worker(directory, formats, include_plotlyjs, plot_kwargs):
+    _worker_state.update(directory=directory, formats=formats, include_plotlyjs=include_plotlyjs, plot_kwargs=plot_kwargs)
+
+def _export_chunk(chunk):
+    directory = _worker_state['directory']
+    tickers = [ticker for ticker, _, _ in chunk]
+    figures = [plot(df, transactions=ticker_transactions, **{'title': ticker, **_worker_state['plot_kwargs']})
+               for ticker, df, ticker_transactions in chunk]
+
+    paths = {ticker: [] for ticker in tickers}
+    for fmt in _worker_state['formats']:
+        files = [os.path.join(directory, f"{ticker}.{fmt}") for ticker in tickers]
+        if fmt == 'html':
+            for fig, file in zip(figures, files):
+                fig.write_html(file, include_plotlyjs=_worker_state['include_plotlyjs'])
+        else:
+            pio.write_images(figures, files, format=fmt)
+        for ticker, file in zip(tickers, files):
+            paths[ticker].append(file)
+    return list(paths.items())
@@ -0,0 +1,242 @@
+"""Stock charts that re-aggregate the visible window when zoomed."""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from .plotting import plot, volume_colors
+from .resample import OHLCV_AGGREGATIONS, downsample_arrays, downsample_mean, lod_bucket_size
+
+DEFAULT_MAX_POINTS = 2000
+DASH_GRAPH_ID = 'ekeko-stock-plot'
+
+class PlotCache:
+    """
+    Sorted arrays behind an interactive stock chart.
+
+    Bars, overlay curves and transactions are converted once to NumPy arrays
+    sorted by date. Each zoom finds the visible window with a binary search
+    and aggregates only that slice. One cache serves the candlestick,
+    volume, overlay and marker traces of a chart.
+
+    Parameters:
+    stock_df (pd.DataFrame): OHLCV bars indexed by datetime.
+    other_dfs (list): Series to overlay, e.g. indicators.
+    transactions (pd.DataFrame): Transactions of the ticker with size and price columns.
+    """
+
+    def __init__(self, stock_df, other_dfs=None, transactions=None):
+        self.dates, order = _sorted_dates(stock_df.index)
+        self.bars = {column: stock_df[column].to_numpy(dtype=np.float64)[order]
+                     for column in OHLCV_AGGREGATIONS if column in stock_df.columns}
+
+        self.curves = []
+        for curve in other_dfs or []:
+            dates, order = _sorted_dates(curve.index)
+            self.curves.append((curve.name, dates, curve.to_numpy(dtype=np.float64)[order]))
+
+        self.transactions = None
+        if transactions is not None:
+            dates, order = _sorted_dates(transactions.index)
+            self.transactions = (dates, transactions['size'].to_numpy()[order], transactions['price'].to_numpy()[order])
+
+    def window(self, start=None, end=None, max_points=DEFAULT_MAX_POINTS) -> dict:
+        """
+        Data between two dates, aggregated to at most `max_points` buckets.
+
+        Parameters:
+        start: First date shown (inclusive), anything `pd.Timestamp` accepts, or None.
+        end: Last date shown (inclusive), or None.
+        max_points (int): Upper bound on the number of candles.
+
+        Returns:
+        dict: 'bucket_size', 'bars' (number of bars in the window), 'dates'
+        and 'ohlcv' of the buckets, 'curves' (name, dates and values of each
+        overlay, averaged over the same number of points) and
+        'transactions' (dates, sizes and prices, not aggregated) or None.
+        """
+        first, last = _bounds(self.dates, start, end)
+        bucket_size = lod_bucket_size(last - first, max_points)
+
+        curves = []
+        for name, dates, values in self.curves:
+            lo, hi = _bounds(dates, start, end)
+            curves.append((name, dates[lo:hi:bucket_size], downsample_mean(values[lo:hi], bucket_size)))
+
+        transactions = None
+        if self.transactions is not None:
+            dates, sizes, prices = self.transactions
+            lo, hi = _bounds(dates, start, end)
+            transactions = (dates[lo:hi], sizes[lo:hi], prices[lo:hi])
+
+        return {
+            'bucket_size': bucket_size,
+            'bars': last - first,
+            'dates': self.dates[first:last:bucket_size],
+            'ohlcv': downsample_arrays({column: values[first:last] for column, values in self.bars.items()}, bucket_size),
+            'curves': curves,
+            'transactions': transactions,
+        }
+
+class InteractivePlot:
+    """
+    Stock chart that shows only the visible window of a `PlotCache`.
+
+    `figure` is laid out like `plot` with `max_points`. `zoom` and
+    `relayout` replace the data of every trace with the window being
+    looked at, aggregated to at most `max_points` candles. The browser then
+    holds a few thousand points at any zoom level, with full detail once
+    zoomed in far enough.
+
+    Parameters:
+    cache (PlotCache): Data of the chart.
+    title (str): Title of the figure.
+    max_points (int): Upper bound on the number of candles shown.
+    figure_class (type): `go.Figure`, or `go.FigureWidget` for notebooks.
+    """
+
+    def __init__(self, cache: PlotCache, title="110", max_points=DEFAULT_MAX_POINTS, figure_class=go.Figure):
+        self.cache = cache
+        self.max_points = max_points
+
+        window = cache.window(max_points=max_points)
+        stock_df, other_dfs, transactions = _window_frames(window)
+        fig = plot(stock_df, other_dfs=other_dfs, transactions=transactions, title=title, bucket_size=1)
+        # Dash keeps the user's zoom across figure updates with the same uirevision
+        fig.update_layout(uirevision='ekeko', meta={'bucket_size': window['bucket_size'], 'bars': window['bars']})
+        self.figure = figure_class(fig)
+
+    def zoom(self, start=None, end=None) -> int:
+        """
+        Show the bars between two dates (inclusive), None for the start or end of the data.
+
+        Returns:
+        int: The bucket size now shown.
+        """
+        window = self.cache.window(start, end, self.max_points)
+        dates, ohlcv = window['dates'], window['ohlcv']
+        traces = iter(self.figure.data)
+
+        with self.figure.batch_update():
+            next(traces).update(x=dates, open=ohlcv['Open'], high=ohlcv['High'], low=ohlcv['Low'], close=ohlcv['Close'])
+            next(traces).update(x=dates, y=ohlcv['Close'])
+            for _, curve_dates, values in window['curves']:
+                next(traces).update(x=curve_dates, y=values)
+
+            next(traces).update(x=dates, y=ohlcv['Volume'], marker_color=volume_colors(ohlcv['Open'], ohlcv['Close']))
+            volume_max = np.nanmax(ohlcv['Volume']) if len(dates) else 0
+            self.figure.layout.yaxis2.range = [0, volume_max * 5]
+
+            if window['transactions'] is not None:
+                transaction_dates, sizes, prices = window['transactions']
+                for side in (sizes > 0, sizes < 0):
+                    next(traces).update(x=transaction_dates[side], y=prices[side], customdata=sizes[side])
+
+            self.figure.layout.meta = {'bucket_size': window['bucket_size'], 'bars': window['bars']}
+        return window['bucket_size']
+
+    def relayout(self, event: dict) -> bool:
+        """
+        Apply a Plotly relayout event, as sent by Dash's `relayoutData`.
+
+        Returns:
+        bool: Whether the x-axis range changed.
+        """
+        if not event:
+            return False
+        if event.get('xaxis.autorange'):
+            self.zoom()
+        elif 'xaxis.range[0]' in event:
+            self.zoom(event['xaxis.range[0]'], event['xaxis.range[1]'])
+        elif 'xaxis.range' in event:
+            self.zoom(*event['xaxis.range'])
+        else:
+            return False
+        return True
+
+def interactive_plot(stock_df, other_dfs=None, transactions=None, title="110", max_points=DEFAULT_MAX_POINTS):
+    """
+    `go.FigureWidget` version of `plot` that re-aggregates the visible window on zoom.
+
+    Runs in the notebook kernel, with no server. Requires the Jupyter widget
+    support of plotly (`anywidget`).
+
+    Parameters:
+    stock_df (pd.DataFrame): OHLCV bars indexed by datetime.
+    other_dfs (list): Series to overlay, e.g. indicators.
+    transactions (pd.DataFrame): Transactions of the ticker with size and price columns.
+    title (str): Title of the figure.
+    max_points (int): Upper bound on the number of candles shown.
+
+    Returns:
+    plotly.graph_objects.FigureWidget: The chart.
+    """
+    chart = InteractivePlot(PlotCache(stock_df, other_dfs, transactions), title, max_points, go.FigureWidget)
+
+    def on_range(layout, x_range):
+        if x_range is None:
+            chart.zoom()
+        else:
+            chart.zoom(*x_range)
+
+    chart.figure.layout.on_change(on_range, 'xaxis.range')
+    return chart.figure
+
+def dash_app(stock_df, other_dfs=None, transactions=None, title="110", max_points=DEFAULT_MAX_POINTS):
+    """
+    Dash app serving a chart that re-aggregates the visible window on zoom.
+
+    Start it locally with `app.run()`. The data stays in the server process
+    and each zoom sends only the visible window to the browser. The chart is
+    shared by all browser sessions of the app.
+
+    Parameters: see `interactive_plot`.
+
+    Returns:
+    dash.Dash: The app.
+    """
+    from dash import Dash, Input, Output, dcc, html
+
+    chart = InteractivePlot(PlotCache(stock_df, other_dfs, transactions), title, max_points)
+    app = Dash(__name__)
+    app.layout = html.Div([dcc.Graph(id=DASH_GRAPH_ID, figure=chart.figure, style={'height': '95vh'})])
+
+    @app.callback(Output(DASH_GRAPH_ID, 'figure'), Input(DASH_GRAPH_ID, 'relayoutData'), prevent_initial_call=True)
+    def relayout(event):
+        chart.relayout(event)
+        return chart.figure
+
+    return app
+
+###############################################################################
+### Utilities
+###############################################################################
+
+def _sorted_dates(index):
+    # Naive UTC, like the transaction dates backtrader reports, so bars and markers line up
+    if isinstance(index, pd.DatetimeIndex) and index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    dates = pd.DatetimeIndex(index).to_numpy()
+    order = np.argsort(dates, kind='stable')
+    return dates[order], order
+
+def _bounds(dates, start, end):
+    first = 0 if start is None else int(np.searchsorted(dates, _datetime64(start, dates.dtype), side='left'))
+    last = len(dates) if end is None else int(np.searchsorted(dates, _datetime64(end, dates.dtype), side='right'))
+    return first, max(first, last)
+
+def _datetime64(value, dtype):
+    # In the unit of the dates searched, which may be out of the nanosecond range
+    timestamp = pd.Timestamp(value)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_datetime64().astype(dtype)
+
+def _window_frames(window):
+    index = pd.DatetimeIndex(window['dates'])
+    stock_df = pd.DataFrame(window['ohlcv'], index=index)
+    other_dfs = [pd.Series(values, index=pd.DatetimeIndex(dates), name=name) for name, dates, values in window['curves']]
+    transactions = None
+    if window['transactions'] is not None:
+        dates, sizes, prices = window['transactions']
+        transactions = pd.DataFrame({'size': sizes, 'price': prices}, index=pd.DatetimeIndex(dates))
+    return stock_df, other_dfs, transactions
@@ -4,10 +4,17 @@
 A small library to plot financial stock data using Plotly.
 """
 
+import copy
+import functools
+
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 
+from ..profiling import profiled
+from .resample import downsample_ohlcv, downsample_series, lod_bucket_size
+
 # Configuration section for colors and styling
 COLORS = {
     'background': "#22262f",
@@ -17,12 +24,25 @@ COLORS = {
     'red': '#f03538'
 }
 GRID_N_TICKS = 10
+# Scatter traces are drawn with WebGL once a figure has more points than this
+WEBGL_THRESHOLD = 5_000
+# Volume bars are colored by `volume_colors`, 1 for bars closing above their open
+VOLUME_COLORSCALE = [[0, COLORS['red']], [1, COLORS['green']]]
 
 def init_stock_plot(title):
-    """Initialize a stock plot with a secondary y-axis."""
+    """Initialize a stock plot with a secondary y-axis, 'y2', overlaying the price axis."""
+    fig = go.Figure(layout=copy.deepcopy(_stock_plot_layout()))
+    fig.update_layout(title=title)
+    return fig
+
+@functools.lru_cache(maxsize=1)
+def _stock_plot_layout() -> dict:
+    # Building the subplot layout is the slow part of a small figure, so it
+    # is done once per process; callers get a deep copy. The plotly theme is
+    # left out and applied again to each figure, which is much cheaper than
+    # validating it.
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     fig.update_layout(
-        title=title,
         xaxis_title='Date',
         hovermode='x',
         paper_bgcolor=COLORS['background'],
@@ -48,33 +68,35 @@ def init_stock_plot(title):
         ),
         font=dict(color=COLORS['text']),
     )
-    return fig
-
-def add_volume(fig, stock_df):
-    """Add volume bars to the plot."""
-    colors = [COLORS['green'] if open < close else COLORS['red'] for open, close in zip(stock_df['Open'], stock_df['Close'])]
+    layout = fig.to_dict()['layout']
+    del layout['template']
+    return layout
 
+def add_volume(fig, stock_df, dates=None):
+    """Add volume bars to the plot, at `dates` or the index of `stock_df`."""
     fig.add_trace(
         go.Bar(
-            x=stock_df.index, y=stock_df['Volume'],
-            marker_color=colors,
+            x=stock_df.index if dates is None else dates,
+            y=stock_df['Volume'].to_numpy(),
+            marker=dict(color=volume_colors(stock_df['Open'].to_numpy(), stock_df['Close'].to_numpy()),
+                        colorscale=VOLUME_COLORSCALE, cmin=0, cmax=1),
             marker_line_width=0,
             name='Volume',
             hoverinfo='none',
             opacity=0.6,
-            visible=True
-        ),
-        secondary_y=True
+            visible=True,
+            xaxis='x',
+            yaxis='y2',
+        )
     )
 
     # Update the secondary y-axis range to be at most 15% of the plot height
-    fig.update_yaxes(
+    fig.update_layout(yaxis2=dict(
         title_text="Volume",
-        secondary_y=True,
         range=[0, stock_df['Volume'].max() * 5],  # Scale factor to adjust the height
         showgrid=False,
         zeroline=False
-    )
+    ))
     
     # Update layout to adjust the margin between the main plot and volume plot
     fig.update_layout(
@@ -84,15 +106,19 @@ def add_volume(fig, stock_df):
     
     return fig
 
-def add_candlestick(fig, stock_df):
-    """Add candlestick plot to the figure."""
+def volume_colors(opens, closes):
+    """Color value of each volume bar on `VOLUME_COLORSCALE`."""
+    return (opens < closes).astype(np.int8)
+
+def add_candlestick(fig, stock_df, dates=None):
+    """Add candlestick plot to the figure, at `dates` or the index of `stock_df`."""
     fig.add_trace(
         go.Candlestick(
-            x=stock_df.index,
-            open=stock_df['Open'],
-            high=stock_df['High'],
-            low=stock_df['Low'],
-            close=stock_df['Close'],
+            x=stock_df.index if dates is None else dates,
+            open=stock_df['Open'].to_numpy(),
+            high=stock_df['High'].to_numpy(),
+            low=stock_df['Low'].to_numpy(),
+            close=stock_df['Close'].to_numpy(),
             increasing_line_color=COLORS['green'],
             decreasing_line_color=COLORS['red'],
             name='Candlestick',
@@ -102,15 +128,18 @@ def add_candlestick(fig, stock_df):
     fig.update_layout(xaxis_rangeslider_visible=False)
     return fig
 
-def add_transactions(fig, buysell_df):
-    """Add buy/sell markers to the plot."""
-    buys = buysell_df[buysell_df['size'] > 0]
-    sells = buysell_df[buysell_df['size'] < 0]
+def add_transactions(fig, buysell_df, dates=None):
+    """Add buy/sell markers to the plot, at `dates` or the index of `buysell_df`."""
+    dates = np.asarray(buysell_df.index if dates is None else dates)
+    sizes = buysell_df['size'].to_numpy()
+    prices = buysell_df['price'].to_numpy()
+    buys = sizes > 0
+    sells = sizes < 0
     
     fig.add_trace(
         go.Scatter(
-            x=buys.index,
-            y=buys['price'],
+            x=dates[buys],
+            y=prices[buys],
             mode='markers',
             marker=dict(
                 symbol='triangle-up', 
@@ -119,15 +148,15 @@ def add_transactions(fig, buysell_df):
                 line=dict(color='black', width=2.5)  # Adding black border
             ),
             name='Buy',
-            hoverinfo='text',
-            text=[f'Buy<br>Price: {price}<br>Size: {size}' for price, size in zip(buys['price'], buys['size'])]
+            customdata=sizes[buys],
+            hovertemplate=transaction_hovertemplate('Buy'),
         )
     )
     
     fig.add_trace(
         go.Scatter(
-            x=sells.index,
-            y=sells['price'],
+            x=dates[sells],
+            y=prices[sells],
             mode='markers',
             marker=dict(
                 symbol='triangle-down', 
@@ -136,17 +165,28 @@ def add_transactions(fig, buysell_df):
                 line=dict(color='black', width=2.5)  # Adding black border
             ),
             name='Sell',
-            hoverinfo='text',
-            text=[f'Sell<br>Price: {price}<br>Size: {size}' for price, size in zip(sells['price'], sells['size'])]
+            customdata=sizes[sells],
+            hovertemplate=transaction_hovertemplate('Sell'),
         )
     )
     
     return fig
 
-def add_scatter(fig, dates, values, name, color, visible='legendonly'):
-    """Add scatter plot to the figure."""
+def transaction_hovertemplate(label) -> str:
+    """Hover text of transaction markers, with the sizes as `customdata`."""
+    return f'{label}<br>Price: %{{y}}<br>Size: %{{customdata}}<extra></extra>'
+
+def use_webgl(num_points, webgl=None) -> bool:
+    """Whether to draw `num_points` scatter points with WebGL: `webgl` if given, else above `WEBGL_THRESHOLD`."""
+    if webgl is not None:
+        return webgl
+    return num_points > WEBGL_THRESHOLD
+
+def add_scatter(fig, dates, values, name, color, visible='legendonly', webgl=False):
+    """Add scatter plot to the figure, with `go.Scattergl` if `webgl`."""
+    trace_class = go.Scattergl if webgl else go.Scatter
     fig.add_trace(
-        go.Scatter(
+        trace_class(
             x=dates,
             y=values,
             name=name,
@@ -157,46 +197,104 @@ def add_scatter(fig, dates, values, name, color, visible='legendonly'):
     )
     return fig
 
-def plot(stock_df, other_dfs=None, transactions=None, title="110"):
-    """Plot stock data with additional curves and buy/sell markers."""
-    plot_df = stock_df.copy()
-    plot_df.index = plot_df.index.strftime('%Y-%m-%d')
+@profiled('plot.plot')
+def plot(stock_df, other_dfs=None, transactions=None, title="110", max_points=None, bucket_size=None, webgl=None):
+    """
+    Plot stock data with additional curves and buy/sell markers.
+
+    By default every bar is drawn on a category axis of dates. With
+    `max_points` or `bucket_size`, bars are aggregated into OHLCV buckets
+    (see `downsample_ohlcv`) and drawn on a date axis, and overlay curves
+    are averaged over the same number of bars. Transaction markers keep
+    their exact dates. The bucket size used is stored in
+    `fig.layout.meta['bucket_size']`. A zoomed view can then ask for finer
+    detail by plotting the visible slice of `stock_df` with a smaller
+    `bucket_size`.
+
+    The close and overlay curves are drawn with WebGL when they have more
+    than `WEBGL_THRESHOLD` points in total. Candlesticks and volume bars
+    have no WebGL version; use `max_points` for long series.
+
+    Parameters:
+    stock_df (pd.DataFrame): OHLCV bars indexed by datetime.
+    other_dfs (list): Series to overlay, e.g. indicators.
+    transactions (pd.DataFrame): Transactions of the ticker with size and price columns.
+    title (str): Title of the figure.
+    max_points (int): Draw at most this many candles, picking the bucket size accordingly.
+    bucket_size (int): Bars per candle; overrides `max_points`.
+    webgl (bool): Force WebGL curves on or off instead of using the threshold.
+
+    Returns:
+    plotly.graph_objects.Figure: The figure.
+    """
+    if max_points is not None or bucket_size is not None:
+        return _plot_lod(stock_df, other_dfs, transactions, title, max_points, bucket_size, webgl)
+
+    # Days of the category axis, which transactions at any time of day fall on
+    dates = day_labels(stock_df.index)
+    webgl = use_webgl(len(stock_df) + sum(len(other_df) for other_df in other_dfs or []), webgl)
     fig = init_stock_plot(title)
 
-    fig = add_candlestick(fig, plot_df)
+    fig = add_candlestick(fig, stock_df, dates)
     
-    fig = add_scatter(fig, plot_df.index, plot_df['Close'], 'close', 'blue', 'legendonly')
+    fig = add_scatter(fig, dates, stock_df['Close'].to_numpy(), 'close', 'blue', 'legendonly', webgl)
 
     curve_colors = ['yellow', 'cyan', 'magenta']
     if other_dfs:
         for idx, other_df in enumerate(other_dfs):
             color_index = idx % len(curve_colors)
-            other_df.index = other_df.index.strftime('%Y-%m-%d')
-            fig = add_scatter(fig, other_df.index, other_df, other_df.name, curve_colors[color_index])
+            fig = add_scatter(fig, day_labels(other_df.index), other_df.to_numpy(), other_df.name, curve_colors[color_index], webgl=webgl)
+
+    fig = add_volume(fig, stock_df, dates)
+
+    if transactions is not None:
+        fig = add_transactions(fig, transactions, day_labels(transactions.index))
+        
+    return fig
+
+def _plot_lod(stock_df, other_dfs, transactions, title, max_points, bucket_size, webgl):
+    if bucket_size is None:
+        bucket_size = lod_bucket_size(len(stock_df), max_points)
+    plot_df = downsample_ohlcv(stock_df, bucket_size)
+    curves = [downsample_series(other_df, bucket_size) for other_df in other_dfs or []]
+    webgl = use_webgl(len(plot_df) + sum(len(curve) for curve in curves), webgl)
+
+    fig = init_stock_plot(title)
+    # Buckets and exact transaction dates need a real time axis
+    fig.update_xaxes(type='date')
+    fig.update_layout(meta={'bucket_size': bucket_size, 'bars': len(stock_df)})
+
+    fig = add_candlestick(fig, plot_df)
+    fig = add_scatter(fig, plot_df.index, plot_df['Close'].to_numpy(), 'close', 'blue', 'legendonly', webgl)
+
+    curve_colors = ['yellow', 'cyan', 'magenta']
+    for idx, curve in enumerate(curves):
+        fig = add_scatter(fig, curve.index, curve.to_numpy(), curve.name, curve_colors[idx % len(curve_colors)], webgl=webgl)
 
     fig = add_volume(fig, plot_df)
 
     if transactions is not None:
-        transactions.index
-        transactions.index = transactions.index.strftime('%Y-%m-%d')
         fig = add_transactions(fig, transactions)
-        
+
     return fig
 
-def plot_different_stocks(stocks, price_type, title):
-    """Plot different stocks on a single plot."""
+@profiled('plot.plot_different_stocks')
+def plot_different_stocks(stocks, price_type, title, webgl=None):
+    """Plot different stocks on a single plot, with WebGL above `WEBGL_THRESHOLD` points unless `webgl` is given."""
+    webgl = use_webgl(sum(len(stock['df']) for stock in stocks), webgl)
     fig = init_stock_plot(title)
 
     curve_colors = ['blue', 'yellow', 'cyan', 'magenta']
     for idx, stock in enumerate(stocks):
         color_index = idx % len(curve_colors)
-        dates = stock['df'].index.strftime('%Y-%m-%d')
-        values = stock['df'][price_type]
-        fig = add_scatter(fig, dates, values, stock['symbol'], curve_colors[color_index], visible=True)
+        dates = day_labels(stock['df'].index)
+        values = stock['df'][price_type].to_numpy()
+        fig = add_scatter(fig, dates, values, stock['symbol'], curve_colors[color_index], visible=True, webgl=webgl)
 
     return fig
 
-def scatter(x, y, labels, title):
+@profiled('plot.scatter')
+def scatter(x, y, labels, title, webgl=None):
     """
     Creates a scatter plot with customized aesthetics.
     
@@ -205,6 +303,7 @@ def scatter(x, y, labels, title):
         y (list): y-axis values.
         labels (dict): A dictionary containing label configurations for the plot.
         title (str): The title of the plot.
+        webgl (bool): Draw with WebGL; by default above `WEBGL_THRESHOLD` points.
         
     Returns:
         plotly.graph_objects.Figure: The configured plot.
@@ -214,7 +313,8 @@ def scatter(x, y, labels, title):
         x=x,
         y=y,
         labels=labels,
-        title=title
+        title=title,
+        render_mode='webgl' if use_webgl(len(x), webgl) else 'svg',
     )
     
     # Update layout with the custom color and grid settings
@@ -243,3 +343,9 @@ def scatter(x, y, labels, title):
     fig.update_xaxes(linecolor=COLORS['background'])
     
     return fig
+
+def day_labels(index):
+    """'%Y-%m-%d' of each date of a DatetimeIndex, in its own timezone."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return np.datetime_as_string(index.to_numpy().astype('datetime64[D]')).astype(object)
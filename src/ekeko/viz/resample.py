@@ -0,0 +1,81 @@
+"""Level-of-detail aggregation of price series for plotting."""
+import math
+
+import numpy as np
+import pandas as pd
+
+# Aggregation of each OHLCV column over a bucket of bars
+OHLCV_AGGREGATIONS = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+}
+
+def lod_bucket_size(num_bars: int, max_points: int) -> int:
+    """Smallest number of bars per bucket that keeps `num_bars` bars within `max_points` points."""
+    if max_points < 1:
+        raise ValueError(f"max_points must be positive, got {max_points}")
+    return max(1, math.ceil(num_bars / max_points))
+
+def downsample_ohlcv(df: pd.DataFrame, bucket_size: int) -> pd.DataFrame:
+    """
+    Aggregate consecutive bars into OHLCV buckets.
+
+    Every `bucket_size` bars become one: the first open, highest high, lowest
+    low, last close and summed volume, dated at the first bar of the bucket.
+    NaN values are skipped. Other columns are dropped.
+
+    Parameters:
+    df (pd.DataFrame): Bars with some of the Open, High, Low, Close and Volume columns.
+    bucket_size (int): Number of bars per bucket; the last bucket may be shorter.
+
+    Returns:
+    pd.DataFrame: One row per bucket, the input itself when `bucket_size` is 1.
+    """
+    if bucket_size <= 1 or len(df) == 0:
+        return df
+    columns = {column: df[column].to_numpy(dtype=np.float64) for column in OHLCV_AGGREGATIONS if column in df.columns}
+    return pd.DataFrame(downsample_arrays(columns, bucket_size), index=df.index[::bucket_size])
+
+def downsample_arrays(columns: dict, bucket_size: int) -> dict:
+    """`downsample_ohlcv` on float arrays keyed by OHLCV column name, all of the same length."""
+    length = len(next(iter(columns.values()), ()))
+    if bucket_size <= 1 or length == 0:
+        return dict(columns)
+    starts = np.arange(0, length, bucket_size)
+    lasts = np.append(starts[1:], length) - 1
+
+    buckets = {}
+    for column, values in columns.items():
+        aggregation = OHLCV_AGGREGATIONS[column]
+        if aggregation == 'first':
+            buckets[column] = values[starts]
+        elif aggregation == 'last':
+            buckets[column] = values[lasts]
+        elif aggregation == 'max':
+            buckets[column] = np.fmax.reduceat(values, starts)
+        elif aggregation == 'min':
+            buckets[column] = np.fmin.reduceat(values, starts)
+        else:
+            buckets[column] = np.add.reduceat(np.nan_to_num(values), starts)
+    return buckets
+
+def downsample_series(series: pd.Series, bucket_size: int) -> pd.Series:
+    """Mean of every `bucket_size` consecutive values, dated at the first one, for overlay curves."""
+    if bucket_size <= 1 or len(series) == 0:
+        return series
+    means = downsample_mean(series.to_numpy(dtype=np.float64), bucket_size)
+    return pd.Series(means, index=series.index[::bucket_size], name=series.name)
+
+def downsample_mean(values: np.ndarray, bucket_size: int) -> np.ndarray:
+    """Mean of every `bucket_size` consecutive values, skipping NaN."""
+    if bucket_size <= 1 or len(values) == 0:
+        return values
+    starts = np.arange(0, len(values), bucket_size)
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+    counts = np.add.reduceat(present.astype(np.int64), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
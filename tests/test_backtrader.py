@@ -0,0 +1,582 @@
+import os
+import pickle
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+import ekeko
+from ekeko.backtrader.cerebro import _format_trade_tracker
+
+def create_fake_data(prices, start='2022-01-01'):
+    num_days = len(prices)
+    dates = pd.date_range(start=start, periods=num_days, freq='D')
+    df = pd.DataFrame(index=dates)
+    df['Open'] = prices
+    df['High'] = prices
+    df['Low'] = prices
+    df['Close'] = prices
+    df['Volume'] = 1000
+    return df
+
+def fake_stock_dfs():
+    return {
+        "STOCK_1": create_fake_data([2, 4, 6, -500, 3, 5, 8, 7, 10, 9]),
+        "STOCK_2": create_fake_data([2, 4, 3, 1, 6, 9]),
+    }
+
+class EvenOddStrategy(bt.Strategy):
+    def next(self):
+        for data in self.datas:
+            if data.close[0] % 2 == 0:  # Buy on even price
+                if not self.getposition(data).size:
+                    self.buy(data=data, size=2)
+
+            if data.close[0] % 2 != 0 and data.close[0] > 0:  # Sell on odd price and on positive value
+                if self.getposition(data).size:
+                    self.sell(data=data, size=2)
+
+def drawdown_stats(drawdown):
+    """The keys of a drawdown analysis that bt.analyzers.DrawDown also has."""
+    stats = {key: drawdown[key] for key in ['len', 'drawdown', 'moneydown']}
+    stats['max'] = {key: drawdown['max'][key] for key in ['len', 'drawdown', 'moneydown']}
+    return stats
+
+def make_cerebro(stock_dfs, strategy=EvenOddStrategy, cash=2000.0, **kwargs):
+    ekeko_cerebro = ekeko.backtrader.EkekoCerebro()
+    ekeko_cerebro.cerebro.broker.setcash(cash)
+    for ticker, stock_df in stock_dfs.items():
+        ekeko_cerebro.adddata(stock_df, name=ticker)
+    ekeko_cerebro.addstrategy(strategy, **kwargs)
+    return ekeko_cerebro
+
+def test_columnar_trade_tracker_matches_default():
+    cerebro = make_cerebro(fake_stock_dfs()).cerebro
+    cerebro.addanalyzer(ekeko.backtrader.EkekoTradeTracker, _name='default')
+    cerebro.addanalyzer(ekeko.backtrader.EkekoTradeTracker, _name='columnar', columnar=True)
+    strategy = cerebro.run()[0]
+
+    expected = _format_trade_tracker(strategy.analyzers.default.get_analysis())
+    table = strategy.analyzers.columnar.get_analysis()
+    actual = _format_trade_tracker(table)
+
+    assert list(table.columns) == ['date', 'ticker', 'pnl', 'pnlcomm', 'size', 'barlen', 'open_date']
+    assert (table['size'] == 2).all()
+    assert (table['open_date'] < table['date']).all()
+    assert list(expected) == list(actual)
+    for ticker in expected:
+        pd.testing.assert_frame_equal(expected[ticker], actual[ticker][['pnl', 'pnlcomm']])
+
+class ScalingStrategy(bt.Strategy):
+    """Scales in and out of positions: buy 1, buy 3, sell 4, then sell 2, buy 1, buy 1."""
+    orders = {1: 1, 2: 3, 3: -4, 5: -2, 6: 1, 7: 1}
+
+    def next(self):
+        size = self.orders.get(len(self.data))
+        if size:
+            self.buy(size=size) if size > 0 else self.sell(size=-size)
+
+def test_columnar_trade_tracker_sizes_of_scaled_trades():
+    cerebro = make_cerebro({'STOCK_1': create_fake_data([10, 11, 12, 13, 12, 11, 12, 13, 14])},
+                           strategy=ScalingStrategy).cerebro
+    cerebro.addanalyzer(ekeko.backtrader.EkekoTradeTracker, _name='columnar', columnar=True)
+    table = cerebro.run()[0].analyzers.columnar.get_analysis()
+    # A long trade scaled in to 4, then a short trade partly covered before closing
+    assert list(table['size']) == [4.0, -1.0]
+
+def test_num2datetime_matches_backtrader():
+    dates = pd.date_range('1999-12-31 09:30', periods=50, freq='7h13min17s').to_pydatetime()
+    numbers = np.array([bt.date2num(date) for date in dates])
+    expected = [bt.num2date(number) for number in numbers]
+    assert list(ekeko.backtrader.analyzer.num2datetime(numbers).to_pydatetime()) == expected
+
+class ThresholdStrategy(bt.Strategy):
+    params = dict(buy_below=3, sell_above=5)
+
+    def next(self):
+        for data in self.datas:
+            position = self.getposition(data).size
+            if not position and 0 < data.close[0] < self.p.buy_below:
+                self.buy(data=data)
+            elif position and data.close[0] > self.p.sell_above:
+                self.sell(data=data)
+
+def test_optimize_matches_single_runs():
+    ekeko_cerebro = make_cerebro(fake_stock_dfs(), strategy=ThresholdStrategy)
+    grid = {'buy_below': [3, 5], 'sell_above': [4, 8]}
+    table = ekeko_cerebro.optimize(grid, max_workers=2)
+
+    assert list(table.columns[:2]) == ['buy_below', 'sell_above']
+    assert len(table) == 4
+    for row in table.to_dict('records'):
+        single = make_cerebro(fake_stock_dfs(), strategy=ThresholdStrategy,
+                              buy_below=row['buy_below'], sell_above=row['sell_above'])
+        _, analysis_results = single.run()
+        for name, value in analysis_results['trade_analysis'].items():
+            assert row[name] == value
+
+    # Completed combinations are reused, only the new one runs
+    grid['sell_above'].append(9)
+    extended = ekeko.backtrader.sweep(ThresholdStrategy, grid, fake_stock_dfs(), cash=2000.0,
+                                      max_workers=1, completed=table)
+    assert len(extended) == 6
+    pd.testing.assert_frame_equal(extended.iloc[[0, 1, 3, 4]].reset_index(drop=True), table)
+
+def test_result_cache_hits_misses_and_evicts(tmp_path):
+    cache = ekeko.backtrader.ResultCache(str(tmp_path))
+    strategy, expected = make_cerebro(fake_stock_dfs()).run(cache=cache)
+    assert strategy is not None and len(cache) == 1
+
+    strategy, cached = make_cerebro(fake_stock_dfs()).run(cache=cache)
+    assert strategy is None
+    assert cached['trade_analysis'] == expected['trade_analysis']
+    assert drawdown_stats(cached['drawdown']) == drawdown_stats(expected['drawdown'])
+    for ticker, df in expected['transactions'].items():
+        pd.testing.assert_frame_equal(cached['transactions'][ticker], df)
+
+    # Forced runs, and any change to data, params or broker, miss
+    assert make_cerebro(fake_stock_dfs()).run(cache=cache, force=True)[0] is not None
+    changed = fake_stock_dfs()
+    changed['STOCK_2'].iloc[-1, 3] = 11
+    assert make_cerebro(changed).run(cache=cache)[0] is not None
+    assert make_cerebro(fake_stock_dfs(), strategy=ThresholdStrategy).run(cache=cache)[0] is not None
+    assert make_cerebro(fake_stock_dfs(), strategy=ThresholdStrategy, buy_below=4).run(cache=cache)[0] is not None
+    assert make_cerebro(fake_stock_dfs(), cash=3000.0).run(cache=cache)[0] is not None
+    assert len(cache) == 5
+
+    cache.max_bytes = cache.size // 2
+    make_cerebro(fake_stock_dfs()).run(cache=cache, force=True)
+    assert 0 < cache.size <= cache.max_bytes
+
+def test_result_cache_tells_apart_strategies_without_source(tmp_path):
+    def define(rule):
+        # Like a strategy defined in a notebook: inspect.getsource fails
+        namespace = {'bt': bt}
+        exec(f"""
+class S(bt.Strategy):
+    def next(self):
+        for data in self.datas:
+            if {rule} and not self.getposition(data).size:
+                self.buy(data=data)
+            elif self.getposition(data).size:
+                self.sell(data=data)
+""", namespace)
+        return namespace['S']
+
+    cache = ekeko.backtrader.ResultCache(str(tmp_path))
+    first, second = define('data.close[0] > 3'), define('data.close[0] < 3')
+    _, expected_first = make_cerebro(fake_stock_dfs(), strategy=first).run(cache=cache)
+    strategy, expected_second = make_cerebro(fake_stock_dfs(), strategy=second).run(cache=cache)
+    assert strategy is not None and len(cache) == 2
+    assert expected_first['trade_analysis'] != expected_second['trade_analysis']
+
+    # The same code defined again still hits
+    strategy, cached = make_cerebro(fake_stock_dfs(), strategy=define('data.close[0] < 3')).run(cache=cache)
+    assert strategy is None and cached['trade_analysis'] == expected_second['trade_analysis']
+
+def test_result_store_round_trip_and_queries(tmp_path, capsys):
+    pytest.importorskip('pyarrow')
+    store = ekeko.backtrader.ResultStore(str(tmp_path))
+    first = make_cerebro(fake_stock_dfs())
+    _, expected = first.run()
+    first_id = first.save_results(store, expected, run_id='even-odd', note='baseline')
+    second = make_cerebro(fake_stock_dfs(), strategy=ThresholdStrategy, buy_below=5)
+    second_id = ekeko.backtrader.EkekoResultAnalyzer(second.run()[1]).save(store)
+
+    runs = store.runs()
+    assert list(runs.index) == [first_id, second_id]
+    assert runs.loc['even-odd', 'strategy'] == 'EvenOddStrategy'
+    assert runs.loc['even-odd', 'note'] == 'baseline'
+    assert runs.loc['even-odd', 'num_trades'] == expected['trade_analysis']['num_trades']
+
+    stored = store.load(first_id)
+    assert stored['trade_analysis'] == expected['trade_analysis']
+    assert drawdown_stats(stored['drawdown']) == drawdown_stats(expected['drawdown'])
+    for frame in ['curve', 'periods']:
+        pd.testing.assert_frame_equal(stored['drawdown'][frame], expected['drawdown'][frame])
+    for table in ['transactions', 'trades']:
+        assert list(stored[table]) == list(expected[table])
+        for ticker, df in expected[table].items():
+            pd.testing.assert_frame_equal(stored[table][ticker], df, check_index_type=False)
+
+    ekeko.backtrader.EkekoResultAnalyzer(expected).print()
+    in_memory = capsys.readouterr().out
+    ekeko.backtrader.EkekoResultAnalyzer.open(store, first_id).print()
+    assert capsys.readouterr().out == in_memory
+
+    import pyarrow.compute as pc
+    losers = store.trades(tickers=['STOCK_1'], filter=pc.field('pnlcomm') < 0)
+    assert list(losers.columns[:3]) == ['date', 'run_id', 'ticker']
+    assert set(losers['ticker']) == {'STOCK_1'} and (losers['pnlcomm'] < 0).all()
+    everything = store.transactions(columns=['size'])
+    assert set(everything['run_id']) == {first_id, second_id}
+    assert list(everything.columns) == ['date', 'run_id', 'ticker', 'size']
+
+    store.delete(second_id)
+    assert list(store.runs().index) == [first_id]
+    assert os.listdir(tmp_path / 'drawdown') == ['run_id=even-odd']
+    assert set(store.transactions()['run_id']) == {first_id}
+
+def test_result_store_saves_runs_with_some_sections(tmp_path, capsys):
+    pytest.importorskip('pyarrow')
+    store = ekeko.backtrader.ResultStore(str(tmp_path))
+    ekeko_cerebro = make_cerebro(fake_stock_dfs())
+    _, metrics = ekeko_cerebro.run(metrics_only=True)
+    metrics_id = ekeko_cerebro.save_results(store, metrics)
+    _, trades_only = make_cerebro(fake_stock_dfs()).run(sections=['trades'])
+    trades_id = ekeko.backtrader.EkekoResultAnalyzer(trades_only).save(store)
+
+    stored = store.load(metrics_id)
+    assert list(stored) == ['drawdown', 'trade_analysis']
+    assert stored['trade_analysis'] == metrics['trade_analysis']
+    assert drawdown_stats(stored['drawdown']) == drawdown_stats(metrics['drawdown'])
+    ekeko.backtrader.EkekoResultAnalyzer(metrics).print()
+    in_memory = capsys.readouterr().out
+    ekeko.backtrader.EkekoResultAnalyzer.open(store, metrics_id).print()
+    assert capsys.readouterr().out == in_memory
+
+    stored = store.load(trades_id)
+    assert list(stored) == ['trades'] and list(stored['trades']) == list(trades_only['trades'])
+    assert set(store.trades()['run_id']) == {trades_id} and store.transactions().empty
+
+def test_shared_memory_feeds_match_pandas_data():
+    stock_dfs = fake_stock_dfs()
+    stock_dfs['STOCK_3'] = create_fake_data([3, 2, 4, 5, 7], start='2022-01-03 09:30')
+    stock_dfs['STOCK_3'].index = stock_dfs['STOCK_3'].index.tz_localize('America/New_York')
+
+    numbers = ekeko.backtrader.feeds.date_numbers(stock_dfs['STOCK_3'].index)
+    assert list(numbers) == [bt.date2num(ts.to_pydatetime()) for ts in stock_dfs['STOCK_3'].index]
+
+    _, expected = make_cerebro(stock_dfs).run()
+    with ekeko.backtrader.SharedFrameStore(stock_dfs) as store:
+        _, actual = make_cerebro(store.frames).run()
+
+    assert expected['trade_analysis'] == actual['trade_analysis']
+    assert drawdown_stats(expected['drawdown']) == drawdown_stats(actual['drawdown'])
+    for section in ['transactions', 'trades']:
+        assert list(expected[section]) == list(actual[section])
+        for ticker in expected[section]:
+            pd.testing.assert_frame_equal(expected[section][ticker], actual[section][ticker])
+
+    grid = {'buy_below': [3, 5], 'sell_above': [4, 8]}
+    copied = ekeko.backtrader.sweep(ThresholdStrategy, grid, stock_dfs, cash=2000.0, max_workers=2)
+    shared = ekeko.backtrader.sweep(ThresholdStrategy, grid, stock_dfs, cash=2000.0, max_workers=2,
+                                    shared_memory=True)
+    pd.testing.assert_frame_equal(copied, shared)
+
+class SmaCross(bt.Strategy):
+    params = dict(period=3)
+
+    def __init__(self):
+        self.sma = {data._name: bt.indicators.SMA(data.close, period=self.p.period) for data in self.datas}
+
+    def next(self):
+        for data in self.datas:
+            position = self.getposition(data).size
+            if not position and data.close[0] > self.sma[data._name][0]:
+                self.buy(data=data)
+            elif position and data.close[0] < self.sma[data._name][0]:
+                self.sell(data=data)
+
+class SmaCrossWithStep(SmaCross):
+    params = dict(step=0)
+
+def test_walk_forward_matches_manual_windows():
+    prices = [5, 6, 4, 7, 8, 6, 5, 9, 10, 8, 7, 11, 12, 9, 8, 13, 14, 10, 9, 15]
+    stock_dfs = {'STOCK_1': create_fake_data(prices), 'STOCK_2': create_fake_data(prices[::-1])}
+
+    results = ekeko.backtrader.walk_forward(SmaCross, {'period': 3}, stock_dfs, window='5D', step='5D', warmup=3,
+                                            cash=1000.0, max_workers=2)
+    windows = results['windows']
+    assert len(windows) == 4
+
+    # Each window equals a backtest of the warm-up plus window bars that only trades inside the window
+    manual = []
+    for position, start in enumerate(windows['start']):
+        frames = {ticker: df.iloc[max(position * 5 - 3, 0):position * 5 + 5] for ticker, df in stock_dfs.items()}
+        windowed = ekeko.backtrader.walkforward.windowed_strategy(SmaCross)
+        _, analysis_results = make_cerebro(frames, strategy=windowed, cash=1000.0, period=3,
+                                           ekeko_trade_start=start.to_pydatetime()).run()
+        manual.append(analysis_results)
+        for transactions in analysis_results['transactions'].values():
+            assert (transactions.index >= start).all()
+
+    for ticker, df in results['transactions'].items():
+        expected = pd.concat([result['transactions'][ticker] for result in manual if ticker in result['transactions']])
+        pd.testing.assert_frame_equal(df, expected)
+    assert results['trade_analysis']['num_trades'] == sum(r['trade_analysis']['num_trades'] for r in manual)
+    assert results['drawdown']['max']['drawdown'] == max(r['drawdown']['max']['drawdown'] for r in manual)
+
+    curve = results['drawdown']['curve']
+    expected_curve = pd.concat([r['drawdown']['curve'].loc[start:] for r, start in zip(manual, windows['start'])])
+    pd.testing.assert_frame_equal(curve, expected_curve)
+    assert curve.index.is_unique and curve.index.is_monotonic_increasing and len(curve) == len(prices)
+    pd.testing.assert_frame_equal(results['drawdown']['periods'], ekeko.backtrader.drawdown_periods(curve))
+
+    # Overlapping windows would count the trades of the overlap twice
+    with pytest.raises(ValueError):
+        ekeko.backtrader.walk_forward(SmaCross, {'period': 3}, stock_dfs, window='10D', step='5D')
+
+    # Strategy parameters named like walk_forward's own arguments reach the strategy
+    cerebro = make_cerebro(stock_dfs, strategy=SmaCrossWithStep, cash=1000.0, period=3, step=1)
+    stepped = cerebro.walk_forward(window='5D', step='5D', warmup=3, max_workers=1)
+    assert stepped['windows']['num_trades'].tolist() == windows['num_trades'].tolist()
+
+def random_stock_dfs(num_tickers=4, num_days=200, seed=0):
+    rng = np.random.default_rng(seed)
+    stock_dfs = {}
+    for i in range(num_tickers):
+        n = num_days - 30 * i
+        closes = np.round(50 + np.cumsum(rng.normal(0, 1, n)), 2)
+        df = create_fake_data(closes, start=f'2022-01-0{i + 1}')
+        df['Open'] = np.round(closes + rng.normal(0, 0.5, n), 2)
+        if i == 2:
+            df.index = df.index.tz_localize('America/New_York')
+        stock_dfs[f'T{i}'] = df
+    return stock_dfs
+
+def stream_bars(df):
+    for timestamp, bar in zip(df.index, df.to_dict('records')):
+        yield timestamp, bar
+
+def test_streaming_matches_batch_run_with_bounded_buffers():
+    stock_dfs = random_stock_dfs()
+    _, expected = make_cerebro(stock_dfs, strategy=SmaCross, cash=1000.0, period=5).run()
+
+    ekeko_cerebro = make_cerebro({ticker: stream_bars(df) for ticker, df in stock_dfs.items()},
+                                 strategy=SmaCross, cash=1000.0, period=5)
+    transactions, trades = [], []
+    results, analysis_results = ekeko_cerebro.run_streaming(on_transaction=transactions.append,
+                                                            on_trade=trades.append)
+
+    assert not ekeko_cerebro.stock_dfs and list(ekeko_cerebro.streams) == list(stock_dfs)
+    assert analysis_results['trade_analysis'] == expected['trade_analysis']
+    assert drawdown_stats(analysis_results['drawdown']) == drawdown_stats(expected['drawdown'])
+    streamed = ekeko.backtrader.cerebro._split_by_ticker(pd.DataFrame(transactions))
+    for ticker, df in expected['transactions'].items():
+        pd.testing.assert_frame_equal(streamed[ticker], df, check_index_type=False)
+    streamed = ekeko.backtrader.cerebro._split_by_ticker(pd.DataFrame(trades))
+    for ticker, df in expected['trades'].items():
+        pd.testing.assert_frame_equal(streamed[ticker], df, check_index_type=False)
+
+    # Buffers hold a few bars, not the 200-bar history, and finished orders are dropped
+    assert all(len(data.close.array) < 10 for data in results.datas)
+    assert all(order.alive() for order in results.broker.orders)
+
+def test_streaming_from_asyncio_queues():
+    import asyncio
+    stock_dfs = random_stock_dfs(num_tickers=2)
+    _, expected = make_cerebro(stock_dfs, strategy=SmaCross, cash=1000.0, period=5).run()
+
+    async def main():
+        queues = {ticker: asyncio.Queue(maxsize=4) for ticker in stock_dfs}
+        ekeko_cerebro = make_cerebro(queues, strategy=SmaCross, cash=1000.0, period=5)
+
+        async def produce(ticker, df):
+            for item in stream_bars(df):
+                await queues[ticker].put(item)
+            await queues[ticker].put(None)
+
+        producers = [asyncio.create_task(produce(ticker, df)) for ticker, df in stock_dfs.items()]
+        _, analysis_results = await ekeko_cerebro.run_streaming_async()
+        await asyncio.gather(*producers)
+        return analysis_results
+
+    analysis_results = asyncio.run(main())
+    assert analysis_results['trade_analysis'] == expected['trade_analysis']
+
+def sma_signals(stock_dfs, period=5):
+    entries = {ticker: df['Close'] > df['Close'].rolling(period).mean() for ticker, df in stock_dfs.items()}
+    exits = {ticker: df['Close'] < df['Close'].rolling(period).mean() for ticker, df in stock_dfs.items()}
+    return entries, exits
+
+def test_resume_from_checkpoint_matches_full_run(tmp_path):
+    stock_dfs = random_stock_dfs()
+    _, expected = make_cerebro(stock_dfs, strategy=SmaCross, cash=1000.0, period=5).run()
+
+    def until(date):
+        return {ticker: df[df.index < pd.Timestamp(date, tz=df.index.tz)] for ticker, df in stock_dfs.items()}
+
+    ekeko_cerebro = make_cerebro(until('2022-03-01'), strategy=SmaCross, cash=1000.0, period=5)
+    results, analysis_results = ekeko_cerebro.run()
+    ekeko_cerebro.checkpoint(results, warmup=6).save(str(tmp_path / 'checkpoint.pkl'))
+    checkpoint = ekeko.backtrader.Checkpoint.load(str(tmp_path / 'checkpoint.pkl'))
+
+    # Resume twice: with the whole updated history, then with only the new bars
+    _, analysis_results, checkpoint = ekeko.backtrader.resume(checkpoint, until('2022-05-15'), analysis_results)
+    new_bars = {ticker: df[df.index >= pd.Timestamp('2022-05-15', tz=df.index.tz)] for ticker, df in stock_dfs.items()}
+    _, analysis_results, checkpoint = ekeko.backtrader.resume(checkpoint, new_bars, analysis_results)
+    assert ekeko.backtrader.resume(checkpoint, new_bars, analysis_results)[0] is None
+
+    for table in ['transactions', 'trades']:
+        assert list(analysis_results[table]) == list(expected[table])
+        for ticker, df in expected[table].items():
+            pd.testing.assert_frame_equal(analysis_results[table][ticker], df)
+    for key in ['len', 'drawdown', 'moneydown']:
+        assert np.isclose(analysis_results['drawdown'][key], expected['drawdown'][key])
+        assert np.isclose(analysis_results['drawdown']['max'][key], expected['drawdown']['max'][key])
+    for key, value in expected['trade_analysis'].items():
+        assert np.isclose(analysis_results['trade_analysis'][key], value), key
+    pd.testing.assert_frame_equal(analysis_results['drawdown']['curve'], expected['drawdown']['curve'])
+    pd.testing.assert_frame_equal(analysis_results['drawdown']['periods'], expected['drawdown']['periods'])
+
+def test_profiling_reports_phases_without_changing_results():
+    stock_dfs = random_stock_dfs()
+    _, expected = make_cerebro(stock_dfs, strategy=SmaCross, period=5).run()
+    assert 'profile' not in expected
+
+    with ekeko.profile(profile_next=True) as profiler:
+        _, analysis_results = make_cerebro(stock_dfs, strategy=SmaCross, period=5).run()
+        run_report = profiler.report()
+        # Sections are formatted on first access
+        analysis_results['transactions']
+
+    report = profiler.report()
+    for phase in ['adddata', 'run', 'run.cerebro', 'strategy.next', 'analyzer.transactions',
+                  'analyzer.drawdown', 'format.transactions']:
+        assert phase in report.index, phase
+    assert 'format.trades' not in report.index
+    assert report.loc['adddata', 'calls'] == len(stock_dfs)
+    assert report.loc['run', 'calls'] == 1
+    assert 0 < report.loc['strategy.next', 'calls']
+    assert report.loc['strategy.next', 'wall_s'] <= report.loc['run.cerebro', 'wall_s'] <= report.loc['run', 'wall_s']
+    assert (report['peak_bytes'] >= 0).all()
+    assert report.loc['run', 'peak_bytes'] >= report.loc['run.cerebro', 'peak_bytes']
+    assert profiler.next_stats().total_calls > 0
+    pd.testing.assert_frame_equal(analysis_results['profile'], run_report)
+
+    for table in ['transactions', 'trades']:
+        for ticker, df in expected[table].items():
+            pd.testing.assert_frame_equal(analysis_results[table][ticker], df)
+    assert analysis_results['trade_analysis'] == expected['trade_analysis']
+
+    # A single profiled run without an enclosing profiler
+    _, analysis_results = make_cerebro(stock_dfs, strategy=SmaCross, period=5).run(profile=True)
+    assert 'run.cerebro' in analysis_results['profile'].index
+    assert 'adddata' not in analysis_results['profile'].index
+    assert ekeko.profiling.active_profiler() is None
+
+    # Repeated runs of one cerebro are wrapped once each and leave it as it was
+    ekeko_cerebro = make_cerebro(stock_dfs, strategy=SmaCross, period=5)
+    reports = [ekeko_cerebro.run(profile=True)[1]['profile'] for _ in range(2)]
+    assert reports[0].loc['strategy.next', 'calls'] == reports[1].loc['strategy.next', 'calls']
+    assert reports[0].loc['analyzer.drawdown', 'calls'] == reports[1].loc['analyzer.drawdown', 'calls']
+    assert ekeko_cerebro.cerebro.strats[0][0][0] is SmaCross and ekeko_cerebro.cerebro.analyzers == []
+    results, analysis_results = ekeko_cerebro.run()
+    assert type(results) is SmaCross and 'profile' not in analysis_results
+    assert analysis_results['trade_analysis'] == expected['trade_analysis']
+
+def test_run_computes_selected_sections_lazily(capsys):
+    stock_dfs = random_stock_dfs()
+    full, expected = make_cerebro(stock_dfs, strategy=SmaCross, period=5).run()
+    assert list(expected) == ['transactions', 'trades', 'drawdown', 'trade_analysis']
+    assert expected.formatted == []
+    trades = expected['trades']
+    assert expected.formatted == ['trades'] and expected['trades'] is trades
+
+    results, analysis_results = make_cerebro(stock_dfs, strategy=SmaCross, period=5).run(sections=['trade_analysis'])
+    assert results.analyzers.getnames() == ['tradeanalyzer']
+    assert dict(analysis_results) == {'trade_analysis': expected['trade_analysis']}
+
+    results, analysis_results = make_cerebro(stock_dfs, strategy=SmaCross, period=5).run(metrics_only=True)
+    assert list(analysis_results) == ['drawdown', 'trade_analysis']
+    assert analysis_results['trade_analysis'] == expected['trade_analysis']
+    assert drawdown_stats(analysis_results['drawdown']) == drawdown_stats(expected['drawdown'])
+    # Finished orders and closed trades were not kept, only those notified on the last bar
+    assert len(results._orders) <= 2 * len(stock_dfs) < len(full._orders)
+    assert all(order.alive() for order in results.broker.orders)
+    assert all(len(trades) <= 1 for trades_by_id in results._trades.values() for trades in trades_by_id.values())
+
+    ekeko.backtrader.EkekoResultAnalyzer(analysis_results).print()
+    out = capsys.readouterr().out
+    assert 'Drawdown' in out and 'Transactions' not in out
+
+    # Pickles (e.g. back from worker processes) as a plain, fully formatted dict
+    unpickled = pickle.loads(pickle.dumps(expected))
+    assert type(unpickled) is dict and list(unpickled) == list(expected)
+    for ticker, df in expected['transactions'].items():
+        pd.testing.assert_frame_equal(unpickled['transactions'][ticker], df)
+
+    with pytest.raises(ValueError):
+        make_cerebro(stock_dfs).run(sections=['equity'])
+    with pytest.raises(ValueError):
+        make_cerebro(stock_dfs).run(sections=['transactions'], metrics_only=True)
+
+def test_drawdown_analyzer_matches_backtrader_and_keeps_the_curve():
+    stock_dfs = random_stock_dfs()
+    ekeko_cerebro = make_cerebro(stock_dfs, strategy=SmaCross, cash=1000.0, period=5)
+    ekeko_cerebro.analyzers['btdrawdown'] = (bt.analyzers.DrawDown, {})
+    results, analysis_results = ekeko_cerebro.run()
+
+    drawdown = analysis_results['drawdown']
+    assert drawdown_stats(drawdown) == drawdown_stats(results.analyzers.btdrawdown.get_analysis())
+
+    curve = drawdown.curve
+    calendar = sorted(set().union(*[ekeko.backtrader.vectorized.backtrader_dates(df.index) for df in stock_dfs.values()]))
+    assert list(curve.index) == calendar
+    assert np.isclose(curve['value'].iloc[-1], results.broker.getvalue())
+    np.testing.assert_allclose(curve['peak'], curve['value'].cummax())
+
+    # Periods against a loop over the curve
+    expected, current = [], None
+    for date, row in curve.iterrows():
+        if row['drawdown'] > 0:
+            if current is None:
+                current = {'start': date, 'trough': date, 'drawdown': 0.0, 'len': 0}
+            if row['drawdown'] > current['drawdown']:
+                current.update(trough=date, drawdown=row['drawdown'])
+            current['len'] += 1
+        elif current is not None:
+            expected.append(dict(current, end=date))
+            current = None
+    if current is not None:
+        expected.append(dict(current, end=pd.NaT))
+    periods = drawdown.periods
+    assert len(periods) == len(expected) > 1
+    for (_, period), manual in zip(periods.iterrows(), expected):
+        for key, value in manual.items():
+            assert period[key] == value or (pd.isna(value) and pd.isna(period[key])), key
+    recovered = periods['end'].notna()
+    assert (periods.loc[recovered, 'recovery'] > 0).all() and periods.loc[~recovered, 'recovery'].isna().all()
+
+def test_vectorized_backtest_agrees_with_cerebro():
+    stock_dfs = random_stock_dfs()
+    entries, exits = sma_signals(stock_dfs)
+    assert ekeko.backtrader.cross_check(stock_dfs, entries, exits, stake=3, commission=0.001) == []
+
+    stock_dfs = fake_stock_dfs()
+    entries = {ticker: (df['Close'] % 2 == 0).to_numpy() for ticker, df in stock_dfs.items()}
+    exits = {ticker: ((df['Close'] % 2 != 0) & (df['Close'] > 0)).to_numpy() for ticker, df in stock_dfs.items()}
+    assert ekeko.backtrader.cross_check(stock_dfs, entries, exits, cash=2000.0, stake=2) == []
+
+    analysis_results = ekeko.backtrader.vectorized_backtest(stock_dfs, entries, exits, cash=2000.0, stake=2)
+    _, expected = make_cerebro(stock_dfs).run()
+    assert analysis_results['trade_analysis'] == expected['trade_analysis']
+
+def test_vectorized_screen_matches_per_ticker_backtests():
+    stock_dfs = random_stock_dfs(num_tickers=5)
+    # Ragged and gapped histories, like the 10- and 6-bar series above
+    stock_dfs['GAPPY'] = stock_dfs['T1'].iloc[::3]
+    stock_dfs.update(fake_stock_dfs())
+
+    def signal_fn(closes):
+        entries = (closes % 2 == 0) | (closes > 50.5)
+        exits = ((closes % 2 == 1) & (closes > 0)) | ((closes > 20) & (closes < 49.5))
+        return entries, exits
+
+    screen = ekeko.backtrader.vectorized_screen(stock_dfs, signal_fn, cash=1000.0, stake=2,
+                                                commission=0.001, block_size=3)
+    assert list(screen.index) == list(stock_dfs)
+
+    for ticker, df in stock_dfs.items():
+        entries, exits = signal_fn(df[['Close']])
+        single = ekeko.backtrader.vectorized_backtest(
+            {ticker: df}, {ticker: entries['Close']}, {ticker: exits['Close']},
+            cash=1000.0, stake=2, commission=0.001)
+        row = screen.loc[ticker]
+        for key, value in single['trade_analysis'].items():
+            if key != 'max_drawdown':
+                assert np.isclose(row[key], value), (ticker, key)
+        assert np.isclose(row['max_drawdown_pct'], single['drawdown']['max']['drawdown'])
+        assert np.isclose(row['max_moneydown'], single['drawdown']['max']['moneydown'])
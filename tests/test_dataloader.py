@@ -0,0 +1,157 @@
+import os
+import zipfile
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+import ekeko
+
+STOOQ_HEADER = "<TICKER>,<PER>,<DATE>,<TIME>,<OPEN>,<HIGH>,<LOW>,<CLOSE>,<VOL>,<OPENINT>\n"
+
+def write_stooq_file(directory, ticker, num_days=30, start='2020-01-01'):
+    dates = pd.bdate_range(start=start, periods=num_days)
+    path = os.path.join(directory, f"{ticker}.us.txt")
+    with open(path, 'w') as f:
+        f.write(STOOQ_HEADER)
+        for i, date in enumerate(dates):
+            price = 10 + i * 0.25
+            f.write(f"{ticker.upper()}.US,D,{date:%Y%m%d},000000,"
+                    f"{price:.4f},{price + 1:.4f},{price - 1:.4f},{price + 0.5:.4f},{1000 + i},0\n")
+    return path
+
+@pytest.fixture
+def stooq_files(tmp_path):
+    return [write_stooq_file(tmp_path, ticker, num_days=20 + 5 * i)
+            for i, ticker in enumerate(['aaa', 'bbb', 'ccc'])]
+
+def assert_same_frames(expected, actual):
+    assert list(expected) == list(actual)
+    for ticker in expected:
+        pd.testing.assert_frame_equal(expected[ticker], actual[ticker])
+
+def test_parallel_matches_serial(stooq_files):
+    expected = ekeko.dataloader.stooq_to_df(stooq_files)
+    actual = ekeko.dataloader.stooq_to_df_parallel(stooq_files, max_workers=2)
+    assert_same_frames(expected, actual)
+
+def test_parallel_cache_is_reused(stooq_files, tmp_path):
+    pytest.importorskip('pyarrow')
+    cache_dir = tmp_path / 'cache'
+    expected = ekeko.dataloader.stooq_to_df(stooq_files)
+
+    cold = ekeko.dataloader.stooq_to_df_parallel(stooq_files, cache_dir=cache_dir, max_workers=2)
+    assert len(os.listdir(cache_dir)) == len(stooq_files)
+
+    warm = ekeko.dataloader.stooq_to_df_parallel(stooq_files, cache_dir=cache_dir, max_workers=2)
+    assert_same_frames(expected, cold)
+    assert_same_frames(expected, warm)
+
+def test_iter_stooq_zip_filters_members(stooq_files, tmp_path):
+    zip_path = tmp_path / 'stooq.zip'
+    with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+        for path in stooq_files:
+            zip_ref.write(path, f"data/daily/us/{os.path.basename(path)}")
+
+    expected = ekeko.dataloader.stooq_to_df(stooq_files)
+    streamed = dict(ekeko.dataloader.iter_stooq_zip(zip_path))
+    assert_same_frames(expected, streamed)
+
+    selected = dict(ekeko.dataloader.iter_stooq_zip(zip_path, tickers=['BBB']))
+    assert list(selected) == ['bbb']
+
+    selected = dict(ekeko.dataloader.iter_stooq_zip(zip_path, pattern='*/c*.us.txt'))
+    assert list(selected) == ['ccc']
+
+def test_universe_is_lazy_and_bounded(stooq_files):
+    expected = ekeko.dataloader.stooq_to_df(stooq_files)
+    one_frame = int(expected['aaa'].memory_usage(deep=True).sum())
+    universe = ekeko.dataloader.Universe(stooq_files, max_bytes=one_frame + 1)
+
+    index = universe.index
+    assert list(index.index) == ['aaa', 'bbb', 'ccc']
+    assert list(index['rows']) == [len(df) for df in expected.values()]
+    assert index.loc['bbb', 'start'] == expected['bbb'].index[0]
+    assert index.loc['ccc', 'end'] == expected['ccc'].index[-1]
+    assert universe.resident == []
+
+    assert_same_frames(expected, dict(universe.items()))
+    assert universe.resident == ['ccc']
+
+@pytest.mark.parametrize('start, end', [
+    ('2020-01-06', '2020-01-15'),
+    (pd.Timestamp('2020-01-10'), None),
+    (None, '2020-01-03'),
+    ('2021-01-01', '2021-02-01'),
+    (None, '2020-01'),
+    ('2020-01', '2020-01'),
+    ('2020', '2020'),
+])
+def test_window_and_columns_are_pushed_down(stooq_files, tmp_path, start, end):
+    pytest.importorskip('pyarrow')
+    columns = ['Close', 'Volume']
+    full = ekeko.dataloader.stooq_to_df(stooq_files)
+    expected = {ticker: ekeko.dataloader.window.slice_window(df, start, end)[columns]
+                for ticker, df in full.items()}
+
+    loaders = [
+        lambda: ekeko.dataloader.stooq_to_df(stooq_files, start=start, end=end, columns=columns),
+        lambda: ekeko.dataloader.stooq_to_df_parallel(
+            stooq_files, cache_dir=tmp_path / 'cache', max_workers=2, start=start, end=end, columns=columns),
+        lambda: dict(ekeko.dataloader.Universe(
+            stooq_files, cache_dir=tmp_path / 'cache', start=start, end=end, columns=columns).items()),
+    ]
+    for load in loaders:
+        actual = load()
+        for ticker in expected:
+            # Empty windows may get a coarser datetime resolution from pandas
+            pd.testing.assert_frame_equal(expected[ticker], actual[ticker],
+                                          check_index_type=len(expected[ticker]) > 0)
+
+def test_replay_stooq_matches_loader(stooq_files, monkeypatch):
+    # Small chunks, so the replay crosses chunk boundaries
+    monkeypatch.setattr(ekeko.dataloader.stooq_loader, 'WINDOW_CHUNK_ROWS', 7)
+    path = stooq_files[2]
+    for start, end in [(None, None), ('2020-01-08', '2020-01-27'), (None, '2020-01')]:
+        expected = ekeko.dataloader.stooq_to_df([path], start=start, end=end)['ccc']
+        bars = list(ekeko.dataloader.replay_stooq(path, start=start, end=end))
+        assert [timestamp for timestamp, _ in bars] == list(expected.index)
+        assert [bar for _, bar in bars] == expected.to_dict('records')
+
+class AlternatingStrategy(bt.Strategy):
+    def next(self):
+        for data in self.datas:
+            if len(data) % 5 == 1 and not self.getposition(data).size:
+                self.buy(data=data)
+            elif len(data) % 5 == 3 and self.getposition(data).size:
+                self.sell(data=data)
+
+def run_backtest(stock_dfs):
+    ekeko_cerebro = ekeko.backtrader.EkekoCerebro()
+    ekeko_cerebro.cerebro.broker.setcash(2000.0)
+    for ticker, stock_df in stock_dfs.items():
+        ekeko_cerebro.adddata(stock_df, name=ticker)
+    ekeko_cerebro.addstrategy(AlternatingStrategy)
+    _, analysis_results = ekeko_cerebro.run()
+    return analysis_results
+
+def test_compact_frames_give_identical_backtests(stooq_files):
+    full = ekeko.dataloader.stooq_to_df(stooq_files)
+    compact, report = ekeko.dataloader.compact_dataframes(full, share_index=True)
+
+    assert compact['aaa']['Close'].dtype == np.float32
+    assert compact['aaa']['Volume'].dtype == np.uint16
+    assert report['shared_index'].all()
+    assert (report['bytes_saved'] > 0).all()
+    assert np.shares_memory(compact['aaa'].index.asi8, compact['ccc'].index.asi8)
+
+    expected = run_backtest(full)
+    actual = run_backtest(compact)
+    assert expected['trade_analysis'] == actual['trade_analysis']
+    for key in ['len', 'drawdown', 'moneydown']:
+        assert expected['drawdown'][key] == actual['drawdown'][key]
+        assert expected['drawdown']['max'][key] == actual['drawdown']['max'][key]
+    pd.testing.assert_frame_equal(expected['drawdown']['curve'], actual['drawdown']['curve'])
+    for section in ['transactions', 'trades']:
+        assert_same_frames(expected[section], actual[section])
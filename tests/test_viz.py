@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+import ekeko
+
+def random_bars(num_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, num_bars))
+    df = pd.DataFrame({
+        'Open': close + rng.normal(0, 0.5, num_bars),
+        'High': close + 2,
+        'Low': close - 2,
+        'Close': close,
+        'Volume': rng.integers(100, 1000, num_bars),
+    }, index=pd.date_range('2000-01-01', periods=num_bars, freq='D'))
+    df.loc[df.index[5], 'High'] = np.nan
+    return df
+
+def test_downsample_ohlcv_matches_resample():
+    df = random_bars(1003)
+    buckets = ekeko.viz.downsample_ohlcv(df, 10)
+
+    expected = df.groupby(np.arange(len(df)) // 10).agg(
+        {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    expected.index = df.index[::10]
+    pd.testing.assert_frame_equal(buckets, expected, check_dtype=False, check_freq=False)
+    assert ekeko.viz.downsample_ohlcv(df, 1) is df
+
+    sma = df['Close'].rolling(20).mean().rename('sma')
+    curve = ekeko.viz.downsample_series(sma, 10)
+    np.testing.assert_allclose(curve.to_numpy(), sma.groupby(np.arange(len(df)) // 10).mean().to_numpy())
+    assert curve.name == 'sma'
+
+def test_plot_level_of_detail_keeps_exact_transactions():
+    df = random_bars(10_000)
+    transactions = pd.DataFrame({'size': [1, -1, 2], 'price': [101.5, 99.25, 100.0]},
+                                index=df.index[[17, 4242, 9999]])
+
+    fig = ekeko.viz.plot(df, other_dfs=[df['Close'].rename('close')], transactions=transactions, max_points=500)
+    assert fig.layout.meta['bucket_size'] == ekeko.viz.lod_bucket_size(len(df), 500) == 20
+    assert fig.layout.xaxis.type == 'date'
+    candles = fig.data[0]
+    assert len(candles.x) == 500 and max(candles.high) == df['High'].max()
+
+    buys, sells = fig.data[-2:]
+    assert list(pd.to_datetime(buys.x)) == [df.index[17], df.index[9999]]
+    assert list(pd.to_datetime(sells.x)) == [df.index[4242]] and list(sells.y) == [99.25]
+
+    # Finer detail for a zoomed window
+    zoomed = ekeko.viz.plot(df.iloc[4000:4500], bucket_size=1)
+    assert len(zoomed.data[0].x) == 500 and zoomed.layout.meta['bucket_size'] == 1
+
+def test_interactive_plot_resamples_the_visible_window():
+    df = random_bars(50_000)
+    transactions = pd.DataFrame({'size': [1, -1, 2], 'price': [101.5, 99.25, 100.0]},
+                                index=df.index[[17, 20_100, 20_250]])
+    sma = df['Close'].rolling(20).mean().rename('sma')
+    chart = ekeko.viz.InteractivePlot(ekeko.viz.PlotCache(df, [sma], transactions), max_points=1000)
+
+    assert chart.figure.layout.meta['bucket_size'] == 50
+    assert all(len(trace.x) <= 1000 for trace in chart.figure.data)
+
+    # Zooming in shows every bar of the window and only its transactions
+    assert chart.relayout({'xaxis.range[0]': str(df.index[20_000]), 'xaxis.range[1]': str(df.index[20_499])})
+    candles, _, curve, volume, buys, sells = chart.figure.data
+    assert chart.figure.layout.meta == {'bucket_size': 1, 'bars': 500}
+    assert list(pd.to_datetime(candles.x)) == list(df.index[20_000:20_500])
+    np.testing.assert_allclose(candles.close, df['Close'].iloc[20_000:20_500])
+    np.testing.assert_allclose(curve.y, sma.iloc[20_000:20_500])
+    np.testing.assert_allclose(volume.y, df['Volume'].iloc[20_000:20_500])
+    assert list(pd.to_datetime(buys.x)) == [df.index[20_250]] and list(sells.y) == [99.25]
+
+    assert chart.relayout({'xaxis.autorange': True})
+    assert chart.figure.layout.meta['bucket_size'] == 50 and len(chart.figure.data[4].x) == 2
+    assert not chart.relayout({'dragmode': 'pan'})
+
+def test_interactive_plot_lines_up_transactions_of_tz_aware_bars():
+    df = random_bars(500)
+    df.index = (df.index + pd.Timedelta(hours=16)).tz_localize('America/New_York')
+    # backtrader reports transaction dates as naive UTC
+    utc = df.index.tz_convert('UTC').tz_localize(None)
+    transactions = pd.DataFrame({'size': [1, -1], 'price': [101.5, 99.25]}, index=utc[[100, 200]])
+    chart = ekeko.viz.InteractivePlot(ekeko.viz.PlotCache(df, transactions=transactions))
+
+    chart.zoom(df.index[150], df.index[249])
+    candles, _, _, buys, sells = chart.figure.data
+    assert chart.figure.layout.meta['bars'] == 100
+    assert list(pd.to_datetime(candles.x)) == list(utc[150:250])
+    assert len(buys.x) == 0 and list(pd.to_datetime(sells.x)) == [utc[200]]
+
+def test_plot_leaves_its_inputs_untouched():
+    df = random_bars(300)
+    df.index = df.index + pd.Timedelta(hours=23, minutes=59)
+    sma = df['Close'].rolling(5).mean().rename('sma')
+    transactions = pd.DataFrame({'size': [3, -3], 'price': [101.5, 99.25]}, index=df.index[[10, 20]])
+    inputs = [df.copy(), sma.copy(), transactions.copy()]
+
+    fig = ekeko.viz.plot(df, other_dfs=[sma], transactions=transactions)
+    pd.testing.assert_frame_equal(df, inputs[0])
+    pd.testing.assert_series_equal(sma, inputs[1])
+    pd.testing.assert_frame_equal(transactions, inputs[2])
+
+    candles, _, curve, volume, buys, sells = fig.data
+    assert list(candles.x) == list(df.index.strftime('%Y-%m-%d')) == list(curve.x)
+    assert list(volume.marker.color) == list((df['Open'] < df['Close']).astype(int))
+    assert list(buys.x) == [df.index[10].strftime('%Y-%m-%d')] and list(buys.customdata) == [3]
+    assert list(sells.customdata) == [-3] and 'Size: %{customdata}' in sells.hovertemplate
+
+def test_stock_plots_do_not_share_their_layout():
+    small, large = ekeko.viz.plot(random_bars(50), title='small'), ekeko.viz.plot(random_bars(50) * 100, title='large')
+    assert small.layout.title.text == 'small' and large.layout.title.text == 'large'
+    assert small.layout.yaxis2.range[1] * 100 == large.layout.yaxis2.range[1]
+    assert small.data[-1].yaxis == 'y2' and small.layout.yaxis2.overlaying == 'y'
+    assert 'range' not in ekeko.viz.plotting._stock_plot_layout()['yaxis2']
+
+def test_dense_figures_switch_to_webgl():
+    stocks = [{'symbol': f"t{i}", 'df': random_bars(1000, seed=i)} for i in range(6)]
+    fig = ekeko.viz.plot_different_stocks(stocks, 'Close', 'Close')
+    assert {trace.type for trace in fig.data} == {'scattergl'}
+    assert fig.data[1].line.color == 'yellow'
+    assert {trace.type for trace in ekeko.viz.plot_different_stocks(stocks[:2], 'Close', 'Close').data} == {'scatter'}
+    assert {trace.type for trace in ekeko.viz.plot_different_stocks(stocks, 'Close', 'Close', webgl=False).data} == {'scatter'}
+
+    df = random_bars(6000)
+    assert [trace.type for trace in ekeko.viz.plot(df).data] == ['candlestick', 'scattergl', 'bar']
+    assert [trace.type for trace in ekeko.viz.plot(df, max_points=1000).data] == ['candlestick', 'scatter', 'bar']
+    assert ekeko.viz.scatter(df['Close'], df['Open'], {}, 'scatter').data[0].type == 'scattergl'
+
+def test_export_plots_shares_one_plotlyjs_bundle(tmp_path):
+    stock_dfs = {'aaa': random_bars(200), 'bbb': random_bars(200, seed=1)}
+    transactions = {'aaa': pd.DataFrame({'size': [1], 'price': [100.0]}, index=stock_dfs['aaa'].index[[3]])}
+
+    paths = ekeko.viz.export_plots(stock_dfs, transactions, directory=tmp_path, max_workers=1, max_points=50)
+    assert paths == {ticker: [str(tmp_path / f"{ticker}.html")] for ticker in stock_dfs}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['aaa.html', 'bbb.html', 'plotly.min.js']
+    html = (tmp_path / 'aaa.html').read_text()
+    assert 'src="plotly.min.js"' in html and len(html) < 200_000
+    assert '"name":"Buy"' in html and '"name":"Buy"' not in (tmp_path / 'bbb.html').read_text()